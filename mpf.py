@@ -68,6 +68,16 @@ parser.add_argument("-C",
                     help="The MPF framework default config file. Default is "
                     "mpf/mpfconfig.yaml")
 
+parser.add_argument("--no-cache",
+                    action="store_true", dest="no_cache", default=False,
+                    help="Loads all config and show files from disk instead "
+                    "of the cache, and doesn't write the cache")
+
+parser.add_argument("--rebuild-cache",
+                    action="store_true", dest="rebuild_cache", default=False,
+                    help="Loads all config and show files from disk and "
+                    "writes new caches for them")
+
 parser.add_argument("--version",
                     action="version", version=version.version_str,
                     help="Displays the MPF, config file, and BCP version info "
@@ -61,6 +61,9 @@ class Driver(Device):
         self.log.debug("Enabling Driver")
         self.hw_driver.enable()
 
+        if self.machine.profiler.enabled:
+            self.machine.profiler.coil_fired(self.name)
+
     def disable(self, **kwargs):
         """ Disables this driver """
         self.log.debug("Disabling Driver")
@@ -94,6 +97,9 @@ class Driver(Device):
         else:
             self.time_when_done = -1
 
+        if self.machine.profiler.enabled:
+            self.machine.profiler.coil_fired(self.name)
+
     def timed_enable(self, milliseconds, **kwargs):
         """Lets you enable a driver for a specific time duration that's longer
         than 255ms. (If you want to enable a driver for 255ms or less, just use
@@ -9,7 +9,6 @@
 import time
 
 from mpf.system.device import Device
-from mpf.system.tasks import Task
 from mpf.system.utility_functions import Util
 
 
@@ -42,10 +41,11 @@ class LED(Device):
 
         self.hw_driver = self.platform.configure_led(self.config)
 
+        self.frame_buffer = self.machine.light_controller.led_buffer
+        self.index = self.frame_buffer.add_led(self)
+        """Index of this LED in the LightController's LEDFrameBuffer."""
+
         self.fade_in_progress = False
-        self.fade_task = None
-        self.fade_destination_color = [0.0, 0.0, 0.0]
-        self.fade_end_time = None
 
         self.state = {  # current state of this LED
                         'color': [0.0, 0.0, 0.0],
@@ -101,6 +101,7 @@ class LED(Device):
             value.append(1.0)
 
         self.config['brightness_compensation'] = value
+        self.frame_buffer.set_compensation(self.index, value)
 
     def color(self, color, fade_ms=None, brightness_compensation=True,
               priority=0, cache=True, force=False, blend=False):
@@ -193,15 +194,18 @@ class LED(Device):
         if fade_ms:
             self.state['destination_color'] = color
             self.state['destination_time'] = current_time + (fade_ms / 1000.0)
-            self.state['start_color'] = self.state['color']
+            self.state['start_color'] = self.frame_buffer.get_color(self.index)
             self.state['start_time'] = current_time
-            self._setup_fade()
+            self.fade_in_progress = True
+            self.frame_buffer.fade(self.index, color, current_time,
+                                   self.state['destination_time'])
 
             if self.debug:
-                print "we have a fade to set up"
+                self.log.debug("Fading to %s over %sms", color, fade_ms)
 
         else:
-            self.hw_driver.color(color)
+            self.fade_in_progress = False
+            self.frame_buffer.set_color(self.index, color)
             self.state['color'] = color
 
             if self.debug:
@@ -255,6 +259,9 @@ class LED(Device):
 
     def get_state(self):
         """Returns the current state of this LED"""
+        if self.fade_in_progress:
+            self.state['color'] = self.frame_buffer.get_color(self.index)
+
         return self.state
 
     def restore(self):
@@ -282,76 +289,20 @@ class LED(Device):
         Returns:
             The brightness-compensated 3-item color list of ints
         """
+        return self.frame_buffer.compensate(self.index, color)
 
-        global_settings = self.machine.config['led_settings']
-
-        color[0] = (int(color[0] *
-                    self.config['brightness_compensation'][0] *
-                    global_settings['brightness_compensation'][0]))
-        color[1] = (int(color[1] *
-                    self.config['brightness_compensation'][1] *
-                    global_settings['brightness_compensation'][1]))
-        color[2] = (int(color[2] *
-                    self.config['brightness_compensation'][2] *
-                    global_settings['brightness_compensation'][2]))
-
-        return color
-
-    def _setup_fade(self):
-        self.fade_in_progress = True
-
-        if not self.fade_task:
-            if self.debug:
-                print "setting up fade task"
-            self.fade_task = Task.create(self._fade_task)
-        elif self.debug:
-                print "already have a fade task"
-
-    def _fade_task(self):
-        while self.fade_in_progress:
-
-            if self.debug:
-                print "fade_in_progress fade_task"
-                print "state", self.state
-
-            state = self.state
-
-            # figure out the ratio of how far along we are
-            ratio = ((time.time() - state['start_time']) /
-                     (state['destination_time'] - state['start_time']))
-
-            new_color = list()
-
-            if self.debug:
-                print "ratio", ratio
-
-            if ratio >= 1.0:  # fade is done
-                self.fade_in_progress = False
-                new_color = state['destination_color']
-
-            else:
-                new_color.append(int(((state['destination_color'][0] - state['start_color'][0]) * ratio) + state['start_color'][0]))
-                new_color.append(int(((state['destination_color'][1] - state['start_color'][1]) * ratio) + state['start_color'][1]))
-                new_color.append(int(((state['destination_color'][2] - state['start_color'][2]) * ratio) + state['start_color'][2]))
-
-            if self.debug:
-                print "new color", new_color
-
-            self.color(color=new_color, fade_ms=0,
-                       brightness_compensation=False,
-                       priority=state['priority'], cache=False)
-
-            yield
+    def fade_complete(self):
+        """Called by the LEDFrameBuffer when this LED's fade is done."""
+        self.fade_in_progress = False
+        self.state['color'] = self.state['destination_color']
 
         if self.debug:
-            print "fade_in_progress just ended"
-            print "killing fade task"
-
-        self.fade_task = None
-        raise StopIteration()
+            self.log.debug("Fade complete. Color: %s", self.state['color'])
 
     def _kill_fade(self):
         self.fade_in_progress = False
+        self.frame_buffer.stop_fade(self.index)
+        self.state['color'] = self.frame_buffer.get_color(self.index)
 
 
 
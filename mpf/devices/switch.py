@@ -49,6 +49,10 @@ class Switch(Device):
         self.last_changed = None
         self.hw_timestamp = None
 
+        self.index = None
+        """ Integer index of this switch in the switch controller's state
+        tables. Set when the switch controller initializes the switches."""
+
         self.log.debug("Creating '%s' with config: %s", name, self.config)
 
         self.hw_switch, self.number = (
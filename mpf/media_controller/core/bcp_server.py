@@ -20,6 +20,8 @@ import threading
 import time
 import traceback
 
+from mpf.system.bcp import unpack_messages
+
 
 class BCPServer(threading.Thread):
     """Parent class for the BCP Server thread.
@@ -89,15 +91,19 @@ class BCPServer(threading.Thread):
                                     port=client_address[1])
                 self.mc.pc_connected = True
 
-                # Receive the data in small chunks and retransmit it
+                # Receive the data in small chunks and retransmit it. Data
+                # which doesn't make up a complete command yet is kept until
+                # the rest of it arrives.
+                received_data = ''
+
                 while True:
                     try:
                         data = self.connection.recv(4096)
                         if data:
-                            commands = data.split("\n")
+                            commands, received_data = unpack_messages(
+                                received_data + data)
                             for cmd in commands:
-                                if cmd:
-                                    self.process_received_message(cmd)
+                                self.process_received_message(cmd)
                         else:
                             # no more data
                             break
@@ -163,6 +169,7 @@ class BCPServer(threading.Thread):
         """
         self.log.debug('Received "%s"', message)
         self.receive_queue.put(message)
+        self.mc.wakeup()
 
 
 # The MIT License (MIT)
@@ -213,6 +213,9 @@ class MPFDisplay(object):
             values are slide objects.
         current_slide: Reference to the current slide that this display is
             showing.
+        frame_version: Integer which goes up every time an update() changed
+            what this display shows, so other things which show it (like the
+            VirtualDMD) know when they have to update.
         flag_active_transition: Boolean of whether there's an active transition
             taking place on this display.
         name: String name of this display. Default is 'MPFDisplay'.
@@ -259,6 +262,13 @@ class MPFDisplay(object):
         self.transition_slide = None
         self.transition_object = None
 
+        self.shown_slide = None
+        self.frame_version = 0
+        self.frames = 0
+        self.skipped_frames = 0
+        self.composited_pixels = 0
+        self.shown_pixels = 0
+
         self.name = 'MPFDisplay'
 
         if not self.machine.display.default_display:
@@ -451,8 +461,52 @@ class MPFDisplay(object):
         """Updates the contents of the current slide. This method can safely
         be called frequently.
 
+        Returns a list of the Rects of the display which changed since the
+        last update (all of it if the current slide changed), so subclasses
+        only have to show those. The list is empty if nothing changed.
+
         """
-        self.current_slide.update()
+        slide = self.current_slide
+        slide.update()
+
+        if slide is not self.shown_slide:
+            self.shown_slide = slide
+            slide.get_dirty_rects()
+            rects = [self.surface.get_rect()]
+        else:
+            rects = slide.get_dirty_rects()
+
+        self.frames += 1
+
+        if not rects:
+            self.skipped_frames += 1
+            return rects
+
+        self.frame_version += 1
+        shown_pixels = sum(rect.width * rect.height for rect in rects)
+        self.composited_pixels += slide.composited_pixels
+        self.shown_pixels += shown_pixels
+
+        if self.debug:
+            self.log.debug("Composited %s pixels, showing %s pixels in %s "
+                           "rect(s)", slide.composited_pixels, shown_pixels,
+                           len(rects))
+
+        return rects
+
+    def get_render_stats(self):
+        """Returns a dictionary with the number of frames this display
+        updated, how many of them were skipped since nothing changed, and the
+        average number of pixels it composited and showed per frame.
+
+        """
+        frames = self.frames or 1
+
+        return dict(frames=self.frames, skipped_frames=self.skipped_frames,
+                    composited_pixels_per_frame=round(
+                        self.composited_pixels / float(frames), 1),
+                    shown_pixels_per_frame=round(
+                        self.shown_pixels / float(frames), 1))
 
     def get_surface(self):
         """Returns the surface of the current slide."""
@@ -482,6 +536,9 @@ class DisplayElement(object):
             display element.
         rect: The Pygame Rect object which defines this elements's size and
             position on the parent slide.
+        drawn_rect: Copy of the rect this element had when the slide last
+            composited it, so the slide knows which area to composite again
+            when the element moves, changes size or is removed.
         x: The horizontal position offset for the placement of this element.
         y: The vertical position offset for the placement of this element.
         h_pos: The horizontal anchor.
@@ -494,6 +551,7 @@ class DisplayElement(object):
         self.decorators = list()
         self.dirty = True
         self.rect = None
+        self.drawn_rect = None
         self.slide = slide
         self._opacity = 255
         self.name = None
@@ -9,6 +9,7 @@
 
 import logging
 import os
+from collections import OrderedDict
 
 import pygame
 
@@ -22,9 +23,21 @@ class FontManager(object):
 
     Attributes:
         font_cache: Dictionary of Pygame font rendering objects.
+        text_cache: OrderedDict of the most recently rendered text surfaces,
+            keyed by (font, size, antialias, color, bg_color, text).
+        glyph_cache: Dictionary of the single character surfaces of the fonts
+            which have glyph_cache: yes in their config.
+
+    Fonts which are fixed width and not antialiased (like most DMD fonts) can
+    set glyph_cache: yes in their config. Text in those fonts is put together
+    from the cached surfaces of its characters instead of being rendered by
+    the font, so a score which changes doesn't need the font renderer.
 
     """
 
+    text_cache_size = 256
+    """How many rendered text surfaces are cached."""
+
     def __init__(self, machine, config):
 
         self.log = logging.getLogger('fonts')
@@ -32,6 +45,11 @@ class FontManager(object):
         self.machine = machine
         self.config = config
         self.font_cache = dict()
+        self.text_cache = OrderedDict()
+        self.glyph_cache = dict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.glyph_renders = 0
 
         # todo add setting to preload them?
         # todo add setting to fail if font/size combo not found
@@ -39,13 +57,63 @@ class FontManager(object):
     def render(self, text, font='default', antialias=False, size=None,
                color=None, bg_color=None, alpha_color=None,
                alpha_channel=None, **kwargs):
+        """Returns a Pygame surface of the text rendered in a font.
+
+        The surface comes from the text cache if the same text was rendered
+        with the same settings recently, so it's shared and must not be drawn
+        on.
+
+        """
+        key = (font, size, antialias, self._color_key(color),
+               self._color_key(bg_color), text)
+
+        try:
+            surface = self.text_cache.pop(key)
+            self.cache_hits += 1
+        except KeyError:
+            surface = self._render(text, font, antialias, size, color,
+                                   bg_color)
+            self.cache_misses += 1
 
+        # (re)add it so it's the most recently used
+        self.text_cache[key] = surface
+
+        if len(self.text_cache) > self.text_cache_size:
+            self.text_cache.popitem(last=False)
+
+        return surface
+
+    @staticmethod
+    def _color_key(color):
+        # colors can be lists (or pygame Colors), which can't be dict keys
+        try:
+            hash(color)
+            return color
+        except TypeError:
+            return tuple(color)
+
+    def get_cache_stats(self):
+        """Returns a dictionary with the hits, misses and hit rate of the text
+        cache, and how many of the misses were put together from cached
+        glyphs."""
+        renders = self.cache_hits + self.cache_misses
+
+        return dict(hits=self.cache_hits, misses=self.cache_misses,
+                    hit_rate=(round(self.cache_hits / float(renders), 3)
+                              if renders else 0),
+                    glyph_renders=self.glyph_renders,
+                    cached_surfaces=len(self.text_cache),
+                    cached_glyphs=len(self.glyph_cache))
+
+    def _render(self, text, font, antialias, size, color, bg_color):
         font_obj = self.get_font(font, size)
 
-        if bg_color is not None:
-            surface = font_obj.render(text, antialias, color, bg_color)
+        if (text and not antialias and
+                self.config[font].get('glyph_cache', False)):
+            surface = self._render_glyphs(font_obj, text, color, bg_color)
         else:
-            surface = font_obj.render(text, antialias, color)
+            surface = self._render_font(font_obj, text, antialias, color,
+                                        bg_color)
 
         # if alpha, do something to the surface # todo
 
@@ -61,6 +129,51 @@ class FontManager(object):
 
         return surface.subsurface((0, start_y, surface.get_width(), end_y))
 
+    def _render_font(self, font_obj, text, antialias, color, bg_color):
+        if bg_color is not None:
+            return font_obj.render(text, antialias, color, bg_color)
+        else:
+            return font_obj.render(text, antialias, color)
+
+    def _render_glyphs(self, font_obj, text, color, bg_color):
+        # Puts the text together from the surfaces of its characters, which
+        # are rendered once per font and color
+        glyphs = list()
+
+        for char in text:
+            key = (font_obj, char, self._color_key(color),
+                   self._color_key(bg_color))
+
+            try:
+                glyphs.append(self.glyph_cache[key])
+            except KeyError:
+                glyph = self._render_font(font_obj, char, False, color,
+                                          bg_color)
+                self.glyph_cache[key] = glyph
+                glyphs.append(glyph)
+
+        # the new surface has the same format (and palette and colorkey) as
+        # the glyphs, so the glyphs' pixels are copied as they are
+        first = glyphs[0]
+        surface = pygame.Surface((sum(x.get_width() for x in glyphs),
+                                  first.get_height()), 0, first)
+
+        if first.get_bytesize() == 1:
+            surface.set_palette(first.get_palette())
+
+        if first.get_colorkey():
+            surface.set_colorkey(first.get_colorkey())
+
+        x = 0
+
+        for glyph in glyphs:
+            surface.blit(glyph, (x, 0))
+            x += glyph.get_width()
+
+        self.glyph_renders += 1
+
+        return surface
+
     def metrics(self, text, font='default', size=None, **kwargs):
         """
 
@@ -20,7 +20,7 @@ from mpf.media_controller.core import *
 from mpf.media_controller.core.bcp_server import BCPServer
 from mpf.system.config import Config, CaseInsensitiveDict
 from mpf.system.events import EventManager
-from mpf.system.timing import Timing
+from mpf.system.timing import Timing, Wakeup
 from mpf.system.tasks import Task, DelayManager
 from mpf.system.player import Player
 from mpf.system.assets import AssetManager
@@ -79,6 +79,7 @@ class MediaController(object):
         self.HZ = 0
         self.next_tick_time = 0
         self.secs_per_tick = 0
+        self.loop_wakeup = None
         self.machine_vars = CaseInsensitiveDict()
         self.machine_var_monitor = False
         self.tick_num = 0
@@ -112,6 +113,17 @@ class MediaController(object):
                              'trigger': self.bcp_trigger,
                             }
 
+        # These parameters are converted to ints when the commands are decoded
+        bcp.register_command_schema('ball_start', player_num=int, ball=int)
+        bcp.register_command_schema('mode_start', priority=int)
+        bcp.register_command_schema('player_added', player_num=int)
+        bcp.register_command_schema('player_score', value=int,
+                                    prev_value=int, change=int,
+                                    player_num=int)
+        bcp.register_command_schema('player_turn_start', player_num=int)
+        bcp.register_command_schema('player_variable', player_num=int)
+        bcp.register_command_schema('switch', state=int)
+
         FileManager.init()
         self.config = dict()
         self._load_mc_config()
@@ -377,6 +389,23 @@ class MediaController(object):
         self.next_tick_time = time.time()
         self.secs_per_tick = 1.0 / self.HZ
 
+    def wakeup(self):
+        """Wakes up the run loop so it processes incoming BCP messages right
+        away. Safe to call from any thread.
+
+        """
+        if self.loop_wakeup:
+            self.loop_wakeup.set()
+
+    def _wait_for_wakeup(self):
+        # Sleeps until the next tick or until a BCP message comes in,
+        # whichever is first. Delays only run in timer_tick(), so there's no
+        # point in waking up for them earlier.
+        timeout = self.next_tick_time - time.time()
+
+        if timeout > 0:
+            self.loop_wakeup.wait(timeout)
+
     def timer_tick(self):
         """Called by the platform each machine tick based on self.HZ"""
         self.timing.timer_tick()  # notifies the timing module
@@ -397,11 +426,18 @@ class MediaController(object):
 
         secs_per_tick = self.secs_per_tick
 
+        if (self.config['media_controller'].get('event_driven_loop') and
+                Wakeup.available):
+            self.loop_wakeup = Wakeup()
+
         self.next_tick_time = time.time()
 
         try:
             while self.done is False:
-                time.sleep(0.001)
+                if self.loop_wakeup:
+                    self._wait_for_wakeup()
+                else:
+                    time.sleep(0.001)
 
                 self.get_from_queue()
 
@@ -449,11 +485,21 @@ class MediaController(object):
             self._process_command(cmd, **kwargs)
 
     def bcp_hello(self, **kwargs):
-        """Processes an incoming BCP 'hello' command."""
+        """Processes an incoming BCP 'hello' command.
+
+        The BCP server can receive length-prefixed frames, so if the pinball
+        controller offers that framing mode it's accepted in the reply.
+
+        """
         try:
             if LooseVersion(kwargs['version']) == (
                     LooseVersion(version.__bcp_version__)):
-                self.send('hello', version=version.__bcp_version__)
+
+                if kwargs.get('framing') == 'length':
+                    self.send('hello', version=version.__bcp_version__,
+                              framing='length')
+                else:
+                    self.send('hello', version=version.__bcp_version__)
             else:
                 self.send('hello', version='unknown protocol version')
         except KeyError:
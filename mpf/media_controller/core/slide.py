@@ -17,6 +17,13 @@ try:
 except ImportError:
     pass
 
+try:
+    import numpy
+    import pygame.surfarray
+    numpy_imported = True
+except ImportError:
+    numpy_imported = False
+
 class Slide(object):
     """Parent class for a Slide object.
 
@@ -62,6 +69,9 @@ class Slide(object):
 
     creation_id = 0
 
+    alpha_table = None
+    # The blit_8bit_alpha() lookup table, see get_alpha_table().
+
     @classmethod
     def get_creation_id(cls):
         Slide.creation_id += 1
@@ -104,6 +114,17 @@ class Slide(object):
         # create a Pygame surface for this slide based on the display's surface
         self.surface = pygame.Surface.copy(self.mpfdisplay.surface)
 
+        self.damaged_rects = list()
+        """List of Rects of this slide which have to be composited again at
+        the next update(), for example where an element was removed."""
+
+        self.dirty_rects = list()
+        """List of Rects of this slide's surface which changed since the
+        display last showed it. See get_dirty_rects()."""
+
+        self.composited_pixels = 0
+        """How many pixels the last update() composited."""
+
         if self.expire_ms:
             self.schedule_expire()
 
@@ -143,23 +164,116 @@ class Slide(object):
 
     def update(self):
         """Updates this slide by calling each display element's update() method,
-        and blits the results if there's an update.
+        and composites the areas of the slide which changed.
+
+        Returns True if anything on the slide changed, False if not.
+
+        Only the rects where an updated element was and is now are composited
+        again, by restoring the background there and blitting the parts of
+        all the elements (in layer order) which overlap them.
         """
         if self.pending_elements:
-            return
-
-        force_dirty = False
+            return False
 
         if self not in self.mpfdisplay.slides:
-            return
+            return False
+
+        damage = self.damaged_rects
+        self.damaged_rects = list()
 
         for element in self.elements:
 
-            if element.update():
-                self.surface.blit(element.surface, element.rect)
-                force_dirty = True
-            elif force_dirty:
-                self.surface.blit(element.surface, element.rect)
+            if element.update() and element.rect:
+                if element.drawn_rect:
+                    damage.append(element.drawn_rect)
+
+                element.drawn_rect = element.rect.copy()
+                damage.append(element.drawn_rect)
+
+        if not damage:
+            self.composited_pixels = 0
+            return False
+
+        self._composite(damage)
+        return True
+
+    def _composite(self, damage):
+        # Composites the rects in the damage list again
+        bounds = self.surface.get_rect()
+        background = self.mpfdisplay.surface
+        pixels = 0
+
+        for rect in Slide.merge_rects(damage):
+            rect = rect.clip(bounds)
+
+            if not rect.width or not rect.height:
+                continue
+
+            self.surface.blit(background, rect, rect)
+
+            for element in self.elements:
+                # elements with an opacity of 0 just show the background
+                if (not element.opacity or not element.drawn_rect or
+                        not rect.colliderect(element.drawn_rect)):
+                    continue
+
+                area = rect.clip(element.drawn_rect)
+                self.surface.blit(element.surface, area,
+                                  area.move(-element.drawn_rect.x,
+                                            -element.drawn_rect.y))
+
+            self.dirty_rects.append(rect)
+            pixels += rect.width * rect.height
+
+        self.composited_pixels = pixels
+
+        # slides which aren't shown don't have their rects collected, so this
+        # keeps the list from growing
+        if len(self.dirty_rects) > 32:
+            self.dirty_rects = [bounds]
+
+    def mark_dirty(self, rect=None):
+        """Marks part of this slide to be composited again at the next
+        update().
+
+        Args:
+            rect: Pygame Rect of the area. Default is None which is the whole
+                slide.
+
+        """
+        if rect is None:
+            rect = self.surface.get_rect()
+
+        self.damaged_rects.append(rect)
+
+    def get_dirty_rects(self):
+        """Returns a list of the Rects of this slide's surface which changed
+        since the last time this method was called. The display calls this to
+        only show the parts of the slide which changed."""
+        rects = Slide.merge_rects(self.dirty_rects)
+        self.dirty_rects = list()
+        return rects
+
+    @staticmethod
+    def merge_rects(rects):
+        """Returns a list of Rects where all the overlapping Rects of the list
+        passed are merged into one Rect which covers them."""
+        merged = list()
+
+        for rect in rects:
+            rect = pygame.Rect(rect)
+
+            # a union can overlap rects which didn't overlap before, so keep
+            # merging until it doesn't overlap anything
+            index = rect.collidelist(merged)
+
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+
+            merged.append(rect)
+
+        return merged
 
     def get_subsurface(self, rect, layer=0):
         """Returns a surface of the slide based on the rect passed, but only for
@@ -205,29 +319,52 @@ class Slide(object):
                                                    source_surface.get_width(),
                                                    source_surface.get_height()))
 
-        dest_pa = pygame.PixelArray(working_surface)
-        source_pa = pygame.PixelArray(source_surface)
-
-        for y in range(len(working_surface.get_height())):
-            for x in range(len(working_surface.get_width())):
+        alpha_table = Slide.get_alpha_table()
 
-                # This blend formula is complex, so here's how it was worked out
+        if numpy_imported:
+            # Blends the whole surface at once by looking up each pair of
+            # source and destination pixels in the table.
+            dest_pa = pygame.surfarray.pixels2d(working_surface)
+            source_pa = pygame.surfarray.pixels2d(source_surface)
+            dest_pa[...] = alpha_table[source_pa, dest_pa]
 
-                # alpha_percet = (source_pa[x, y] >> 4) / 15.0
-                # delta = source_pa[x, y] - dest_pa[x, y]
-                # change = delta * alpha_percent
-                # new_value = dest_pa[x, y] + change
-                # dest_pa[x, y] = new_value
-
-                # now here they all are on one line
+        else:
+            dest_pa = pygame.PixelArray(working_surface)
+            source_pa = pygame.PixelArray(source_surface)
 
-                dest_pa[x, y] = (dest_pa[x, y] +
-                                 ((source_pa[x, y] - dest_pa[x, y]) *
-                                  (source_pa[x, y] >> 4) / 15.0))
+            for y in range(working_surface.get_height()):
+                for x in range(working_surface.get_width()):
+                    dest_pa[x, y] = alpha_table[source_pa[x, y]][dest_pa[x, y]]
 
         del dest_pa
         del source_pa
 
+    @staticmethod
+    def get_alpha_table():
+        """Returns the table of blit_8bit_alpha() results, indexed by the
+        source pixel and then the destination pixel. It's created the first
+        time it's needed.
+
+        """
+        if Slide.alpha_table is None:
+
+            # This blend formula is complex, so here's how it was worked out
+
+            # alpha_percent = (source >> 4) / 15.0
+            # delta = source - dest
+            # change = delta * alpha_percent
+            # new_value = dest + change
+
+            table = [[int(dest + (source - dest) * (source >> 4) / 15.0)
+                      for dest in range(256)] for source in range(256)]
+
+            if numpy_imported:
+                table = numpy.array(table, dtype=numpy.uint8)
+
+            Slide.alpha_table = table
+
+        return Slide.alpha_table
+
     def add_element(self, element_type, name=None, x=None, y=None, h_pos=None,
                     v_pos=None, text_variables=None, **kwargs):
         """Adds a display element to the slide.
@@ -307,20 +444,13 @@ class Slide(object):
             name: String name of the display element you want to remove.
         """
 
-        mark_dirty = False
-
-        # Reverse so we can mark any elements below this as dirty
-        for element in reversed(self.elements):
+        for element in self.elements[:]:
             if element.name == name:
                 self.elements.remove(element)
-                mark_dirty = True
-            elif mark_dirty:
-                element.dirty = True
 
-        # If we wanted to optimize more, we could only mark the Rect of the
-        # element that was removed as dirty, but meh. If we do that we should
-        # probably instead create some kind of dirty rect handler since we
-        # could use it in other places too.
+                # the elements below it are composited again where it was
+                if element.drawn_rect:
+                    self.damaged_rects.append(element.drawn_rect)
 
     def clear(self):
         """Removes all elements from the slide and resets the slide to all
@@ -328,6 +458,8 @@ class Slide(object):
         self.elements = list()
         self.surface = pygame.Surface.copy(self.mpfdisplay.surface)
         self.dirty = True
+        self.damaged_rects = list()
+        self.dirty_rects = [self.surface.get_rect()]
 
     def refresh(self, force_dirty=False):
         """Refreshes the slide by clearing it, and updating all the display
@@ -339,6 +471,7 @@ class Slide(object):
 
         """
         self.surface = pygame.Surface.copy(self.mpfdisplay.surface)
+        self.mark_dirty()
 
         if force_dirty:
             for element in self.elements:
@@ -93,12 +93,12 @@ class Transition(Slide):
         # figure out what percentage along we are
         self.percent = (time.time() - self.start_time) / self.duration
 
+        # this transition slide is always dirty as long as it's active
+        self.dirty_rects = [self.surface.get_rect()]
+
         if self.percent >= 1.0:
             self.complete()
 
-        # don't set self._dirty since this transition slide is always dirty as
-        # long as it's active
-
     def complete(self):
         """Mark this transition as complete."""
         # this transition is done
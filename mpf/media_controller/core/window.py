@@ -133,11 +133,16 @@ class WindowManager(MPFDisplay):
         settings.
 
         """
-        super(WindowManager, self).update()
+        rects = super(WindowManager, self).update()
 
-        # Update the display
-        self.window.blit(self.current_slide.surface, (0, 0))
-        pygame.display.flip()
+        if not rects:
+            return
+
+        # Update the parts of the window which changed
+        for rect in rects:
+            self.window.blit(self.current_slide.surface, rect, rect)
+
+        pygame.display.update(rects)
 
 
 # The MIT License (MIT)
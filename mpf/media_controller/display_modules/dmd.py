@@ -7,10 +7,19 @@ module-level functions related to using DMD files."""
 
 # Documentation and more info at http://missionpinball.com/mpf
 
+import mmap
 import os
 import struct
 import pygame  # todo make it so this doesn't crash if pygame is not available
 import logging
+from collections import OrderedDict
+
+try:
+    import numpy
+    import pygame.surfarray
+    numpy_imported = True
+except ImportError:
+    numpy_imported = False
 
 from mpf.media_controller.core.display import MPFDisplay
 
@@ -83,6 +92,103 @@ def load_dmd_file(file_name, palette=None, alpha_color=None,
         raise Exception()
 
 
+class DMDFrames(object):
+    """The frames of a .DMD file, which are decoded from a memory map of the
+    file when they're needed rather than all at once when it's loaded.
+
+    Args:
+        file_name: A string of the file name (with path) of the file to load.
+        palette: Optional Python list in the Pygame palette format.
+        alpha_color: Whether one of the colors of this rendered DMD should be
+            transparent. Default is None.
+        prefetch: How many frames after the one that's asked for are decoded
+            along with it. Default is 2.
+
+    This works like the list of surfaces load_dmd_file() returns (you can
+    use len() and get frames by index), but only the few most recently used
+    frames are kept in memory as Pygame surfaces, so long animations don't
+    use more memory than short ones. The frames after a frame that's asked
+    for are decoded with it (wrapping around to the start of the animation),
+    so the next frames of an animation that's playing are ready when it needs
+    them.
+
+    """
+
+    log = logging.getLogger('DMDFrames')
+
+    def __init__(self, file_name, palette=None, alpha_color=None,
+                 prefetch=2):
+        self.file_name = file_name
+        self.palette = palette
+        self.alpha_color = alpha_color
+        self.prefetch = prefetch
+        self.cache_size = prefetch + 2
+        self.frames = OrderedDict()
+
+        with open(file_name, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Skip over the 4 byte DMD header.
+        frame_count, self.width, self.height = struct.unpack_from(
+            "III", self.data, 4)
+
+        self.frame_size = self.width * self.height
+
+        if len(self.data) != 16 + self.frame_size * frame_count:
+            self.log.warning("File size of %s inconsistent with header "
+                             "information.", file_name)
+            frame_count = min(frame_count,
+                              (len(self.data) - 16) // (self.frame_size or 1))
+
+        self.frame_count = frame_count
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.frame_count
+
+        if not 0 <= index < self.frame_count:
+            raise IndexError("DMD frame index out of range")
+
+        frames = self.frames
+
+        # move it to the end, since it's the most recently used now
+        try:
+            surface = frames.pop(index)
+        except KeyError:
+            surface = self._decode_frame(index)
+
+        frames[index] = surface
+
+        for i in range(index + 1, index + 1 + self.prefetch):
+            i %= self.frame_count
+
+            if i not in frames:
+                frames[i] = self._decode_frame(i)
+
+        while len(frames) > self.cache_size:
+            frames.popitem(last=False)
+
+        return surface
+
+    def _decode_frame(self, index):
+        start = 16 + index * self.frame_size
+
+        surface = pygame.image.fromstring(
+            self.data[start:start + self.frame_size],
+            (self.width, self.height), 'P')
+
+        if self.palette:
+            surface.set_palette(self.palette)
+
+        if self.alpha_color is not None:
+            surface.set_colorkey((self.alpha_color, 0, 0))
+
+        return surface
+
+
 def surface_to_dmd(surface, shades=16, alpha_color=None,
                    weights=(.299, .587, .114)):
     """Converts a 24-bit RGB Pygame surface to surface that's compatible with
@@ -114,12 +220,46 @@ def surface_to_dmd(surface, shades=16, alpha_color=None,
     """
 
     width, height = surface.get_size()
-    pa = pygame.PixelArray(surface)
-    new_surface = pygame.Surface((width, height), depth=8)
 
     # todo add support for alpha channel (per pixel), and specifying the
     # alpha color before the conversion versus after
 
+    if numpy_imported:
+        # Converts the whole surface at once. The math is done in the same
+        # order as the pure Python version so both return the same shades.
+        rgb = pygame.surfarray.array3d(surface)
+        pixel_weight = ((rgb[:, :, 0] * weights[0]) +
+                        (rgb[:, :, 1] * weights[1]) +
+                        (rgb[:, :, 2] * weights[2])) / 255.0
+
+        new_surface = pygame.Surface((width, height), depth=8)
+        pygame.surfarray.blit_array(new_surface, numpy.floor(
+            pixel_weight * (shades - 1) + .5).astype(numpy.uint8))
+
+    else:
+        # Images only have a few distinct colors, so each color is converted
+        # once and the shades of the whole image are built as one string.
+        data = pygame.image.tostring(surface, 'RGB')
+        pixel_shades = dict()
+        shade_string = list()
+
+        for i in xrange(0, len(data), 3):
+            pixel_color = data[i:i + 3]
+
+            try:
+                shade_string.append(pixel_shades[pixel_color])
+            except KeyError:
+                pixel_weight = ((ord(pixel_color[0]) * weights[0]) +
+                                (ord(pixel_color[1]) * weights[1]) +
+                                (ord(pixel_color[2]) * weights[2])) / 255.0
+
+                pixel_shades[pixel_color] = chr(int(round(
+                    pixel_weight * (shades - 1))))
+                shade_string.append(pixel_shades[pixel_color])
+
+        new_surface = pygame.image.fromstring(''.join(shade_string),
+                                              (width, height), 'P')
+
     palette = [
         (0, 0, 0),
         (1, 0, 0),
@@ -143,18 +283,7 @@ def surface_to_dmd(surface, shades=16, alpha_color=None,
     if alpha_color is not None:
         new_surface.set_colorkey((alpha_color, 0, 0))
 
-    new_pa = pygame.PixelArray(new_surface)
-
-    for x in range(width):
-        for y in range(height):
-            pixel_color = surface.unmap_rgb(pa[x, y])
-            pixel_weight = ((pixel_color[0] * weights[0]) +
-                            (pixel_color[1] * weights[1]) +
-                            (pixel_color[2] * weights[2])) / 255.0
-
-            new_pa[x, y] = int(round(pixel_weight * (shades - 1)))
-
-    return new_pa.surface
+    return new_surface
 
 
 def create_palette(bright_color=(255, 0, 0), dark_color=(0, 0, 0),
@@ -304,7 +433,8 @@ class DMD(MPFDisplay):
         """Automatically called based on a timer when the display should update.
         """
 
-        super(DMD, self).update()
+        if not super(DMD, self).update():
+            return False  # the frame didn't change
 
         if self.use_physical and self.depth == 8:
             try:
@@ -39,6 +39,18 @@ class Animation(Asset):
         else:
             self.alpha_color = None
 
+        # memory_map: True keeps a .dmd animation in its file and only decodes
+        # the frames around the one that's playing, to save memory
+        if 'memory_map' in self.config:
+            self.memory_map = self.config['memory_map']
+        else:
+            self.memory_map = False
+
+        if 'prefetch_frames' in self.config:
+            self.prefetch_frames = int(self.config['prefetch_frames'])
+        else:
+            self.prefetch_frames = 2
+
         self.surface_list = None
 
     def do_load(self, callback):
@@ -48,7 +60,14 @@ class Animation(Asset):
         # w, h
         # load from image file
 
-        if self.file_name.endswith('.dmd'):
+        if self.file_name.endswith('.dmd') and self.memory_map:
+            self.surface_list = mpf.media_controller.display_modules.dmd.DMDFrames(
+                self.file_name,
+                dmd_palette,
+                self.alpha_color,
+                self.prefetch_frames)
+
+        elif self.file_name.endswith('.dmd'):
             self.surface_list = mpf.media_controller.display_modules.dmd.load_dmd_file(
                 self.file_name,
                 dmd_palette,
@@ -218,9 +218,9 @@ class Text(DisplayElement):
     def render(self):
         self.element_surface = self.fonts.render(text=self.text, **self.config)
         self.set_position(self.x, self.y, self.h_pos, self.v_pos)
-        self.dirty = True
 
-        self.slide.refresh(force_dirty=True)
+        # the slide composites the areas of the old and the new text
+        self.dirty = True
 
     def scrub(self):
         self.machine.events.remove_handler(self._player_var_change)
@@ -41,19 +41,6 @@ class VirtualDMD(DisplayElement):
         else:
             return False
 
-    @property
-    def dirty(self):
-        return True
-        # future optimization could be to return the dirty status of the source
-        # DMD. We don't do that now because there would have to be some extra
-        # intelligence to make sure it did one more loop as dirty after the
-        # source turns clean. And really if the computer can't handle these
-        # udpates then the fps is too high anyway, so we can ignore this.
-
-    @dirty.setter
-    def dirty(self, value):
-        pass
-
     def __init__(self,  slide, machine, dmd_object=None, x=None, y=None, h_pos=None,
                  v_pos=None, layer=0, **kwargs):
 
@@ -79,6 +66,9 @@ class VirtualDMD(DisplayElement):
             if 'pixel_spacing' not in self.config:
                 self.config['pixel_spacing'] = 2
 
+            if 'pixel_style' not in self.config:
+                self.config['pixel_style'] = 'square'
+
             # convert hex colors to list of ints
             self.config['pixel_color'] = Util.hex_string_to_list(
                 self.config['pixel_color'])
@@ -112,17 +102,83 @@ class VirtualDMD(DisplayElement):
         if self.dmd_object.depth == 8:
             self.element_surface.set_palette(self.palette)
 
+        self.overlay = self.create_overlay()
+        self.shown_version = None
+
         self.layer = layer
         self.set_position(x, y, h_pos, v_pos)
 
+    def create_overlay(self):
+        """Creates the surface which is blitted over the scaled DMD surface to
+        draw the gaps between the pixels.
+
+        With the 'square' pixel_style, these are the grid lines between the
+        pixels. With the 'round' pixel_style, each pixel is a round dot like
+        the dots of a real DMD. Returns None if there's no pixel_spacing.
+
+        The overlay is made once since it only depends on the size of the
+        DMD, so the lines or dots don't have to be drawn again for each frame.
+
+        """
+        spacing = self.config.get('pixel_spacing', 0)
+
+        if not spacing:
+            return None
+
+        overlay = self.element_surface.copy()
+
+        # The gaps are drawn in black and everything else in a transparent
+        # color key which is any other pixel value.
+        gap = overlay.map_rgb((0, 0, 0))
+        key = gap ^ 1
+
+        ratio = (self.element_surface.get_width() /
+                 float(self.dmd_object.width))
+
+        if self.config.get('pixel_style') == 'round':
+            overlay.fill(gap)
+            radius = max(1, int((ratio - spacing) / 2))
+
+            for row in range(self.dmd_object.height):
+                for col in range(self.dmd_object.width):
+                    pygame.draw.circle(overlay, key,
+                                       (int((col + .5) * ratio),
+                                        int((row + .5) * ratio)), radius)
+
+        else:
+            overlay.fill(key)
+
+            for row in range(self.dmd_object.height + 1):
+                pygame.draw.line(overlay, gap, (0, row*ratio),
+                                 (self.config['width']-1, row*ratio), spacing)
+
+            for col in range(self.dmd_object.width + 1):
+                pygame.draw.line(overlay, gap, (col*ratio, 0),
+                                 (col*ratio, self.config['height']-1), spacing)
+
+        overlay.set_colorkey(key)
+
+        return overlay
+
     def update(self):
         """Updates the on screen representation of the physical DMD. This
         method automatically scales the surface as needed.
+
+        The DMD surface is only scaled again when the DMD shows a new frame
+        (or this element is marked dirty), otherwise the last scaled frame is
+        still valid.
         """
 
+        if (self.dmd_object.frame_version == self.shown_version and
+                not self.dirty):
+            return self.decorate()
+
         try:
-            source_surface = pygame.PixelArray(self.dmd_object.get_surface()).surface
-        except TypeError:
+            source_surface = self.dmd_object.get_surface()
+        except AttributeError:
+            return False
+
+        if source_surface is None:
             return False
 
         pygame.transform.scale(source_surface,
@@ -130,22 +186,14 @@ class VirtualDMD(DisplayElement):
                                 self.config['height']),
                                self.element_surface)
 
-        ratio = self.element_surface.get_width() / float(source_surface.get_width())
+        if self.overlay:
+            self.element_surface.blit(self.overlay, (0, 0))
 
-        if self.config['pixel_spacing']:
-
-            for row in range(source_surface.get_height() + 1):
-                pygame.draw.line(self.element_surface, (0, 0, 0), (0, row*ratio),
-                                 (self.config['width']-1, row*ratio),
-                                 self.config['pixel_spacing'])
-
-            for col in range(source_surface.get_width() + 1):
-                pygame.draw.line(self.element_surface, (0, 0, 0), (col*ratio, 0),
-                                 (col*ratio, self.config['height']-1),
-                                 self.config['pixel_spacing'])
+        self.shown_version = self.dmd_object.frame_version
+        self.dirty = False
 
         self.decorate()
-        return True  # since the virtual DMD is always dirty
+        return True
 
 display_element_class = VirtualDMD
 create_asset_manager = False
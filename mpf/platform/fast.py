@@ -22,6 +22,7 @@ from distutils.version import StrictVersion
 from copy import deepcopy
 
 from mpf.system.platform import Platform
+from mpf.system.send_queue import SendQueue, BLOCK, DROP_OLDEST, COALESCE
 from mpf.system.config import Config
 from mpf.system.utility_functions import Util
 
@@ -42,6 +43,8 @@ NET_LATEST_FW = '0.90'
 RGB_LATEST_FW = '0.87'
 IO_LATEST_FW = '0.89'
 
+HEX_BYTES = ['%02x' % x for x in range(256)]
+
 
 class HardwarePlatform(Platform):
     """Platform class for the FAST hardware controller.
@@ -51,6 +54,9 @@ class HardwarePlatform(Platform):
 
     """
 
+    send_queue_size = 200
+    """Maximum number of messages waiting to be sent to each processor."""
+
     def __init__(self, machine):
         super(HardwarePlatform, self).__init__(machine)
         self.log = logging.getLogger('FAST')
@@ -69,6 +75,7 @@ class HardwarePlatform(Platform):
         self.features['hw_rule_coil_delay'] = True  # todo
         self.features['variable_recycle_time'] = True  # todo
         self.features['variable_debounce_time'] = True  # todo
+        self.features['tick_on_wakeup'] = True
         # Make the platform features available to everyone
         self.machine.config['platform'] = self.features
         # ----------------------------------------------------------------------
@@ -80,8 +87,14 @@ class HardwarePlatform(Platform):
         self.fast_nodes = list()
         self.connection_threads = set()
         self.receive_queue = Queue.Queue()
+        self.hw_switch_callbacks = list()
         self.fast_leds = set()
+        self.dirty_leds = set()
         self.flag_led_tick_registered = False
+        self.next_led_refresh = 0
+        self.led_stats_start = None
+        self.led_bytes_sent = 0
+        self.led_bytes_full = 0
         self.fast_io_boards = list()
         self.waiting_for_switch_data = False
 
@@ -90,6 +103,7 @@ class HardwarePlatform(Platform):
                     baud: int|921600
                     config_number_format: string|hex
                     watchdog: ms|1000
+                    led_refresh_interval: ms|1000
                     default_debounce_open: ms|30
                     default_debounce_close: ms|30
                     debug: boolean|False
@@ -327,7 +341,8 @@ class HardwarePlatform(Platform):
         for port in self.config['ports']:
             self.connection_threads.add(SerialCommunicator(machine=self.machine,
                 platform=self, port=port, baud=self.config['baud'],
-                send_queue=Queue.Queue(), receive_queue=self.receive_queue))
+                send_queue=SendQueue(self.send_queue_size, 'fast.' + port),
+                receive_queue=self.receive_queue))
 
     def register_processor_connection(self, name, communicator):
         """Once a communication link has been established with one of the
@@ -347,35 +362,117 @@ class HardwarePlatform(Platform):
             self.rgb_connection = communicator
             self.rgb_connection.send('RA:000000')  # turn off all LEDs
 
-    def update_leds(self):
-        """Updates all the LEDs connected to a FAST controller. This is done
-        once per game loop for efficiency (i.e. all LEDs are sent as a single
-        update rather than lots of individual ones).
+    def update_leds(self, frame_buffer, indexes):
+        """Stores the new colors of the FAST LEDs which changed. They're sent
+        to the hardware by send_leds() at the end of the tick.
 
-        Also, every LED is updated every loop, even if it doesn't change. This
-        is in case some interference causes a LED to change color. Since we
-        update every loop, it will only be the wrong color for one tick.
+        """
+        leds = frame_buffer.leds
+        colors = frame_buffer.colors
+        dirty_leds = self.dirty_leds
+
+        for index in indexes:
+            offset = index * 3
+            led = leds[index].hw_driver
+            color = (HEX_BYTES[colors[offset]] +
+                     HEX_BYTES[colors[offset + 1]] +
+                     HEX_BYTES[colors[offset + 2]])
+
+            if color != led.current_color:
+                led.current_color = color
+                dirty_leds.add(led)
+
+    def send_leds(self):
+        """Sends the LEDs connected to a FAST controller which changed since
+        the last tick. This is done once per game loop for efficiency (i.e.
+        all LEDs are sent as a single update rather than lots of individual
+        ones).
+
+        Every 'led_refresh_interval' ms all the LEDs are sent, even if they
+        didn't change. This is in case some interference causes a LED to
+        change color. Set it to 0 to only send changes.
 
         """
+        if not self.fast_leds:
+            return
+
+        current_time = time.time()
+        interval = self.config['led_refresh_interval']
 
-        msg = 'RS:'
+        if self.led_stats_start is None:
+            self.led_stats_start = current_time
+
+        # sending every LED every tick is what this saves
+        self.led_bytes_full += 3 + 9 * len(self.fast_leds)
+
+        refresh = interval and current_time >= self.next_led_refresh
+
+        if refresh:
+            self.next_led_refresh = current_time + interval / 1000.0
+            leds = self.fast_leds
+        elif self.dirty_leds:
+            leds = list(self.dirty_leds)
+        else:
+            return
 
-        for led in self.fast_leds:
-            msg += (led.number + led.current_color + ',')  # todo change to join
+        # the LEDs hold a reference to this set, so it's cleared in place
+        self.dirty_leds.clear()
 
-        msg = msg[:-1]  # trim the final comma
+        # RA: sets every LED on the controller, including ones which aren't
+        # configured, so it's only used to turn everything off
+        if refresh and all(led.current_color == '000000' for led in leds):
+            msg = 'RA:000000'
+        else:
+            msg = 'RS:' + ','.join([led.number + led.current_color
+                                    for led in leds])
 
+        self.led_bytes_sent += len(msg) + 1
         self.rgb_connection.send(msg)
 
+    def get_led_stats(self):
+        """Returns a dictionary with the number of bytes sent to the FAST
+        LEDs and the bytes per second saved by only sending the LEDs which
+        changed.
+
+        """
+        saved = self.led_bytes_full - self.led_bytes_sent
+
+        if self.led_stats_start is None:
+            secs = 0
+        else:
+            secs = time.time() - self.led_stats_start
+
+        return dict(bytes_sent=self.led_bytes_sent, bytes_saved=saved,
+                    bytes_saved_per_sec=round(saved / secs, 1) if secs else 0)
+
+    def stop(self):
+        """Logs the LED bytes saved when MPF stops."""
+        if self.fast_leds:
+            self.log.info("LED stats: %s", self.get_led_stats())
+
     def get_hw_switch_states(self):
-        self.hw_switch_data = None
-        self.net_connection.send('SA:')
+        states = list()
+        self.request_hw_switch_states(states.append)
 
-        while not self.hw_switch_data:
+        while not states:
             time.sleep(.01)
             self.tick()
 
-        return self.hw_switch_data
+        return states[0]
+
+    def request_hw_switch_states(self, callback):
+        # Sends SA: and lets receive_sa() call the callback. If an SA: is
+        # already on its way, its answer is used.
+        self.hw_switch_callbacks.append(callback)
+
+        if len(self.hw_switch_callbacks) == 1:
+            self.net_connection.send('SA:')
+
+    def cancel_hw_switch_states(self, callback):
+        # The answer to our SA: might have been lost. Once no callbacks are
+        # waiting for it, the next request sends a new SA:.
+        if callback in self.hw_switch_callbacks:
+            self.hw_switch_callbacks.remove(callback)
 
     def receive_id(self, msg):
         pass
@@ -448,6 +545,12 @@ class HardwarePlatform(Platform):
 
         self.hw_switch_data = hw_states
 
+        callbacks = self.hw_switch_callbacks
+        self.hw_switch_callbacks = list()
+
+        for callback in callbacks:
+            callback(hw_states)
+
     def configure_driver(self, config, device_type='coil'):
 
         if not self.net_connection:
@@ -564,7 +667,7 @@ class HardwarePlatform(Platform):
             sys.exit()
 
         if not self.flag_led_tick_registered:
-            self.machine.events.add_handler('timer_tick', self.update_leds)
+            self.machine.events.add_handler('timer_tick', self.send_leds)
             self.flag_led_tick_registered = True
 
         # if the LED number is in <channel> - <led> format, convert it to a
@@ -581,7 +684,7 @@ class HardwarePlatform(Platform):
         else:
             config['number'] = Util.normalize_hex_string(config['number'])
 
-        this_fast_led = FASTDirectLED(config['number'])
+        this_fast_led = FASTDirectLED(config['number'], self.dirty_leds)
         self.fast_leds.add(this_fast_led)
 
         return this_fast_led
@@ -1086,9 +1189,10 @@ class FASTMatrixLight(object):
 
 class FASTDirectLED(object):
 
-    def __init__(self, number):
+    def __init__(self, number, dirty_leds):
         self.log = logging.getLogger('FASTLED')
         self.number = number
+        self.dirty_leds = dirty_leds
 
         self.current_color = '000000'
 
@@ -1102,7 +1206,12 @@ class FASTDirectLED(object):
         return tuple(int(value[i:i + lv // 3], 16) for i in range(0, lv, lv // 3))
 
     def rgb_to_hex(self, rgb):
-        return '%02x%02x%02x' % (rgb[0], rgb[1], rgb[2])
+        return HEX_BYTES[rgb[0]] + HEX_BYTES[rgb[1]] + HEX_BYTES[rgb[2]]
+
+    def _set_color(self, color):
+        if color != self.current_color:
+            self.current_color = color
+            self.dirty_leds.add(self)
 
     def color(self, color):
         """Instantly sets this LED to the color passed.
@@ -1111,10 +1220,7 @@ class FASTDirectLED(object):
             color: a 3-item list of integers representing R, G, and B values,
             0-255 each.
         """
-
-        self.current_color = self.rgb_to_hex(color)
-        # todo this is crazy inefficient right now. todo change it so it can use
-        # hex strings as the color throughout
+        self._set_color(self.rgb_to_hex(color))
 
     def fade(self, color, fade_ms):
         # todo
@@ -1125,11 +1231,10 @@ class FASTDirectLED(object):
         """Disables (turns off) this LED instantly. For multi-color LEDs it
         turns all elements off.
         """
-
-        self.current_color = '000000'
+        self._set_color('000000')
 
     def enable(self):
-        self.current_color = 'ffffff'
+        self._set_color('ffffff')
 
 
 class FASTDMD(object):
@@ -1146,11 +1251,14 @@ class FASTDMD(object):
         self.machine.events.add_handler('timer_tick', self.tick)
 
     def update(self, data):
+        """Updates the DMD with a new frame.
 
-        try:
-            self.dmd_frame = bytearray(data)
-        except TypeError:
-            pass
+        Args:
+            data: A bytearray of the frame. It's not copied, since BCP double
+                buffers the frames it receives.
+
+        """
+        self.dmd_frame = data
 
     def tick(self):
         self.send('BM:' + self.dmd_frame)
@@ -1158,6 +1266,18 @@ class FASTDMD(object):
 
 class SerialCommunicator(object):
 
+    frame_commands = ('BM:',)
+    """Commands which send a complete DMD frame. If the send queue is full,
+    the oldest frame is dropped, and a queued frame is replaced by a newer
+    one. (RS: only has the LEDs which changed, so RS: and RA: have to be sent
+    in order, and neither of them can be dropped.)
+    """
+
+    state_commands = ('WD:', 'GI:', 'L1:')
+    """Commands which set the state of something. A queued one is replaced
+    by a newer one for the same watchdog, GI string or light. Everything else
+    (drivers, switches, hw rules) waits for room in the queue."""
+
     def __init__(self, machine, platform, port, baud, send_queue, receive_queue):
         self.machine = machine
         self.platform = platform
@@ -1326,10 +1446,22 @@ class SerialCommunicator(object):
                 be added automatically.
 
         """
-        if self.dmd:
-            self.send_queue.put(msg)
+        cmd = msg[:3]
+
+        if cmd in self.frame_commands:
+            policy = DROP_OLDEST
+            key = cmd
+        elif cmd in self.state_commands:
+            policy = COALESCE
+            key = msg.split(',', 1)[0]
         else:
-            self.send_queue.put(msg + '\r')
+            policy = BLOCK
+            key = None
+
+        if not self.dmd:
+            msg += '\r'
+
+        self.send_queue.put(msg, policy, key)
 
     def _sending_loop(self):
 
@@ -1364,6 +1496,7 @@ class SerialCommunicator(object):
 
                     if msg not in self.ignored_messages:
                         self.receive_queue.put(msg)
+                        self.machine.wakeup()
 
             except Exception:
                 exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -11,12 +11,12 @@
 
 import logging
 import socket
-from Queue import Queue
 import threading
 import sys
 import traceback
 
 from mpf.system.platform import Platform
+from mpf.system.send_queue import SendQueue, BLOCK, DROP_OLDEST
 
 
 class HardwarePlatform(Platform):
@@ -85,6 +85,11 @@ class OpenPixelClient(object):
         port: Int of the TCP port of the server to connect to.
 
     """
+
+    sending_queue_size = 50
+    """Maximum number of messages waiting to be sent to the OPC server. Only
+    the newest frame of each channel is kept in the queue."""
+
     def __init__(self, machine, config):
 
         self.log = logging.getLogger('OpenPixelClient')
@@ -92,7 +97,7 @@ class OpenPixelClient(object):
         self.machine = machine
         self.dirty = True
         self.update_every_tick = False
-        self.sending_queue = Queue()
+        self.sending_queue = SendQueue(self.sending_queue_size, 'opc')
         self.sending_thread = None
         self.channels = list()
 
@@ -182,16 +187,20 @@ class OpenPixelClient(object):
             g = min(255, max(0, int(g)))
             b = min(255, max(0, int(b)))
             pieces.append(chr(r) + chr(g) + chr(b))
-        self.send(''.join(pieces))
+        self.send(''.join(pieces), DROP_OLDEST, channel)
 
-    def send(self, message):
+    def send(self, message, policy=BLOCK, key=None):
         """Puts a message on the queue to be sent to the OPC server.
 
         Args:
             message: The raw message you want to send. No processing is done on
                 this. It's sent however it comes in.
+            policy: What to do if the sending queue is full. See
+                SendQueue.put().
+            key: Optional key. A queued message with the same key is replaced
+                by this one.
         """
-        self.sending_queue.put(message)
+        self.sending_queue.put(message, policy, key)
 
 
 class OPCThread(threading.Thread):
@@ -199,7 +208,8 @@ class OPCThread(threading.Thread):
 
     Args:
         machine: The main ``MachineController`` instance.
-        queue: The Queue() object that receives OPC messages for the OPC server.
+        queue: The SendQueue() object that receives OPC messages for the OPC
+            server.
         config: Dictionary of configuration settings.
 
     The OPC connection is handled in a separate thread so it doesn't bog down
@@ -286,7 +296,7 @@ class OPCThread(threading.Thread):
                     self.connect()
                     # don't want to build up stale pixel data while we're not
                     # connected
-                    self.sending_queue.queue.clear()
+                    self.sending_queue.clear()
                     self.log.warning('Discarding stale pixel data from the queue.')
 
         except Exception:
@@ -21,6 +21,7 @@ import io
 from copy import deepcopy
 
 from mpf.system.platform import Platform
+from mpf.system.send_queue import SendQueue, BLOCK, COALESCE
 from mpf.system.config import Config
 from mpf.system.utility_functions import Util
 
@@ -126,24 +127,48 @@ class OppRs232Intf:
           0x3e, 0x39, 0x30, 0x37, 0x22, 0x25, 0x2c, 0x2b, 0x06, 0x01, 0x08, 0x0f, 0x1a, 0x1d, 0x14, 0x13, \
           0xae, 0xa9, 0xa0, 0xa7, 0xb2, 0xb5, 0xbc, 0xbb, 0x96, 0x91, 0x98, 0x9f, 0x8a, 0x8d, 0x84, 0x83, \
           0xde, 0xd9, 0xd0, 0xd7, 0xc2, 0xc5, 0xcc, 0xcb, 0xe6, 0xe1, 0xe8, 0xef, 0xfa, 0xfd, 0xf4, 0xf3 ]
-    
+
+    CRC8_TABLE = bytearray(CRC8_LOOKUP)
+
     @staticmethod
-    def calc_crc8_whole_msg(msgChars):
+    def calc_crc8(data):
+        """Returns the CRC8 of a bytearray as an int."""
         crc8Byte = 0xff
-        for indChar in msgChars:
-            indInt = ord(indChar)
-            crc8Byte = OppRs232Intf.CRC8_LOOKUP[crc8Byte ^ indInt];
-        return (chr(crc8Byte))
+        table = OppRs232Intf.CRC8_TABLE
+        for byte in data:
+            crc8Byte = table[crc8Byte ^ byte]
+        return crc8Byte
+
+    @staticmethod
+    def add_msg(buf, msg):
+        """Appends a message and its CRC8 to a bytearray.
+
+        Args:
+            buf: The bytearray to append to.
+            msg: A bytearray or a tuple of ints of the message bytes.
+
+        """
+        start = len(buf)
+        buf.extend(msg)
+        buf.append(OppRs232Intf.calc_crc8(buf[start:]))
+
+    @staticmethod
+    def calc_crc8_whole_msg(msgChars):
+        return chr(OppRs232Intf.calc_crc8(bytearray(''.join(msgChars))))
 
     @staticmethod
     def calc_crc8_part_msg(msgChars, startIndex, numChars):
-        crc8Byte = 0xff
-        index = 0
-        while index < numChars:
-            indInt = ord(msgChars[startIndex + index])
-            crc8Byte = OppRs232Intf.CRC8_LOOKUP[crc8Byte ^ indInt];
-            index += 1
-        return (chr(crc8Byte))
+        return chr(OppRs232Intf.calc_crc8(
+            bytearray(msgChars[startIndex:startIndex + numChars])))
+
+# Int values of the commands which are built in bytearrays
+EOM_CMD = ord(OppRs232Intf.EOM_CMD)
+INCAND_CMD = ord(OppRs232Intf.INCAND_CMD)
+INCAND_SET_ON_OFF = ord(OppRs232Intf.INCAND_SET_ON_OFF)
+CHNG_NEO_COLOR_TBL = ord(OppRs232Intf.CHNG_NEO_COLOR_TBL)
+SET_IND_NEO_CMD = ord(OppRs232Intf.SET_IND_NEO_CMD)
+NEO_CMD_ON = OppRs232Intf.NEO_CMD_ON
+
 
 class HardwarePlatform(Platform):
     """Platform class for the OPP hardware.
@@ -153,6 +178,9 @@ class HardwarePlatform(Platform):
 
     """
 
+    send_queue_size = 200
+    """Maximum number of messages waiting to be sent to the OPP boards."""
+
     def __init__(self, machine):
         super(HardwarePlatform, self).__init__(machine)
         self.log = logging.getLogger('OPP')
@@ -192,10 +220,12 @@ class HardwarePlatform(Platform):
         self.opp_neopixels = []
         self.neoCardDict = dict()
         self.neoDict = dict()
+        self.neo_dirty = False
         self.incand_reg = False
         self.numGen2Brd = 0
         self.gen2AddrArr = []
         self.currInpData = []
+        self.switch_batch = []
         self.badCRC = 0
         self.oppFirmwareVers = []
         self.minVersion = 0xffffffff
@@ -241,6 +271,10 @@ class HardwarePlatform(Platform):
     def __repr__(self):
         return '<Platform.OPP>'
 
+    def initialize(self):
+        self.machine.events.add_handler('init_phase_3',
+                                        self._map_input_switches)
+
     def process_received_message(self, msg):
         """Sends an incoming message from the OPP hardware to the proper
         method for servicing.
@@ -283,7 +317,8 @@ class HardwarePlatform(Platform):
         for port in self.config['ports']:
             self.connection_threads.add(SerialCommunicator(
                 platform=self, port=port, baud=self.config['baud'],
-                send_queue=Queue.Queue(), receive_queue=self.receive_queue))
+                send_queue=SendQueue(self.send_queue_size, 'opp.' + port),
+                receive_queue=self.receive_queue))
 
     def register_processor_connection(self, name, communicator):
         """Once a communication link has been established with one of the
@@ -306,29 +341,54 @@ class HardwarePlatform(Platform):
 
         """
 
-        wholeMsg = []
+        wholeMsg = bytearray()
         for incand in self.opp_incands:
             # Check if any changes have been made
             if ((incand.oldState ^ incand.newState) != 0):
                 # Update card
-                incand.oldState = incand.newState
-                msg = []
-                msg.append(incand.addr)
-                msg.append(OppRs232Intf.INCAND_CMD)
-                msg.append(OppRs232Intf.INCAND_SET_ON_OFF)
-                msg.append(chr((incand.newState >> 24) & 0xff))
-                msg.append(chr((incand.newState >> 16) & 0xff))
-                msg.append(chr((incand.newState >> 8) & 0xff))
-                msg.append(chr(incand.newState & 0xff))
-                msg.append(OppRs232Intf.calc_crc8_whole_msg(msg))
-                wholeMsg.extend(msg)
-
-        if (len(wholeMsg) != 0):
-            wholeMsg.append(OppRs232Intf.EOM_CMD)
-            sendCmd = ''.join(wholeMsg)
-
-            self.opp_connection.send(sendCmd)
-            self.log.debug("Update incand cmd:%s", "".join(" 0x%02x" % ord(b) for b in sendCmd))
+                incand.oldState = state = incand.newState
+                OppRs232Intf.add_msg(wholeMsg, (
+                    incand.addrInt, INCAND_CMD, INCAND_SET_ON_OFF,
+                    (state >> 24) & 0xff, (state >> 16) & 0xff,
+                    (state >> 8) & 0xff, state & 0xff))
+
+        if wholeMsg:
+            wholeMsg.append(EOM_CMD)
+            self._send_bytes(wholeMsg, "Update incand cmd")
+
+    def update_neopixels(self):
+        """Sends the neopixels which changed since the last tick. The color
+        table changes and the new colors of all the cards are sent together
+        as one message.
+
+        """
+        wholeMsg = bytearray()
+        for card in self.opp_neopixels:
+            if card.pending:
+                card.add_update_msg(wholeMsg)
+
+        self.neo_dirty = False
+
+        if wholeMsg:
+            wholeMsg.append(EOM_CMD)
+            self._send_bytes(wholeMsg, "Update neopixels cmd")
+
+    def _send_bytes(self, msg, description):
+        cmd = str(msg)
+        self.opp_connection.send(cmd)
+
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("%s:%s", description,
+                           "".join(" 0x%02x" % b for b in msg))
+
+    def _map_input_switches(self):
+        # Looks up the switch object of each input bit once the switch
+        # controller knows them, so a changed bit is a list lookup
+        switches_by_number = self.machine.switch_controller.switches_by_number
+
+        for oppInp in self.opp_inputs:
+            oppInp.switches = [switches_by_number.get(number)
+                               for number in oppInp.numbers]
 
     def get_hw_switch_states(self):
         hw_states = dict()
@@ -489,20 +549,23 @@ class HardwarePlatform(Platform):
                 (ord(msg[4]) << 8) | \
                 ord(msg[5])
 
-            # Update the state which holds inputs that are active
+            # Queue the inputs which changed. They're sent to the switch
+            # controller together once all the responses of this tick are
+            # processed. An input is active when its bit is 0.
             if hasattr(oppInp.machine, 'switch_controller'):
                 changes = oppInp.oldState ^ newState
-                if (changes != 0):
-                    currBit = 1
-                    for index in range(0, 32):
-                        if ((currBit & changes) != 0):
-                            if ((currBit & newState) == 0):
-                                oppInp.machine.switch_controller.process_switch(state=1,
-                                    num=oppInp.cardNum + '-' + str(index))
-                            else:
-                                oppInp.machine.switch_controller.process_switch(state=0,
-                                    num=oppInp.cardNum + '-' + str(index))
-                        currBit <<= 1
+                while changes:
+                    bit = changes & -changes  # lowest changed bit
+                    changes ^= bit
+                    index = bit.bit_length() - 1
+                    switch = oppInp.switches[index]
+
+                    if switch:
+                        self.switch_batch.append((switch, not newState & bit))
+                    else:
+                        oppInp.machine.switch_controller.process_switch(
+                            state=not newState & bit,
+                            num=oppInp.numbers[index])
             oppInp.oldState = newState
 
     def configure_driver(self, config, device_type='coil'):
@@ -617,11 +680,22 @@ class HardwarePlatform(Platform):
             if (currTick == 5):            
                 self.update_incand()
 
+        if self.neo_dirty:
+            self.update_neopixels()
+
         while not self.receive_queue.empty():
             self.process_received_message(self.receive_queue.get(False))
 
+        if self.switch_batch:
+            batch = self.switch_batch
+            self.switch_batch = []
+            self.machine.switch_controller.process_switches(batch)
+
         if (currTick == 0):
-            self.opp_connection.send(self.read_input_msg)
+            # if the last poll is still waiting to be sent, don't queue
+            # another one
+            self.opp_connection.send(self.read_input_msg, COALESCE,
+                                     'read_inputs')
 
     def write_hw_rule(self, switch_obj, sw_activity, driver_obj, driver_action,
                       disable_on_release=True, drive_now=True,
@@ -761,6 +835,7 @@ class OPPIncandCard(object):
     def __init__(self, addr, mask, incandDict):
         self.log = logging.getLogger('OPPIncand')
         self.addr = addr
+        self.addrInt = ord(addr)
         self.oldState = 0
         self.newState = 0
         self.mask = mask
@@ -779,22 +854,19 @@ class OPPIncand(object):
     def __init__(self, incandCard, number):
         self.incandCard = incandCard
         self.number = number
-
+        _, incand = number.split("-")
+        self.currBit = (1 << int(incand))
 
     def off(self):
         """Disables (turns off) this matrix light."""
-        _, incand = self.number.split("-")
-        currBit = (1 << int(incand))
-        self.incandCard.newState &= ~currBit
+        self.incandCard.newState &= ~self.currBit
 
     def on(self, brightness=255, fade_ms=0, start=0):
         """Enables (turns on) this driver."""
-        _, incand = self.number.split("-")
-        currBit = (1 << int(incand))
         if brightness == 0:
-            self.incandCard.newState &= ~currBit
+            self.incandCard.newState &= ~self.currBit
         else:
-            self.incandCard.newState |= currBit
+            self.incandCard.newState |= self.currBit
 
 class OPPSolenoid(object):
 
@@ -963,6 +1035,9 @@ class OPPInput(object):
         self.mask = mask
         self.cardNum = str(ord(addr) - ord(OppRs232Intf.CARD_ID_GEN2_CARD))
         self.machine = machine
+        self.numbers = [self.cardNum + '-' + str(index)
+                        for index in range(32)]
+        self.switches = [None] * 32
 
         self.log.debug("Creating OPP Input at hardware address: 0x%02x",
             ord(addr))
@@ -973,15 +1048,30 @@ class OPPInput(object):
                 inpDict[self.cardNum + '-' + str(index)] = self
 
 class OPPNeopixelCard(object):
+    """A neopixel wing. Pixel colors are set through a table of 32 colors on
+    the card, so each new color is first written to a free table entry. When
+    the table is full, the least recently used color which no pixel shows
+    anymore is replaced.
+
+    """
 
     def __init__(self, addr, neoCardDict, platform):
         self.log = logging.getLogger('OPPNeopixel')
         self.addr = addr
+        self.addrInt = ord(addr)
         self.platform = platform
         self.card = str(ord(addr) - ord(OppRs232Intf.CARD_ID_GEN2_CARD))
         self.numPixels = 0
         self.numColorEntries = 0
         self.colorTableDict = dict()
+        self.entryColors = [None] * OppRs232Intf.NUM_COLOR_TBL
+        self.entryUsers = [0] * OppRs232Intf.NUM_COLOR_TBL
+        self.entryLastUsed = [0] * OppRs232Intf.NUM_COLOR_TBL
+        self.pixelEntries = dict()
+        self.setPixelMsgs = dict()
+        self.pending = dict()
+        self.updateCount = 0
+        self.tableFull = False
         neoCardDict[self.card] = self
 
         self.log.debug("Creating OPP Neopixel card at hardware address: 0x%02x",
@@ -995,70 +1085,138 @@ class OPPNeopixelCard(object):
         neoDict[pixel_number] = pixel
         return pixel
 
+    def set_pixel(self, index, color):
+        """Queues a new color for a pixel. It's sent on the next tick."""
+        self.pending[index] = color
+        self.platform.neo_dirty = True
+
+    def add_update_msg(self, wholeMsg):
+        """Appends the messages which update the color table and the pending
+        pixels to a bytearray. Pixels are sent in the order of their index.
+
+        """
+        self.updateCount += 1
+        pending = self.pending
+        deferred = self._add_pixel_msgs(pending, wholeMsg)
+
+        if deferred and len(deferred) < len(pending):
+            # the other pixels may have freed table entries
+            deferred = self._add_pixel_msgs(deferred, wholeMsg)
+
+        if deferred and not self.tableFull:
+            self.log.warning("Neo color table is full. OPP only supports 32 "
+                             "colors at a time per card.")
+
+        self.tableFull = bool(deferred)
+        self.pending = deferred
+
+        if deferred:
+            self.platform.neo_dirty = True
+
+    def _add_pixel_msgs(self, pixels, wholeMsg):
+        # Adds the messages for a dict of pixel indexes and colors. Returns a
+        # dict of the ones which couldn't get a color table entry.
+        deferred = dict()
+        colorTableDict = self.colorTableDict
+        entryUsers = self.entryUsers
+        entryLastUsed = self.entryLastUsed
+        pixelEntries = self.pixelEntries
+        setPixelMsgs = self.setPixelMsgs
+        updateCount = self.updateCount
+
+        for index in sorted(pixels):
+            color = pixels[index]
+            entry = colorTableDict.get(color)
+
+            if entry is None:
+                entry = self._add_color(color, wholeMsg)
+
+                if entry is None:
+                    # try again once a table entry is free
+                    deferred[index] = color
+                    continue
+
+            entryLastUsed[entry] = updateCount
+
+            oldEntry = pixelEntries.get(index)
+            if oldEntry == entry:
+                continue
+            if oldEntry is not None:
+                entryUsers[oldEntry] -= 1
+            entryUsers[entry] += 1
+            pixelEntries[index] = entry
+
+            # the set pixel messages are cached since there are only 32
+            # possible ones per pixel
+            msg = setPixelMsgs.get((index, entry))
+            if msg is None:
+                msg = bytearray()
+                OppRs232Intf.add_msg(msg, (self.addrInt, SET_IND_NEO_CMD,
+                                           index, NEO_CMD_ON + entry))
+                msg = setPixelMsgs[(index, entry)] = str(msg)
+
+            wholeMsg.extend(msg)
+
+        return deferred
+
+    def _add_color(self, color, wholeMsg):
+        # Adds a color to the color table and returns its entry, or None if
+        # there's no free entry
+        if self.numColorEntries < OppRs232Intf.NUM_COLOR_TBL:
+            entry = self.numColorEntries
+            self.numColorEntries += 1
+
+        else:
+            entry = None
+            lastUsed = None
+
+            # find the least recently used entry no pixel shows
+            for index, users in enumerate(self.entryUsers):
+                if not users and (entry is None or
+                                  self.entryLastUsed[index] < lastUsed):
+                    entry = index
+                    lastUsed = self.entryLastUsed[index]
+
+            if entry is None:
+                return None
+
+            del self.colorTableDict[self.entryColors[entry]]
+
+        self.colorTableDict[color] = entry
+        self.entryColors[entry] = color
+
+        red, green, blue = color
+        OppRs232Intf.add_msg(wholeMsg, (self.addrInt, CHNG_NEO_COLOR_TBL,
+                                        entry, green, red, blue))
+        return entry
+
+
 class OPPNeopixel(object):
 
     def __init__(self, number, neoCard):
         self.log = logging.getLogger('OPPNeopixel')
         self.number = number
-        self.current_color = '000000'
+        self.current_color = None
         self.neoCard = neoCard
         _, index = number.split('-')
-        self.index_char = chr(int(index))
+        self.index = int(index)
 
         self.log.debug("Creating OPP Neopixel: %s",
             number)
-        
-    def rgb_to_hex(self, rgb):
-        return '%02x%02x%02x' % (rgb[0], rgb[1], rgb[2])
 
     def color(self, color):
-        """Instantly sets this LED to the color passed.
+        """Sets this LED to the color passed. It's sent to the hardware with
+        the other pixels which changed on the next tick.
 
         Args:
             color: a 3-item list of integers representing R, G, and B values,
             0-255 each.
         """
+        color = tuple(color)
 
-        # todo this is crazy inefficient right now. todo change it so it can use
-        # hex strings as the color throughout
-        new_color = self.rgb_to_hex(color)
-        error = False
-
-        # Check if this color exists in the color table
-        if not new_color in self.neoCard.colorTableDict:
-            # Check if there are available spaces in the table
-            if (self.neoCard.numColorEntries < 32):
-                # Send the command to add color table entry
-                self.neoCard.colorTableDict[new_color] = \
-                    chr(self.neoCard.numColorEntries + OppRs232Intf.NEO_CMD_ON)
-                msg = []
-                msg.append(self.neoCard.addr)
-                msg.append(OppRs232Intf.CHNG_NEO_COLOR_TBL)
-                msg.append(chr(self.neoCard.numColorEntries))
-                msg.append(chr(int(new_color[2:4],16)))
-                msg.append(chr(int(new_color[:2],16)))
-                msg.append(chr(int(new_color[-2:],16)))
-                msg.append(OppRs232Intf.calc_crc8_whole_msg(msg))
-                cmd = ''.join(msg)
-                self.log.debug("Add Neo color table entry: %s", "".join(" 0x%02x" % ord(b) for b in cmd))
-                self.neoCard.platform.opp_connection.send(cmd)
-                self.neoCard.numColorEntries += 1
-            else:
-                error = True
-                self.log.warn("Not enough Neo color table entries. "
-                              "OPP only supports 32.")
-
-        # Send msg to set the neopixel
-        if (not error):
-            msg = []
-            msg.append(self.neoCard.addr)
-            msg.append(OppRs232Intf.SET_IND_NEO_CMD)
-            msg.append(self.index_char)
-            msg.append(self.neoCard.colorTableDict[new_color])
-            msg.append(OppRs232Intf.calc_crc8_whole_msg(msg))
-            cmd = ''.join(msg)
-            self.log.debug("Set Neopixel color: %s", "".join(" 0x%02x" % ord(b) for b in cmd))
-            self.neoCard.platform.opp_connection.send(cmd)
+        if color != self.current_color:
+            self.current_color = color
+            self.neoCard.set_pixel(self.index, color)
 
 class SerialCommunicator(object):
 
@@ -1217,15 +1375,18 @@ class SerialCommunicator(object):
 
         # todo clear the hw?
 
-    def send(self, msg):
+    def send(self, msg, policy=BLOCK, key=None):
         """Sends a message to the remote processor over the serial connection.
 
         Args:
             msg: String of the message you want to send. We don't need no
             steenking line feed character
+            policy: What to do if the send queue is full. See SendQueue.put().
+            key: Optional key. A queued message with the same key is replaced
+                by this one.
 
         """
-        self.send_queue.put(msg)
+        self.send_queue.put(msg, policy, key)
 
     def _sending_loop(self):
 
@@ -1266,6 +1427,7 @@ class SerialCommunicator(object):
                         # Only command expect to receive back is
                         if (self.partMsg[1] == OppRs232Intf.READ_GEN2_INP_CMD):
                             self.receive_queue.put(self.partMsg[:7])
+                            self.machine.wakeup()
                             self.partMsg = self.partMsg[7:]
                             strlen -= 7
                         else:
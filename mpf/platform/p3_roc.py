@@ -34,6 +34,7 @@ except:
 
 from mpf.system.platform import Platform
 from mpf.system.config import Config
+from mpf.system.timing import Timing
 
 proc_output_module = 3
 proc_pdb_bus_addr = 0xC00
@@ -81,6 +82,27 @@ class HardwarePlatform(Platform):
         self.machine_type = pinproc.normalize_machine_type(
             self.machine.config['hardware']['driverboards'])
 
+        config_spec = '''
+                    watchdog_tickle_interval: ms|250
+                    flush_interval: ms|100
+                    '''
+
+        self.config = Config.process_config(
+            config_spec=config_spec, source=self.machine.config['p_roc'])
+
+        self.watchdog_tickle_secs = (
+            self.config['watchdog_tickle_interval'] / 1000.0)
+        self.flush_secs = self.config['flush_interval'] / 1000.0
+        self.next_watchdog_tickle = 0
+        self.next_flush = 0
+        self.last_flush_tick = None
+
+        self.switch_batch = list()
+        self.usb_stats_start = None
+        self.usb_reads = 0
+        self.usb_tickles = 0
+        self.usb_flushes = 0
+
         # Connect to the P3-ROC. Keep trying if it doesn't work the first time.
 
         self.proc = None
@@ -113,8 +135,27 @@ class HardwarePlatform(Platform):
         return '<Platform.P3-ROC>'
 
     def stop(self):
+        self.log.info("USB stats: %s", self.get_usb_stats())
         self.proc.reset(1)
 
+    def get_usb_stats(self):
+        """Returns a dictionary with the number of USB transactions (event
+        reads, watchdog tickles and flushes) MPF made with the P3-ROC, and
+        how many of them it made per second.
+
+        """
+        transactions = self.usb_reads + self.usb_tickles + self.usb_flushes
+
+        if self.usb_stats_start is None:
+            secs = 0
+        else:
+            secs = time.time() - self.usb_stats_start
+
+        return dict(reads=self.usb_reads, watchdog_tickles=self.usb_tickles,
+                    flushes=self.usb_flushes,
+                    transactions_per_sec=(round(transactions / secs, 1)
+                                          if secs else 0))
+
     def configure_driver(self, config, device_type='coil'):
         """ Creates a P3-ROC driver.
 
@@ -274,9 +315,23 @@ class HardwarePlatform(Platform):
     def tick(self):
         """Checks the P3-ROC for any events (switch state changes).
 
-        Also tickles the watchdog and flushes any queued commands to the P3-ROC.
+        The switch changes are processed as one batch. Queued commands are
+        only flushed to the P3-ROC when they could have changed (after switch
+        changes or a machine tick) or once per flush_interval, and the
+        watchdog is tickled once per watchdog_tickle_interval, rather than
+        making these USB transactions every time the hardware is polled.
+
         """
-        # Get P3-ROC events
+        now = time.time()
+
+        if self.usb_stats_start is None:
+            self.usb_stats_start = now
+
+        batch = self.switch_batch
+        switches = self.machine.switch_controller.switches_by_number
+
+        # Get P3-ROC events (switches & DMD frames displayed)
+        self.usb_reads += 1
         for event in self.proc.get_events():
             event_type = event['type']
             event_value = event['value']
@@ -285,25 +340,49 @@ class HardwarePlatform(Platform):
             elif event_type == pinproc.EventTypeDMDFrameDisplayed:
                 pass
             elif event_type == pinproc.EventTypeSwitchClosedDebounced:
-                self.machine.switch_controller.process_switch(state=1,
-                                                              num=event_value)
+                self._add_switch_event(switches, event_value, 1, True)
             elif event_type == pinproc.EventTypeSwitchOpenDebounced:
-                self.machine.switch_controller.process_switch(state=0,
-                                                              num=event_value)
+                self._add_switch_event(switches, event_value, 0, True)
             elif event_type == pinproc.EventTypeSwitchClosedNondebounced:
-                self.machine.switch_controller.process_switch(state=1,
-                                                              num=event_value,
-                                                              debounced=False)
+                self._add_switch_event(switches, event_value, 1, False)
             elif event_type == pinproc.EventTypeSwitchOpenNondebounced:
-                self.machine.switch_controller.process_switch(state=0,
-                                                              num=event_value,
-                                                              debounced=False)
+                self._add_switch_event(switches, event_value, 0, False)
             else:
                 self.log.warning("Received unrecognized event from the P3-ROC. "
                                  "Type: %s, Value: %s", event_type, event_value)
 
-        self.proc.watchdog_tickle()
-        self.proc.flush()
+        flush = False
+
+        if batch:
+            self.machine.switch_controller.process_switches(batch)
+            del batch[:]
+            flush = True
+
+        if now >= self.next_watchdog_tickle:
+            self.proc.watchdog_tickle()
+            self.usb_tickles += 1
+            self.next_watchdog_tickle = now + self.watchdog_tickle_secs
+            flush = True
+
+        if (flush or Timing.tick != self.last_flush_tick or
+                now >= self.next_flush):
+            self.proc.flush()
+            self.usb_flushes += 1
+            self.last_flush_tick = Timing.tick
+            self.next_flush = now + self.flush_secs
+
+    def _add_switch_event(self, switches, num, state, debounced):
+        # Adds a switch event to this tick's batch
+        obj = switches.get(num)
+
+        if not obj:  # let the switch controller warn about it
+            self.machine.switch_controller.process_switch(
+                num=num, state=state, debounced=debounced)
+
+        # Non-debounced events are only used for switches which are
+        # configured to not be debounced.
+        elif debounced or not obj.config['debounce']:
+            self.switch_batch.append((obj, state))
 
     def write_hw_rule(self, switch_obj, sw_activity, driver_obj, driver_action,
                       disable_on_release, drive_now,
@@ -61,12 +61,12 @@ class HardwarePlatform(Platform):
         return self
 
     def update_non_thread(self, data):
-        try:
-            self.dmd_frame = bytearray(data)
-        except TypeError:
-            pass
+        # BCP double buffers the frames it receives, so the frame doesn't
+        # need to be copied
+        self.dmd_frame = data
 
     def update_separate_thread(self, data):
+        # The sender thread can fall behind, so it gets its own copy
         self.queue.put(bytearray(data))
 
     def tick(self):
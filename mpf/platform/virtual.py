@@ -41,6 +41,7 @@ class HardwarePlatform(Platform):
         self.features['hw_rule_coil_delay'] = False
         self.features['variable_recycle_time'] = False
         self.features['variable_debounce_time'] = False
+        self.features['tick_on_wakeup'] = True
 
         # Make the platform features available to everyone
         self.machine.config['platform'] = self.features
@@ -15,21 +15,73 @@
 
 import logging
 import socket
+import struct
 import threading
 import sys
 import traceback
 import urllib
 import urlparse
-from Queue import Queue
+from collections import OrderedDict
+from Queue import Queue, Empty
 import copy
 
 from mpf.system.player import Player
+from mpf.system.send_queue import SendQueue, DROP_OLDEST
 from mpf.system.utility_functions import Util
 from mpf.devices.shot import Shot
 from mpf.system.light_controller import ExternalShow
 import version
 
 
+command_schemas = dict()
+"""Dictionary of BCP command names to dictionaries of parameter names and the
+types decode_command_string() converts their values to. See
+register_command_schema().
+"""
+
+_names = dict()
+_max_names = 1000
+
+
+def register_command_schema(bcp_command, **param_types):
+    """Registers the types of the parameters of a BCP command, so
+    decode_command_string() converts their values from strings.
+
+    Args:
+        bcp_command: String name of the BCP command.
+        **param_types: Pairs of parameter names and the types (or any callable
+            which takes a string) to convert their values with.
+
+    Example:
+        register_command_schema('player_score', value=int, player_num=int)
+
+    Values which can't be converted are left as strings.
+
+    """
+    command_schemas[_get_name(bcp_command)] = dict(
+        (_get_name(k), v) for k, v in param_types.iteritems())
+
+
+def _get_name(raw_name):
+    # Returns the unquoted, lowercase and interned version of a command or
+    # parameter name. They're cached since the same few names are used over
+    # and over.
+    try:
+        return _names[raw_name]
+    except KeyError:
+        pass
+
+    name = urllib.unquote_plus(raw_name).lower()
+
+    if type(name) is str:
+        name = intern(name)
+
+    if len(_names) < _max_names:
+        _names[raw_name] = name
+
+    return name
+
+
 def decode_command_string(bcp_string):
     """Decodes a BCP command string into separate command and paramter parts.
 
@@ -45,19 +97,43 @@ def decode_command_string(bcp_string):
 
     Note that BCP commands and parameter names are not case-sensitive and will
     be converted to lowercase. Parameter values are case sensitive, and case
-    will be preserved.
+    will be preserved. Parameters without a value are skipped, and if a
+    parameter is in the string more than once, the first value is used.
+
+    Parameter values are strings unless a schema was registered for the
+    command with register_command_schema().
 
     """
-    bcp_command = urlparse.urlsplit(bcp_string)
-    try:
-        kwargs = urlparse.parse_qs(bcp_command.query)
+    bcp_command, _, query = bcp_string.partition('?')
+    bcp_command = _get_name(bcp_command)
+    kwargs = dict()
+
+    if query:
+        for pair in query.split('&'):
+            name, _, value = pair.partition('=')
+
+            if not value:
+                continue
 
-    except AttributeError:
-        kwargs = dict()
+            name = _get_name(name)
 
-    return (bcp_command.path.lower(),
-            dict((k.lower(), urllib.unquote(v[0]))
-                for k,v in kwargs.iteritems()))
+            if name in kwargs:
+                continue
+
+            if '%' in value or '+' in value:
+                value = urllib.unquote_plus(value)
+
+            kwargs[name] = value
+
+        if bcp_command in command_schemas:
+            for name, param_type in command_schemas[bcp_command].iteritems():
+                if name in kwargs:
+                    try:
+                        kwargs[name] = param_type(kwargs[name])
+                    except (TypeError, ValueError):
+                        pass
+
+    return bcp_command, kwargs
 
 
 def encode_command_string(bcp_command, **kwargs):
@@ -97,6 +173,88 @@ def encode_command_string(bcp_command, **kwargs):
                                         kwarg_string, None)), 'utf-8')
 
 
+frame_marker = '\x00'
+"""First byte of a length-prefixed frame. BCP command strings never start
+with it, so frames and newline separated commands can be told apart on the
+same connection.
+"""
+
+frame_header = struct.Struct('>cI')  # frame marker, payload length
+
+
+def pack_messages(messages, framing=None):
+    """Packs a list of BCP command strings into a single string which can be
+    sent with one socket write.
+
+    Args:
+        messages: List of encoded BCP command strings.
+        framing: String name of the framing mode which was negotiated with the
+            remote host via 'hello'. None sends the messages as newline
+            separated lines. 'length' sends them as one frame made of a frame
+            marker, the length of the payload as a 4-byte big endian int, and
+            the newline separated messages as the payload.
+
+    Returns:
+        A byte string.
+
+    """
+    payload = '\n'.join(messages).encode('utf-8')
+
+    if framing == 'length':
+        return frame_header.pack(frame_marker, len(payload)) + payload
+    else:
+        return payload + '\n'
+
+
+def unpack_messages(data):
+    """Splits received data into complete BCP command strings. This handles
+    both newline separated commands and length-prefixed frames.
+
+    Args:
+        data: String of the received data.
+
+    Returns:
+        A tuple of the list of complete command strings, and the remaining
+        data which doesn't make up a complete command or frame yet. This
+        remaining data should be passed again with the next data that's
+        received.
+
+    """
+    messages = list()
+    offset = 0
+    length = len(data)
+
+    while offset < length:
+        if data[offset] == frame_marker:
+            if length - offset < frame_header.size:
+                break
+
+            payload_length = frame_header.unpack_from(data, offset)[1]
+            start = offset + frame_header.size
+            end = start + payload_length
+
+            if end > length:
+                break
+
+            if payload_length:
+                messages.extend(data[start:end].split('\n'))
+
+            offset = end
+
+        else:
+            end = data.find('\n', offset)
+
+            if end == -1:
+                break
+
+            if end > offset:
+                messages.append(data[offset:end])
+
+            offset = end + 1
+
+    return messages, data[offset:]
+
+
 class BCP(object):
     """The parent class for the BCP client.
 
@@ -120,11 +278,15 @@ class BCP(object):
         player_score?value=x&prev_value=x&change=x&player_num=x
         player_turn_start?player_num=x
         player_variable?name=x&value=x&prev_value=x&change=x&player_num=x
+        profiler?action=xxx
+        profiler_stats?enabled=x&phases=xxx&handlers=xxx&latency=xxx&queues=xxx
         set
         shot?name=x
+        subscribe?command=xxx&names=xxx
         switch?name=x&state=x
         timer
         trigger?name=xxx
+        unsubscribe?command=xxx&names=xxx
 
     """
 
@@ -143,6 +305,8 @@ class BCP(object):
         self.bcp_events = dict()
         self.connection_config = self.config['connections']
         self.bcp_clients = list()
+        self.outgoing_messages = list()
+        self.collapsed_messages = OrderedDict()
 
         self.bcp_receive_commands = {'error': self.bcp_receive_error,
                                      'switch': self.bcp_receive_switch,
@@ -157,8 +321,11 @@ class BCP(object):
                                         self.external_show_stop,
                                      'external_show_frame':
                                         self.external_show_frame,
+                                     'profiler': self.bcp_receive_profiler,
                                     }
 
+        register_command_schema('switch', state=int)
+
         self.dmd = None
         self.filter_player_events = True
         self.filter_machine_vars = True
@@ -240,6 +407,7 @@ class BCP(object):
         self.machine.events.add_handler('init_phase_2',
                                         self._setup_bcp_connections)
         self.machine.events.add_handler('timer_tick', self.get_bcp_messages)
+        self.machine.events.add_handler('timer_tick', self.flush, priority=-1)
         self.machine.events.add_handler('player_add_success',
                                         self.bcp_player_added)
         self.machine.events.add_handler('machine_reset_phase_1',
@@ -545,16 +713,91 @@ class BCP(object):
             The BCP command that will be sent will be this:
                 trigger?ball=1&string=hello
 
+        Messages are collected and sent to the clients once per tick, so
+        they're written to the sockets together. If a player's score, a
+        player variable, or a machine variable changes several times in a
+        row, only the last change is sent.
+
+        Clients which subscribed to certain commands or names only get those
+        messages. See BCPClientSocket.subscribe().
+
         """
+        if self.bcp_clients:
 
-        bcp_string = encode_command_string(bcp_command, **kwargs)
+            if bcp_command in ('player_score', 'player_variable',
+                               'machine_variable'):
+                self._collapse(bcp_command, kwargs)
 
-        for client in self.bcp_clients:
-            client.send(bcp_string)
+            else:
+                self._flush_collapsed()
+                self.outgoing_messages.append(
+                    (bcp_command, kwargs.get('name'),
+                     encode_command_string(bcp_command, **kwargs)))
 
         if callback:
             callback()
 
+    def _collapse(self, bcp_command, kwargs):
+        # Holds a variable change so it can be replaced by a later change of
+        # the same variable. The merged change goes from the first prev_value
+        # to the last value.
+        key = (bcp_command, kwargs.get('name'), kwargs.get('player_num'))
+
+        try:
+            prev_kwargs = self.collapsed_messages[key]
+        except KeyError:
+            self.collapsed_messages[key] = kwargs
+            return
+
+        if 'prev_value' in prev_kwargs:
+            kwargs['prev_value'] = prev_kwargs['prev_value']
+
+            try:
+                kwargs['change'] = kwargs['value'] - kwargs['prev_value']
+            except (KeyError, TypeError):
+                kwargs['change'] = kwargs.get('value') != kwargs['prev_value']
+
+        self.collapsed_messages[key] = kwargs
+
+    def _flush_collapsed(self):
+        # Adds the held variable changes to the outgoing messages. This is
+        # done before any other message is added so the order of the messages
+        # doesn't change.
+        if self.collapsed_messages:
+            for (bcp_command, _, _), kwargs in (
+                    self.collapsed_messages.iteritems()):
+                self.outgoing_messages.append(
+                    (bcp_command, kwargs.get('name'),
+                     encode_command_string(bcp_command, **kwargs)))
+
+            self.collapsed_messages = OrderedDict()
+
+    def flush(self):
+        """Sends all the messages which were sent since the last flush to the
+        BCP clients. This is called automatically every tick.
+
+        """
+        self._flush_collapsed()
+
+        if self.outgoing_messages:
+            messages = [x[2] for x in self.outgoing_messages]
+
+            for client in self.bcp_clients:
+
+                if client.subscriptions is None:
+                    client.send_batch(messages)
+
+                else:
+                    client_messages = [
+                        message for bcp_command, name, message in
+                        self.outgoing_messages
+                        if client.is_subscribed(bcp_command, name)]
+
+                    if client_messages:
+                        client.send_batch(client_messages)
+
+            self.outgoing_messages = list()
+
     def get_bcp_messages(self):
         """Retrieves and processes new BCP messages from the receiving queue.
 
@@ -576,6 +819,8 @@ class BCP(object):
 
     def shutdown(self):
         """Prepares the BCP clients for MPF shutdown."""
+        self.flush()
+
         for client in self.bcp_clients:
             client.stop()
 
@@ -654,6 +899,33 @@ class BCP(object):
                                                       state=state,
                                                       logical=True)
 
+    def bcp_receive_profiler(self, action='get', filename=None, **kwargs):
+        """Processes an incoming BCP 'profiler' command from a remote BCP host.
+
+        Args:
+            action: String of what to do. 'enable', 'disable', 'reset',
+                'dump' (to write the stats to a file on the MPF side), or 'get'
+                (the default) which replies with a 'profiler_stats' command.
+            filename: Optional file name for the 'dump' action.
+
+        """
+        profiler = self.machine.profiler
+
+        if action == 'enable':
+            profiler.enable()
+        elif action == 'disable':
+            profiler.disable()
+        elif action == 'reset':
+            profiler.reset()
+        elif action == 'dump':
+            profiler.dump(filename)
+        elif action == 'get':
+            self.send('profiler_stats', enabled=int(profiler.enabled),
+                      **profiler.get_bcp_stats())
+        else:
+            self.send('error', message='invalid profiler action',
+                      command='profiler', action=action)
+
     def bcp_receive_dmd_frame(self, data):
         """Called when the BCP client receives a new DMD frame from the remote
         BCP host. This method forwards the frame to the physical DMD.
@@ -891,6 +1163,40 @@ class BCP(object):
         self.machine.light_controller.add_external_show_frame_command_to_queue(name, **kwargs)
 
 
+class DMDFrameBuffer(object):
+    """A pair of DMD frame buffers which are reused for every frame, so the
+    frames received via BCP don't have to be copied into new strings.
+
+    Args:
+        size: Int of the number of bytes in a frame.
+
+    A new frame is always written into the buffer the DMD isn't showing, and
+    then the buffers swap. So the frame the DMD platform was passed last stays
+    unchanged until the next frame after that arrives.
+
+    """
+
+    def __init__(self, size):
+        self.frames = (bytearray(size), bytearray(size))
+        self.views = tuple(memoryview(x) for x in self.frames)
+        self.back = 0
+
+    def write(self, data):
+        """Copies a frame into the back buffer and swaps the buffers.
+
+        Args:
+            data: The frame data. Any buffer of the frame size.
+
+        Returns:
+            The bytearray which now holds the frame.
+
+        """
+        self.views[self.back][:] = data
+        frame = self.frames[self.back]
+        self.back ^= 1
+        return frame
+
+
 class BCPClientSocket(object):
     """Parent class for a BCP client socket. (There can be multiple of these to
     connect to multiple BCP media controllers simultaneously.)
@@ -904,6 +1210,18 @@ class BCPClientSocket(object):
 
     """
 
+    receive_buffer_size = 65536
+    """Minimum size of the buffer incoming data is received into."""
+
+    always_sent_commands = ('hello', 'goodbye', 'error', 'reset')
+    """Commands every client is sent regardless of its subscriptions."""
+
+    sending_queue_size = 100
+    """Maximum number of messages (or batches of messages) waiting to be sent.
+    If a client stops reading, the oldest ones are dropped so the machine loop
+    never waits for a client. Nothing is queued while there's no connection.
+    """
+
     def __init__(self, machine, name, config, receive_queue):
 
         self.log = logging.getLogger('BCPClientSocket.' + name)
@@ -916,18 +1234,37 @@ class BCPClientSocket(object):
         self.config = self.machine.config_processor.process_config2(
             'bcp:connections', config, 'bcp:connections')
 
-        self.sending_queue = Queue()
+        self.sending_queue = SendQueue(self.sending_queue_size, 'bcp.' + name)
         self.receive_thread = None
         self.sending_thread = None
         self.socket = None
         self.connection_attempts = 0
         self.attempt_socket_connection = True
         self.send_goodbye = True
+        self.framing = None
+        self.dmd_frames = None
+        self.subscriptions = None
+        self.dropping = False
 
         self.bcp_commands = {'hello': self.receive_hello,
                              'goodbye': self.receive_goodbye,
+                             'subscribe': self.receive_subscribe,
+                             'unsubscribe': self.receive_unsubscribe,
                             }
 
+        if self.config['subscriptions']:
+            for bcp_command, names in self.config['subscriptions'].iteritems():
+                # A list of commands in the config (instead of a dict of the
+                # commands and their names) is converted to a dict of each
+                # command to 0, which means all the names of that command.
+                # Names YAML read as numbers are strings in BCP messages.
+                if names == [0]:
+                    names = None
+                else:
+                    names = [str(x) for x in names]
+
+                self.subscribe(bcp_command, names)
+
         self.setup_client_socket()
 
     def setup_client_socket(self):
@@ -1016,7 +1353,65 @@ class BCPClientSocket(object):
         if not self.socket and self.attempt_socket_connection:
             self.setup_client_socket()
 
-        self.sending_queue.put(message)
+        self._queue(message)
+
+    def send_batch(self, messages):
+        """Sends a list of messages to the BCP host. They're written to the
+        socket together.
+
+        Args:
+            messages: List of message strings.
+
+        """
+        if not self.socket and self.attempt_socket_connection:
+            self.setup_client_socket()
+
+        self._queue(messages)
+
+    def _queue(self, message):
+        # Queues a message (or a batch) for the sending thread. There's no
+        # sending thread without a socket, so nothing is queued then. If the
+        # client doesn't keep up, the oldest messages are dropped rather
+        # than making the machine loop wait for it.
+        if not self.socket:
+            return
+
+        dropped = self.sending_queue.dropped
+        self.sending_queue.put(message, DROP_OLDEST)
+
+        if self.sending_queue.dropped == dropped:
+            self.dropping = False
+
+        elif not self.dropping:
+            self.dropping = True
+            self.log.warning("BCP host isn't keeping up. Dropping the oldest "
+                             "messages. (%s dropped so far)",
+                             self.sending_queue.dropped)
+
+    def _get_dmd_byte_length(self):
+        # Returns the length of a dmd_frame's data, or 0 if there's no DMD
+        if 'dmd' not in self.machine.config:
+            return 0
+
+        bytes_per_pixel = 1
+
+        try:
+            if self.machine.config['dmd']['type'] == 'color':
+                bytes_per_pixel = 3
+
+        except KeyError:
+            pass
+
+        dmd_byte_length = (self.machine.config['dmd']['width'] *
+                           self.machine.config['dmd']['height'] *
+                           bytes_per_pixel)
+
+        self.log.debug("DMD frame byte length: %s*%s*%s = %s",
+                       self.machine.config['dmd']['width'],
+                       self.machine.config['dmd']['height'],
+                       bytes_per_pixel, dmd_byte_length)
+
+        return dmd_byte_length
 
     def receive_loop(self):
         """Receive loop which reads incoming data, assembles commands, and puts
@@ -1025,112 +1420,130 @@ class BCPClientSocket(object):
         This method is run as a thread.
 
         """
+        try:
+            dmd_byte_length = self._get_dmd_byte_length()
 
-        socket_bytes = ''
+            if dmd_byte_length:
+                self.dmd_frames = DMDFrameBuffer(dmd_byte_length)
 
-        if 'dmd' in self.machine.config:
+            # The data is received straight into this buffer and parsed in
+            # place. It's big enough for a few DMD frames, and whatever is
+            # left over after parsing is moved to the front when it fills up.
+            buffer = bytearray(max(self.receive_buffer_size,
+                                   4 * (dmd_byte_length + 11)))
+            view = memoryview(buffer)
+            start = 0
+            end = 0
 
-            bytes_per_pixel = 1
+            while self.socket:
 
-            try:
-                if self.machine.config['dmd']['type'] == 'color':
-                    bytes_per_pixel = 3
+                if end == len(buffer):
 
-            except KeyError:
-                pass
+                    if start:
+                        view[:end - start] = buffer[start:end]
+                        end -= start
+                        start = 0
 
-            dmd_byte_length = (self.machine.config['dmd']['width'] *
-                               self.machine.config['dmd']['height'] *
-                               bytes_per_pixel)
+                    else:  # one command is bigger than the whole buffer
+                        buffer = buffer + bytearray(len(buffer))
+                        view = memoryview(buffer)
 
-            self.log.debug("DMD frame byte length: %s*%s*%s = %s",
-                           self.machine.config['dmd']['width'],
-                           self.machine.config['dmd']['height'],
-                           bytes_per_pixel, dmd_byte_length)
+                received = self.receive_into(view[end:])
 
-            try:
-                while self.socket:
+                if not received:
+                    break
 
-                    socket_bytes += self.get_from_socket()
+                end += received
+                start = self.process_received_data(buffer, view, start, end,
+                                                   dmd_byte_length)
 
-                    if socket_bytes:
+                if start == end:
+                    start = 0
+                    end = 0
 
-                        while socket_bytes.startswith('dmd_frame'):
-                            # trim the `dmd_frame?` so we have just the data
-                            socket_bytes = socket_bytes[10:]
+        except Exception:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            lines = traceback.format_exception(exc_type, exc_value,
+                                               exc_traceback)
+            msg = ''.join(line for line in lines)
+            self.machine.crash_queue.put(msg)
 
-                            while len(socket_bytes) < dmd_byte_length:
-                                # If we don't have the full data, loop until we
-                                # have it.
-                                socket_bytes += self.get_from_socket()
+    def process_received_data(self, buffer, view, start, end,
+                              dmd_byte_length=0):
+        """Processes all the complete commands and DMD frames in the receive
+        buffer.
 
-                            # trim the dmd bytes for the dmd data
-                            dmd_data = socket_bytes[:dmd_byte_length]
-                            # Save the rest. This is +1 over the last step
-                            # since we need to skip the \n separator
-                            socket_bytes = socket_bytes[dmd_byte_length+1:]
-                            self.machine.bcp.dmd.update(dmd_data)
+        Args:
+            buffer: The bytearray the data was received into.
+            view: A memoryview of the buffer.
+            start: Index of the first byte which hasn't been processed yet.
+            end: Index after the last byte which was received.
+            dmd_byte_length: Length of a dmd_frame's data, or 0 if this machine
+                doesn't have a DMD.
 
-                        if '\n' in socket_bytes:
-                            message, socket_bytes = socket_bytes.split('\n', 1)
+        Returns:
+            The index of the first byte which wasn't processed since it's not
+            a complete command or DMD frame yet.
 
-                            self.log.debug('Received "%s"', message)
-                            cmd, kwargs = decode_command_string(message)
+        """
+        while start < end:
 
-                            if cmd in self.bcp_commands:
-                                self.bcp_commands[cmd](**kwargs)
-                            else:
-                                self.receive_queue.put((cmd, kwargs))
+            if dmd_byte_length and buffer.startswith('dmd_frame?', start):
+                # the frame data comes after 'dmd_frame?' and is followed by
+                # a newline
+                frame_start = start + 10
+                frame_end = frame_start + dmd_byte_length
 
-            except Exception:
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                lines = traceback.format_exception(exc_type, exc_value,
-                                                   exc_traceback)
-                msg = ''.join(line for line in lines)
-                self.machine.crash_queue.put(msg)
+                if frame_end + 1 > end:
+                    break
 
-        else:
-            try:
-                while self.socket:
+                self.machine.bcp.dmd.update(
+                    self.dmd_frames.write(view[frame_start:frame_end]))
+                start = frame_end + 1
+
+            else:
+                message_end = buffer.find('\n', start, end)
 
-                    socket_bytes += self.get_from_socket()
+                if message_end == -1:
+                    break
 
-                    if socket_bytes and '\n' in socket_bytes:
-                            message, socket_bytes = socket_bytes.split('\n', 1)
+                message = str(buffer[start:message_end])
+                start = message_end + 1
 
-                            self.log.debug('Received "%s"', message)
-                            cmd, kwargs = decode_command_string(message)
+                if not message:
+                    continue
 
-                            if cmd in self.bcp_commands:
-                                self.bcp_commands[cmd](**kwargs)
-                            else:
-                                self.receive_queue.put((cmd, kwargs))
+                self.log.debug('Received "%s"', message)
+                cmd, kwargs = decode_command_string(message)
 
-            except Exception:
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                lines = traceback.format_exception(exc_type, exc_value,
-                                                   exc_traceback)
-                msg = ''.join(line for line in lines)
-                self.machine.crash_queue.put(msg)
+                if cmd in self.bcp_commands:
+                    self.bcp_commands[cmd](**kwargs)
+                else:
+                    self.receive_queue.put((cmd, kwargs))
 
+        return start
 
-    def get_from_socket(self, num_bytes=8192):
-        """Reads and returns whatever data is sitting in the receiving socket.
+    def receive_into(self, view):
+        """Reads whatever data is sitting in the receiving socket into a
+        buffer.
 
         Args:
-            num_bytes: Int of the max number of bytes to read.
+            view: A memoryview of the part of the buffer the data is read into.
 
         Returns:
-            The data in raw string format.
+            The number of bytes which were read, or 0 if the socket is closed.
 
         """
         try:
-            socket_bytes = self.socket.recv(num_bytes)
+            received = self.socket.recv_into(view)
         except:
+            received = 0
+
+        if not received:
             self.socket = None
-            socket_bytes = None
+            self.sending_queue.clear()
 
-        return socket_bytes
+        return received
 
     def sending_loop(self):
         """Sending loop which transmits data from the sending queue to the
@@ -1140,11 +1553,25 @@ class BCPClientSocket(object):
         """
         try:
             while self.socket:
+                messages = list()
                 message = self.sending_queue.get()
 
+                # Take everything else which is waiting too, so it all goes
+                # out with one write
+                while True:
+                    if type(message) is list:
+                        messages.extend(message)
+                    else:
+                        messages.append(message)
+
+                    try:
+                        message = self.sending_queue.get_nowait()
+                    except Empty:
+                        break
+
                 try:
-                    self.log.debug('Sending "%s"', message)
-                    self.socket.sendall(message + '\n')
+                    self.log.debug('Sending %s', messages)
+                    self.socket.sendall(pack_messages(messages, self.framing))
 
                 except (IOError, AttributeError):
                     # MPF is probably in the process of shutting down
@@ -1156,10 +1583,19 @@ class BCPClientSocket(object):
             msg = ''.join(line for line in lines)
             self.machine.crash_queue.put(msg)
 
-    def receive_hello(self, **kwargs):
-        """Processes incoming BCP 'hello' command."""
+    def receive_hello(self, framing=None, **kwargs):
+        """Processes incoming BCP 'hello' command.
+
+        If the host answers the 'framing' offer in our hello with the same
+        framing mode, everything after this is sent in that mode.
+
+        """
         self.log.debug('Received BCP Hello from host with kwargs: %s', kwargs)
 
+        if framing == 'length':
+            self.log.debug('Using length-prefixed framing')
+            self.framing = framing
+
     def receive_goodbye(self):
         """Processes incoming BCP 'goodbye' command."""
         self.send_goodbye = False
@@ -1170,12 +1606,101 @@ class BCPClientSocket(object):
             self.machine.bcp.shutdown()
             self.machine.done = True
 
+    def subscribe(self, bcp_command, names=None):
+        """Subscribes this client to a BCP command. Once a client has any
+        subscriptions, it's only sent the commands it subscribed to (plus the
+        commands in always_sent_commands).
+
+        Args:
+            bcp_command: String name of the BCP command.
+            names: Optional list of the values of the command's 'name'
+                parameter (player variable names, trigger names, etc.) to
+                subscribe to. If this is empty or contains '__all__', the
+                command is sent whatever its name.
+
+        """
+        if self.subscriptions is None:
+            self.subscriptions = dict()
+
+        if not names or '__all__' in names:
+            self.subscriptions[bcp_command] = None
+
+        elif bcp_command not in self.subscriptions:
+            self.subscriptions[bcp_command] = set(names)
+
+        elif self.subscriptions[bcp_command] is not None:
+            self.subscriptions[bcp_command].update(names)
+
+        self.log.debug("Subscribed to %s, names: %s", bcp_command,
+                       self.subscriptions[bcp_command])
+
+    def unsubscribe(self, bcp_command=None, names=None):
+        """Removes a subscription.
+
+        Args:
+            bcp_command: String name of the BCP command. If this is None, all
+                the subscriptions are removed, and the client is sent every
+                command again.
+            names: Optional list of names to remove from the subscription. If
+                this is empty, the whole command is removed.
+
+        """
+        if not bcp_command:
+            self.subscriptions = None
+
+        elif self.subscriptions is None:
+            self.log.warning("Can't unsubscribe from %s since this client "
+                             "isn't subscribed to specific commands",
+                             bcp_command)
+
+        elif not names:
+            self.subscriptions.pop(bcp_command, None)
+
+        elif self.subscriptions.get(bcp_command):
+            self.subscriptions[bcp_command].difference_update(names)
+
+    def is_subscribed(self, bcp_command, name=None):
+        """Returns True if this client should be sent a BCP command.
+
+        Args:
+            bcp_command: String name of the BCP command.
+            name: The value of the command's 'name' parameter, if it has one.
+
+        """
+        if self.subscriptions is None or (
+                bcp_command in self.always_sent_commands):
+            return True
+
+        try:
+            names = self.subscriptions[bcp_command]
+        except KeyError:
+            return False
+
+        return names is None or name in names
+
+    def receive_subscribe(self, command, names=None, **kwargs):
+        """Processes incoming BCP 'subscribe' command.
+
+        Example:
+            subscribe?command=player_variable&names=ramp_hits,bonus
+
+        """
+        self.subscribe(command.lower(), Util.string_to_list(names))
+
+    def receive_unsubscribe(self, command=None, names=None, **kwargs):
+        """Processes incoming BCP 'unsubscribe' command."""
+        if command:
+            command = command.lower()
+
+        self.unsubscribe(command, Util.string_to_list(names))
+
     def send_hello(self):
         """Sends BCP 'hello' command."""
         self.send(encode_command_string('hello',
                                         version=version.__bcp_version__,
                                         controller_name='Mission Pinball Framework',
-                                        controller_version=version.__version__))
+                                        controller_version=version.__version__,
+                                        framing='length'))
 
     def send_goodbye(self):
         """Sends BCP 'goodbye' command."""
@@ -57,16 +57,35 @@ class Config(object):
         self.log = logging.getLogger('ConfigProcessor')
 
     @staticmethod
-    def load_config_file(filename, verify_version=True, halt_on_error=True):
+    def load_config_file(filename, verify_version=True, halt_on_error=True,
+                         loaded_files=None):
+        """Loads a config file and merges in any files it lists in its
+        'config:' section.
+
+        Args:
+            filename: The config file, with or without an extension.
+            verify_version: Whether the config version of the file is checked.
+            halt_on_error: Whether a missing file is an error.
+            loaded_files: Optional list the full path of each file which is
+                loaded (including the ones merged in) is appended to.
+
+        """
         config = FileManager.load(filename, verify_version, halt_on_error)
 
+        if loaded_files is not None:
+            located_file = FileManager.locate_file(filename)
+
+            if located_file:
+                loaded_files.append(os.path.abspath(located_file))
+
         if 'config' in config:
             path = os.path.split(filename)[0]
 
             for file in Util.string_to_list(config['config']):
                 full_file = os.path.join(path, file)
                 config = Util.dict_merge(config,
-                                           Config.load_config_file(full_file))
+                    Config.load_config_file(full_file,
+                                            loaded_files=loaded_files))
         return config
 
     @staticmethod
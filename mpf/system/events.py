@@ -9,6 +9,7 @@
 import logging
 from collections import deque
 import random
+import time
 import uuid
 
 from mpf.system.utility_functions import Util
@@ -20,9 +21,15 @@ class EventManager(object):
         self.log = logging.getLogger("Events")
         self.machine = machine
         self.registered_handlers = {}
+        self.dispatch_tables = {}
         self.event_queue = deque([])
         self.callback_queue = deque([])
         self.registered_monitors = set()  # callbacks that get every event
+        self.profiler = None  # set by the Profiler while it's enabled
+
+        # Events which are posted so often that they skip the monitors and
+        # all the debug logging.
+        self.hot_events = set(['timer_tick'])
 
         self.debug = True
 
@@ -93,17 +100,22 @@ class EventManager(object):
         # An event 'handler' in our case is a tuple with 4 elements:
         # the handler method, priority, dict of kwargs, & uuid key
 
-        self.registered_handlers[event].append((handler, priority, kwargs, key))
+        # Insert the handler after all the handlers with the same or a higher
+        # priority so the list stays sorted and we don't have to do that with
+        # each event post.
+        handler_list = self.registered_handlers[event]
+        index = len(handler_list)
+        while index and handler_list[index - 1][1] < priority:
+            index -= 1
+
+        handler_list.insert(index, (handler, priority, kwargs, key))
+        self._invalidate_dispatch_table(event)
+
         if self.debug:
             self.log.debug("Registered %s as a handler for '%s', priority: %s, "
                            "kwargs: %s",
                            (str(handler).split(' '))[2], event, priority, kwargs)
 
-        # Sort the handlers for this event based on priority. We do it now
-        # so the list is pre-sorted so we don't have to do that with each
-        # event post.
-        self.registered_handlers[event].sort(key=lambda x: x[1], reverse=True)
-
         return key
 
     def add_monitor(self, monitor):
@@ -126,7 +138,7 @@ class EventManager(object):
             * kwargs Dict of kwargs that will be passed to the handlers.
 
         """
-        self.events_monitors.add(monitor)
+        self.registered_monitors.add(monitor)
 
     def remove_monitor(self, monitor):
         """Removes / deregisters an event monitor.
@@ -138,7 +150,7 @@ class EventManager(object):
 
         """
         try:
-            self.events_monitors.remove(monitor)
+            self.registered_monitors.remove(monitor)
         except KeyError:
             pass
 
@@ -181,6 +193,8 @@ class EventManager(object):
                     if rh[0] == handler:
                         self.registered_handlers[event].remove(rh)
 
+            self._invalidate_dispatch_table(event)
+
         self.add_handler(event, handler, priority, **kwargs)
 
     def remove_handler(self, method):
@@ -195,6 +209,7 @@ class EventManager(object):
             for handler_tup in handler_list[:]:  # copy via slice
                 if handler_tup[0] == method:
                     handler_list.remove(handler_tup)
+                    self._invalidate_dispatch_table(event)
                     if self.debug:
                         self.log.debug("Removing method %s from event %s",
                                    (str(method).split(' '))[2], event)
@@ -221,6 +236,7 @@ class EventManager(object):
             for handler_tup in self.registered_handlers[event][:]:
                 if handler_tup[0] == handler:
                     self.registered_handlers[event].remove(handler_tup)
+                    self._invalidate_dispatch_table(event)
                     if self.debug:
                         self.log.debug("Removing method %s from event %s",
                                    (str(handler).split(' '))[2], event)
@@ -238,6 +254,7 @@ class EventManager(object):
             for handler_tup in handler_list[:]:  # copy via slice
                 if handler_tup[3] == key:
                     handler_list.remove(handler_tup)
+                    self._invalidate_dispatch_table(event)
                     if self.debug:
                         self.log.debug("Removing method %s from event %s",
                                    (str(handler_tup[0]).split(' '))[2], event)
@@ -262,10 +279,30 @@ class EventManager(object):
 
         if not self.registered_handlers[event]:  # if value is empty list
                 del self.registered_handlers[event]
+                self._invalidate_dispatch_table(event)
                 if self.debug:
                     self.log.debug("Removing event %s since there are no more"
                                " handlers registered for it", event)
 
+    def _invalidate_dispatch_table(self, event):
+        # Throws away the compiled dispatch table of an event whose handlers
+        # have changed. It will be rebuilt the next time the event is posted.
+        try:
+            del self.dispatch_tables[event]
+        except KeyError:
+            pass
+
+    def _get_dispatch_table(self, event):
+        # Returns an immutable tuple of the handlers for an event, sorted by
+        # priority. Since it's a tuple, handlers which are added or removed
+        # while the event is being processed don't affect the current post.
+        try:
+            return self.dispatch_tables[event]
+        except KeyError:
+            table = tuple(self.registered_handlers.get(event, ()))
+            self.dispatch_tables[event] = table
+            return table
+
     def does_event_exist(self, event_name):
         """Checks to see if any handlers are registered for the event name that
         is passed.
@@ -420,7 +457,7 @@ class EventManager(object):
 
         event = event.lower()
 
-        if self.debug and event != 'timer_tick':
+        if self.debug and event not in self.hot_events:
             # Use friendly_kwargs so the logger shows a "friendly" name of the
             # callback handler instead of the bound method object reference.
             friendly_kwargs = dict(kwargs)
@@ -433,7 +470,7 @@ class EventManager(object):
                            friendly_kwargs)
 
         self.event_queue.append((event, ev_type, callback, kwargs))
-        if self.debug and event != 'timer_tick':
+        if self.debug and event not in self.hot_events:
             if self.debug:
                 self.log.debug("============== EVENTS QUEUE =============")
                 for event in list(self.event_queue):
@@ -446,7 +483,10 @@ class EventManager(object):
 
         result = None
         queue = None
-        if self.debug and event != 'timer_tick':
+        verbose = event not in self.hot_events
+        debug = self.debug and verbose
+
+        if debug:
             # Show friendly callback name. See comment in post() above.
             friendly_kwargs = dict(kwargs)
             if 'callback' in kwargs:
@@ -456,34 +496,44 @@ class EventManager(object):
                            " Args: %s", event, ev_type, callback,
                            friendly_kwargs)
 
-        for monitor in self.registered_monitors:
-            monitor(event=event, ev_type=ev_type, callback=callback,
-                    kwargs=kwargs)
+        if verbose:
+            for monitor in self.registered_monitors:
+                monitor(event=event, ev_type=ev_type, callback=callback,
+                        kwargs=kwargs)
 
         # Now let's call the handlers one-by-one, including any kwargs
-        if event in self.registered_handlers:
+        handlers = self._get_dispatch_table(event)
+
+        if handlers:
 
             if ev_type == 'queue' and callback:
                 queue = QueuedEvent(callback, **kwargs)
                 kwargs['queue'] = queue
 
-            for handler in self.registered_handlers[event][:]:
-                # use slice above so we don't process new handlers that came
-                # in while we were processing previous handlers
+            for handler, priority, handler_kwargs, _ in handlers:
 
                 # merge the post's kwargs with the registered handler's kwargs
                 # in case of conflict, posts kwargs will win
-                merged_kwargs = dict(handler[2].items() + kwargs.items())
+                if handler_kwargs:
+                    merged_kwargs = dict(handler_kwargs, **kwargs)
+                else:
+                    merged_kwargs = kwargs
 
-                # log if debug is enabled and this event is not the timer tick
-                if self.debug and event != 'timer_tick':
+                # log if debug is enabled and this event is not a hot event
+                if debug:
                     self.log.debug("%s (priority: %s) responding to event '%s'"
                                    " with args %s",
-                                   (str(handler[0]).split(' '))[2], handler[1],
+                                   (str(handler).split(' '))[2], priority,
                                    event, merged_kwargs)
 
                 # call the handler and save the results
-                result = handler[0](**merged_kwargs)
+                if self.profiler:
+                    start = time.time()
+                    result = handler(**merged_kwargs)
+                    self.profiler.add_handler_time(event, handler,
+                                                   time.time() - start)
+                else:
+                    result = handler(**merged_kwargs)
 
                 # If whatever handler we called returns False, we stop
                 # processing the remaining handlers for boolean or queue events
@@ -493,7 +543,7 @@ class EventManager(object):
                     # add a False result so our callback knows something failed
                     kwargs['ev_result'] = False
 
-                    if self.debug and event != 'timer_tick':
+                    if debug:
                         self.log.debug("Aborting future event processing")
 
                     break
@@ -501,7 +551,7 @@ class EventManager(object):
                 elif ev_type == 'relay' and type(result) is dict:
                     kwargs.update(result)
 
-        if self.debug and event != 'timer_tick':
+        if debug:
             self.log.debug("vvvv Finished event '%s'. Type: %s. Callback: %s. "
                            "Args: %s", event, ev_type, callback, kwargs)
 
@@ -0,0 +1,226 @@
+"""Contains the FileCache class which caches data derived from source files"""
+# file_cache.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import errno
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import struct
+
+
+class FileCache(object):
+    """Stores data which was derived from one or more source files (parsed
+    YAML, for example) in a binary cache file, so it can be loaded from there
+    until one of the source files changes.
+
+    Args:
+        filename: The cache file.
+        key: Any marshallable value (typically a tuple of version strings)
+            which has to match for the cache to be valid.
+        serializer: Module with dumps() and loads() functions which is used
+            for the cached data. Default is marshal, which is fast but can
+            only store built in types. Use cPickle for anything else.
+
+    The cache file starts with a small header which holds the key and the
+    path, modification time, size and SHA1 hash of each source file. If the
+    modification time or size of a source file changed, its hash is checked,
+    so touching a file or checking it out again doesn't invalidate the cache.
+    The data after the header is only read if the header is valid, and it's
+    read from a memory map of the file.
+
+    """
+
+    magic = 'MPFC'
+    format_version = 1
+    _prefix = struct.Struct('<4sHI')  # magic, format version, header length
+
+    log = logging.getLogger('FileCache')
+
+    def __init__(self, filename, key=None, serializer=marshal):
+        self.filename = filename
+        self.key = key
+        self.serializer = serializer
+
+    @staticmethod
+    def _hash_file(filename):
+        with open(filename, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @staticmethod
+    def get_source_info(filename, file_hash=None):
+        """Returns a tuple of (path, mtime, size, hash) for a source file.
+
+        Args:
+            filename: The source file.
+            file_hash: The SHA1 hex digest of the file if you already have it,
+                otherwise the file is read to calculate it.
+
+        """
+        stat = os.stat(filename)
+
+        if not file_hash:
+            file_hash = FileCache._hash_file(filename)
+
+        return (os.path.abspath(filename), stat.st_mtime, stat.st_size,
+                file_hash)
+
+    def _sources_valid(self, sources):
+        for path, mtime, size, file_hash in sources:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+
+            if stat.st_mtime == mtime and stat.st_size == size:
+                continue
+
+            if stat.st_size != size or self._hash_file(path) != file_hash:
+                return False
+
+        return True
+
+    def load(self, source_files=None):
+        """Returns the cached data, or None if there's no valid cache.
+
+        Args:
+            source_files: Optional list of the source files the data must have
+                been created from. If this is passed, the cache is only valid
+                if it was saved with exactly these files.
+
+        """
+        try:
+            with open(self.filename, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+
+                if size < self._prefix.size:
+                    return None
+
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except (IOError, OSError, mmap.error):
+            return None
+
+        try:
+            magic, format_version, header_length = self._prefix.unpack_from(
+                data)
+
+            if magic != self.magic or format_version != self.format_version:
+                return None
+
+            offset = self._prefix.size
+            header = marshal.loads(data[offset:offset + header_length])
+
+            if header['key'] != self.key:
+                return None
+
+            if source_files is not None and (
+                    [x[0] for x in header['sources']] !=
+                    [os.path.abspath(x) for x in source_files]):
+                return None
+
+            if not self._sources_valid(header['sources']):
+                return None
+
+            if self.serializer is marshal:  # marshal can read the mmap
+                return marshal.loads(buffer(data, offset + header_length))
+            else:
+                return self.serializer.loads(data[offset + header_length:])
+
+        except Exception:  # any broken cache file is just a cache miss
+            self.log.debug("Couldn't load cache file %s", self.filename)
+            return None
+
+        finally:
+            data.close()
+
+    def save(self, source_files, data):
+        """Saves data to the cache file.
+
+        Args:
+            source_files: List of the source files the data was created from.
+                These are either file names or (path, mtime, size, hash)
+                tuples from get_source_info().
+            data: The data to cache.
+
+        Returns True if the cache was saved, or False if it couldn't be. A
+        cache that can't be saved isn't an error, MPF will just have to parse
+        the source files again next time.
+
+        """
+        sources = [x if type(x) is tuple else self.get_source_info(x)
+                   for x in source_files]
+
+        try:
+            header = marshal.dumps(dict(key=self.key, sources=sources))
+            payload = self.serializer.dumps(data, 2)
+        except (ValueError, TypeError) as e:
+            self.log.debug("Couldn't serialize data for %s: %s",
+                           self.filename, e)
+            return False
+
+        temp_file = '{}.{}.tmp'.format(self.filename, os.getpid())
+
+        try:
+            try:
+                os.makedirs(os.path.dirname(self.filename))
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            with open(temp_file, 'wb') as f:
+                f.write(self._prefix.pack(self.magic, self.format_version,
+                                          len(header)))
+                f.write(header)
+                f.write(payload)
+
+            # write to a temp file and rename it so a half written file can
+            # never be loaded
+            try:
+                os.rename(temp_file, self.filename)
+            except OSError:  # Windows can't rename over an existing file
+                os.remove(self.filename)
+                os.rename(temp_file, self.filename)
+
+        except (IOError, OSError) as e:
+            self.log.debug("Couldn't write cache file %s: %s", self.filename,
+                           e)
+            return False
+
+        return True
+
+    def remove(self):
+        """Removes the cache file."""
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
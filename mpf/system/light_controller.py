@@ -7,15 +7,20 @@
 # Documentation and more info at http://missionpinball.com/mpf
 
 
+import hashlib
 import logging
+import os
 import time
+from array import array
 from Queue import Queue
 
 from mpf.system.assets import Asset, AssetManager
 from mpf.system.config import Config, CaseInsensitiveDict
+from mpf.system.file_cache import FileCache
 from mpf.system.file_manager import FileManager
 from mpf.system.timing import Timing
 from mpf.system.utility_functions import Util
+import version
 
 
 class LightController(object):
@@ -42,8 +47,11 @@ class LightController(object):
 
         self.registered_light_scripts = CaseInsensitiveDict()
 
-        self.light_update_list = []
-        self.led_update_list = []
+        self.light_update_list = dict()
+        self.led_update_list = dict()
+
+        self.led_buffer = LEDFrameBuffer(self.machine)
+        """LEDFrameBuffer which holds the colors of all the LEDs."""
 
         self.running_shows = []
         self.registered_tick_handlers = set()
@@ -426,22 +434,22 @@ class LightController(object):
 
         # first force the restore of whatever the lights were manually set to
 
-        for light in show.light_states:
+        for light in show.lights:
 
             if light.debug:
                 light.log.debug("Found this light in a restore_lower_lights meth "
-                                "in show.light_states. Light cache priority: %s,"
+                                "in show.lights. Light cache priority: %s,"
                                 "ending show priority: %s", light.cache['priority'],
                                 priority)
 
             if light.cache['priority'] <= priority:
                 light.restore()
 
-        for led in show.led_states:
+        for led in show.leds:
 
             if led.debug:
                 led.log.debug("Found this LED in a restore_lower_lights meth "
-                              "in show.led_states. LED cache priority: %s,"
+                              "in show.leds. LED cache priority: %s,"
                               "ending show priority: %s", led.cache['priority'],
                               priority)
 
@@ -516,30 +524,31 @@ class LightController(object):
                     self.queue.remove(item)
 
         self._do_update()
+        self.led_buffer.update()
 
     def _add_to_light_update_list(self, light, brightness, priority, blend):
         # Adds an update to our update list, with intelligence that if the list
         # already contains an update for this lightname at the same or lower
-        # priority, it deletes that one since there's not sense sending a light
-        # command that will be immediately overridden by a higher one.
-        for item in self.light_update_list:
-            if item['light'] == light and item['priority'] <= priority:
-                self.light_update_list.remove(item)
-        self.light_update_list.append({'light': light,
-                                       'brightness': brightness,
-                                       'priority': priority,
-                                       'blend': blend})  # remove blend?
+        # priority, it replaces that one since there's not sense sending a
+        # light command that will be immediately overridden by a higher one.
+        item = self.light_update_list.get(light)
+        if item and item['priority'] > priority:
+            return
+        self.light_update_list[light] = {'light': light,
+                                         'brightness': brightness,
+                                         'priority': priority,
+                                         'blend': blend}  # remove blend?
 
     def _add_to_led_update_list(self, led, color, fade_ms, priority, blend):
         # See comment from above method
-        for item in self.led_update_list:
-            if item['led'] == led and item['priority'] <= priority:
-                self.led_update_list.remove(item)
-        self.led_update_list.append({'led': led,
+        item = self.led_update_list.get(led)
+        if item and item['priority'] > priority:
+            return
+        self.led_update_list[led] = {'led': led,
                                      'color': color,
                                      'fade_ms': fade_ms,
                                      'priority': priority,
-                                     'blend': blend})
+                                     'blend': blend}
 
     def _add_to_event_queue(self, event):
         # Since events don't blend, this is easy
@@ -598,24 +607,25 @@ class LightController(object):
         # self.light_update_list. Updates with priority, so if the light is
         # doing something at a higher priority, it won't have an effect
 
-        for item in self.light_update_list:
+        for item in self.light_update_list.itervalues():
             item['light'].on(brightness=item['brightness'],
                              priority=item['priority'],
                              cache=False)
 
-        self.light_update_list = []
+        self.light_update_list = dict()
 
     def _update_leds(self):
         # Updates the LEDs in the machine with whatever's in the update_list.
 
-        # The update_list is a list of dictionaries w/the following k/v pairs:
+        # The update_list is a dictionary of LEDs to dictionaries w/the
+        # following k/v pairs:
         #   led
         #   color
         #   fade_ms
         #   priority
         #   blend
 
-        for item in self.led_update_list:
+        for item in self.led_update_list.itervalues():
             # Only perform the update if the priority is higher than whatever
             # touched that led last.
             if item['priority'] >= item['led'].state['priority']:
@@ -640,7 +650,7 @@ class LightController(object):
                                       item['priority'],
                                       item['led'].state['priority'])
 
-        self.led_update_list = []
+        self.led_update_list = dict()
 
     def run_registered_script(self, script_name, **kwargs):
 
@@ -938,6 +948,206 @@ class LightController(object):
             self.running_external_show_keys[name].update_flashers(gi_data)
 
 
+class LEDFrameBuffer(object):
+    """Holds the current colors of all the LEDs in the machine in one
+    contiguous array, and runs all their fades.
+
+    Each LED gets an index when it's created, and its red, green and blue
+    values live at index * 3 in the 'colors' array. Color changes are only
+    written to the array when they happen, and the LEDs which changed are
+    sent to their platforms once per tick by update(), so an LED which changes
+    several times in one tick is only written to the hardware once.
+
+    Fades are calculated for all the fading LEDs in one pass per tick rather
+    than with one task per LED.
+
+    Args:
+        machine: The main MachineController object.
+
+    """
+
+    def __init__(self, machine):
+        self.machine = machine
+
+        self.leds = list()
+        """List of LED objects, indexed by their index."""
+        self.platforms = list()
+        """List of the platform of each LED, indexed by their index."""
+
+        self.colors = array('B')
+        """Current (brightness compensated) color of all the LEDs. Three
+        values per LED.
+        """
+        self.compensation = array('d')
+        """Combined LED and global brightness compensation of all the LEDs.
+        Three values per LED.
+        """
+
+        self.fade_start_colors = array('d')
+        self.fade_dest_colors = array('d')
+        self.fade_start_times = array('d')
+        self.fade_end_times = array('d')
+
+        self.fading = set()
+        """Indexes of the LEDs which are fading."""
+        self.dirty = set()
+        """Indexes of the LEDs which changed since the last update()."""
+
+    def add_led(self, led):
+        """Adds an LED to the frame buffer and returns its index."""
+        index = len(self.leds)
+
+        self.leds.append(led)
+        self.platforms.append(led.platform)
+        self.colors.extend((0, 0, 0))
+        self.compensation.extend((1.0, 1.0, 1.0))
+        self.fade_start_colors.extend((0.0, 0.0, 0.0))
+        self.fade_dest_colors.extend((0.0, 0.0, 0.0))
+        self.fade_start_times.append(0.0)
+        self.fade_end_times.append(0.0)
+
+        return index
+
+    def set_compensation(self, index, compensation):
+        """Sets the brightness compensation of an LED.
+
+        Args:
+            index: Index of the LED.
+            compensation: List of three floats for the red, green and blue
+                elements. These are multiplied with the global brightness
+                compensation from the led_settings: section.
+
+        """
+        global_compensation = (self.machine.config['led_settings']
+                               ['brightness_compensation'])
+        offset = index * 3
+
+        for i in range(3):
+            self.compensation[offset + i] = (float(compensation[i]) *
+                                             global_compensation[i])
+
+    def compensate(self, index, color):
+        """Returns a list of the color passed with the brightness compensation
+        of an LED applied.
+
+        """
+        offset = index * 3
+        compensation = self.compensation
+
+        return [int(value * compensation[offset + i])
+                for i, value in enumerate(color[:3])]
+
+    def get_color(self, index):
+        """Returns the current color of an LED as a list of three ints."""
+        offset = index * 3
+        return self.colors[offset:offset + 3].tolist()
+
+    def set_color(self, index, color):
+        """Sets an LED to a color, stopping any fade it has in progress.
+
+        Args:
+            index: Index of the LED.
+            color: List of three ints. Values outside of 0-255 (like from a
+                brightness compensation above 1.0) are clamped.
+
+        """
+        offset = index * 3
+        colors = self.colors
+
+        colors[offset] = min(255, max(0, int(color[0])))
+        colors[offset + 1] = min(255, max(0, int(color[1])))
+        colors[offset + 2] = min(255, max(0, int(color[2])))
+
+        self.fading.discard(index)
+        self.dirty.add(index)
+
+    def fade(self, index, color, start_time, end_time):
+        """Starts fading an LED from its current color to a new color.
+
+        Args:
+            index: Index of the LED.
+            color: List of three ints of the destination color. Values
+                outside of 0-255 are clamped.
+            start_time: Real world time the fade starts.
+            end_time: Real world time the fade ends.
+
+        """
+        offset = index * 3
+
+        for i in range(3):
+            self.fade_start_colors[offset + i] = self.colors[offset + i]
+            self.fade_dest_colors[offset + i] = min(255, max(0, color[i]))
+
+        self.fade_start_times[index] = start_time
+        self.fade_end_times[index] = end_time
+        self.fading.add(index)
+
+    def stop_fade(self, index):
+        """Stops an LED's fade, leaving it at its current color."""
+        self.fading.discard(index)
+
+    def update(self, current_time=None):
+        """Advances all the fades and sends the LEDs which changed to their
+        platforms. Called once per tick by the LightController.
+
+        """
+        if self.fading:
+            self._update_fades(current_time or time.time())
+
+        if self.dirty:
+            self._flush()
+
+    def _update_fades(self, current_time):
+        colors = self.colors
+        start_colors = self.fade_start_colors
+        dest_colors = self.fade_dest_colors
+        start_times = self.fade_start_times
+        end_times = self.fade_end_times
+        finished = list()
+
+        for index in self.fading:
+            offset = index * 3
+
+            if current_time >= end_times[index]:
+                colors[offset] = int(dest_colors[offset])
+                colors[offset + 1] = int(dest_colors[offset + 1])
+                colors[offset + 2] = int(dest_colors[offset + 2])
+                finished.append(index)
+
+            else:
+                ratio = ((current_time - start_times[index]) /
+                         (end_times[index] - start_times[index]))
+
+                for i in (offset, offset + 1, offset + 2):
+                    colors[i] = int((dest_colors[i] - start_colors[i]) *
+                                    ratio + start_colors[i])
+
+        self.dirty.update(self.fading)
+
+        for index in finished:
+            self.fading.remove(index)
+            self.leds[index].fade_complete()
+
+    def _flush(self):
+        platforms = self.platforms
+        dirty = sorted(self.dirty)
+        self.dirty = set()
+
+        first_platform = platforms[dirty[0]]
+
+        if all(platforms[index] is first_platform for index in dirty):
+            first_platform.update_leds(self, dirty)
+            return
+
+        by_platform = dict()
+
+        for index in dirty:
+            by_platform.setdefault(platforms[index], list()).append(index)
+
+        for platform, indexes in by_platform.iteritems():
+            platform.update_leds(self, indexes)
+
+
 class Show(Asset):
 
     def __init__(self, machine, config, file_name, asset_manager, actions=None):
@@ -980,18 +1190,21 @@ class Show(Asset):
         # naturally. (Not invoked if show is manually stopped)
         self.sync_ms = 0
 
-        self.light_states = {}
-        self.led_states = {}
+        self.last_location = None  # index of the step which ran last
+        self.looped = False  # whether all the steps have run at least once
+
+        self.lights = set()  # all the lights in this show
+        self.leds = set()  # all the LEDs in this show
         self.stop_key = None
 
         self.loaded = False
         self.notify_when_loaded = set()
         self.loaded_callbacks = list()
-        self.show_actions = list()
+        self.steps = list()  # list of ShowSteps
 
     def do_load(self, callback, show_actions=None):
 
-        self.show_actions = list()
+        self.steps = list()
 
         self.asset_manager.log.debug("Loading Show %s", self.file_name)
 
@@ -1003,236 +1216,192 @@ class Show(Asset):
                                            "Skipping show.", self.file_name)
             return False
 
-        for step_num in range(len(show_actions)):
-            step_actions = dict()
+        lights = set()
+        leds = set()
 
-            step_actions['tocks'] = show_actions[step_num]['tocks']
+        for step_actions in show_actions:
 
             # look for empty steps. If we find them we'll just add their tock
             # time to the previous step.
-
-            if len(show_actions[step_num]) == 1:  # 1 because it still has tocks
-
-                show_actions[-1]['tocks'] += step_actions['tocks']
+            if len(step_actions) == 1 and self.steps:  # 1 for the tocks
+                self.steps[-1].tocks += step_actions['tocks']
                 continue
 
-            # Lights
-            if ('lights' in show_actions[step_num] and
-                    show_actions[step_num]['lights']):
+            step = self._compile_step(step_actions)
+            self.steps.append(step)
 
-                light_actions = dict()
+            lights.update(light for light, _ in step.lights)
+            leds.update(step.led_indexes)
 
-                for light in show_actions[step_num]['lights']:
+        led_objects = self.machine.light_controller.led_buffer.leds
 
-                    if 'tag|' in light:
-                        tag = light.split('tag|')[1]
-                        light_list = self.machine.lights.items_tagged(tag)
-                    else:  # create a single item list of the light object
-                        try:
-                            light_list = [self.machine.lights[light]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "light name '%s' in show. Skipping...", light)
-                            continue
+        self.lights = lights
+        self.leds = set(led_objects[index] for index in leds)
 
-                    value = show_actions[step_num]['lights'][light]
-
-                    # convert / ensure lights are single ints
-                    if type(value) is str:
-                        value = Util.hex_string_to_int(
-                            show_actions[step_num]['lights'][light])
+        # count how many total locations are in the show. We need this later
+        # so we can know when we're at the end of a show
+        self.total_locations = len(self.steps)
 
-                    if type(value) is int and value > 255:
-                        value = 255
+        self.loaded = True
 
-                    for light_ in light_list:
-                        light_actions[light_] = value
+        if callback:
+            callback()
 
-                        # make sure this light is in self.light_states
-                        if light_ not in self.light_states:
-                            self.light_states[light_] = 0
+        self._asset_loaded()
+        # why do we need this and the one above?
 
-                step_actions['lights'] = light_actions
+    def _compile_step(self, step_actions):
+        # Compiles one step of a show from its config dictionary into a
+        # ShowStep, converting all the device names to device objects (or
+        # indexes in the LED frame buffer) and all the values to the formats
+        # the devices need so advance() doesn't have to do any of this.
 
-            # Events
-            # make sure events is a list of strings
-            if ('events' in show_actions[step_num] and
-                    show_actions[step_num]['events']):
+        step = ShowStep(step_actions['tocks'])
 
-                event_list = (Util.string_to_list(
-                    show_actions[step_num]['events']))
+        # Lights
+        if step_actions.get('lights'):
 
-                step_actions['events'] = event_list
+            light_actions = dict()
 
-            # Coils
-            if ('coils' in show_actions[step_num] and
-                    show_actions[step_num]['coils']):
+            for light, value in step_actions['lights'].iteritems():
 
-                coil_actions = dict()
+                light_list = self._get_devices(self.machine.lights, light,
+                                               'light')
 
-                for coil in show_actions[step_num]['coils']:
+                # convert / ensure lights are single ints. (Lights don't fade,
+                # so any -f from a script is ignored.)
+                if type(value) is str:
+                    value = Util.hex_string_to_int(value.split('-f')[0])
 
-                    try:
-                        this_coil = self.machine.coils[coil]
-                    except:
-                        # this coil name is invalid
-                        self.asset_manager.log.warning("WARNING: Found invalid "
-                            "coil name '%s' in show. Skipping...", coil)
-                        continue
+                if type(value) is int and value > 255:
+                    value = 255
 
-                    value = show_actions[step_num]['coils'][coil]
+                for light_ in light_list:
+                    light_actions[light_] = value
 
-                    # process the value into a tuple which will be
-                    # value[0] = string of action type (pulse, pwm, etc)
-                    # value[1] = int / float of pulse value
+            step.lights = tuple(light_actions.iteritems())
 
-                    # split the value on '-p' to look for a power setting
-                    value = value.split('-p')
+        # Events
+        # make sure events is a list of strings
+        if step_actions.get('events'):
+            step.events = tuple(Util.string_to_list(step_actions['events']))
 
-                    # if there's no power setting, append 100
-                    if len(value) == 1:
-                        value.append(100)
+        # Coils
+        if step_actions.get('coils'):
 
-                    # convert the 0-100 value to 0.0-1.0 float
-                    value[1] = float(value[1]) / 100.0
+            coil_actions = list()
 
-                    # convert value list into tuple
-                    value = (value[0], value[1])
+            for coil, value in step_actions['coils'].iteritems():
 
-                    coil_actions[this_coil] = value
+                try:
+                    this_coil = self.machine.coils[coil]
+                except KeyError:
+                    # this coil name is invalid
+                    self.asset_manager.log.warning("WARNING: Found invalid "
+                        "coil name '%s' in show. Skipping...", coil)
+                    continue
 
-                step_actions['coils'] = coil_actions
+                # process the value into a tuple which will be
+                # value[0] = string of action type (pulse, pwm, etc)
+                # value[1] = int / float of pulse value
 
-            # Flashers
-            if ('flashers' in show_actions[step_num] and
-                    show_actions[step_num]['flashers']):
+                # split the value on '-p' to look for a power setting
+                value = value.split('-p')
 
-                flasher_set = set()
+                # if there's no power setting, append 100
+                if len(value) == 1:
+                    value.append(100)
 
-                for flasher in Util.string_to_list(
-                        show_actions[step_num]['flashers']):
+                # convert the 0-100 value to 0.0-1.0 float
+                coil_actions.append((this_coil,
+                                     (value[0], float(value[1]) / 100.0)))
 
-                    if 'tag|' in flasher:
-                        tag = flasher.split('tag|')[1]
-                        flasher_list = self.machine.flashers.items_tagged(tag)
-                    else:  # create a single item list of the flasher objects
-                        try:
-                            flasher_list = [self.machine.flashers[flasher]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "flasher name '%s' in show. Skipping...",
-                                flasher)
-                            continue
+            step.coils = tuple(coil_actions)
 
-                    for flasher_ in flasher_list:
-                        flasher_set.add(flasher_)
+        # Flashers
+        if step_actions.get('flashers'):
 
-                step_actions['flashers'] = flasher_set
+            flasher_set = set()
 
-            # GI
-            if ('gis' in show_actions[step_num] and
-                    show_actions[step_num]['gis']):
+            for flasher in Util.string_to_list(step_actions['flashers']):
+                flasher_set.update(self._get_devices(self.machine.flashers,
+                                                     flasher, 'flasher'))
 
-                gi_actions = dict()
+            step.flashers = tuple(flasher_set)
 
-                for gi in show_actions[step_num]['gis']:
+        # GI
+        if step_actions.get('gis'):
 
-                    if 'tag|' in gi:
-                        tag = gi.split('tag|')[1]
-                        gi_list = self.machine.gi.items_tagged(tag)
-                    else:  # create a single item list of the light object
-                        try:
-                            gi_list = [self.machine.gi[gi]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "GI name '%s' in show. Skipping...",
-                                gi)
-                            continue
+            gi_actions = dict()
 
-                    value = show_actions[step_num]['gis'][gi]
+            for gi, value in step_actions['gis'].iteritems():
 
-                    # convert / ensure flashers are single ints
-                    if type(value) is str:
-                        value = Util.hex_string_to_int(value)
+                gi_list = self._get_devices(self.machine.gi, gi, 'GI')
 
-                    if type(value) is int and value > 255:
-                        value = 255
+                # convert / ensure flashers are single ints
+                if type(value) is str:
+                    value = Util.hex_string_to_int(value)
 
-                    for gi_ in gi_list:
-                        gi_actions[gi_] = value
+                if type(value) is int and value > 255:
+                    value = 255
 
-                step_actions['gis'] = gi_actions
+                for gi_ in gi_list:
+                    gi_actions[gi_] = value
 
-            # LEDs
-            if ('leds' in show_actions[step_num] and
-                    show_actions[step_num]['leds']):
+            step.gis = tuple(gi_actions.iteritems())
 
-                led_actions = dict()
+        # LEDs
+        if step_actions.get('leds'):
 
-                for led in show_actions[step_num]['leds']:
+            led_actions = dict()
 
-                    if 'tag|' in led:
-                        tag = led.split('tag|')[1]
-                        led_list = self.machine.leds.items_tagged(tag)
-                    else:  # create a single item list of the led object
-                        try:
-                            led_list = [self.machine.leds[led]]
-                        except KeyError:
-                            self.asset_manager.log.warning("Found invalid "
-                                "LED name '%s' in show. Skipping...", led)
-                            continue
+            for led, value in step_actions['leds'].iteritems():
 
-                    value = show_actions[step_num]['leds'][led]
+                led_list = self._get_devices(self.machine.leds, led, 'LED')
 
-                    # ensure led is list is of 4 ints: [r, g, b, fade_tocks]
-                    if type(value) is list:
-                        # ensure our list is exactly 4 items
-                        if len(value) < 4:
-                            # pad to 4 with zeros
-                            value.extend([0] * (4 - len(value)))
-                        elif len(value) > 4:
-                            value = value[0:4]
+                # LED values are either a list of [r, g, b, fade_tocks] or a
+                # string of a hex color with an optional -f<fade_tocks>
+                if type(value) is list:
+                    value = [int(x) for x in value[0:4]]
+                    value.extend([0] * (4 - len(value)))
 
+                else:
+                    value = str(value)
                     fade = 0
 
-                    if type(value) is str:
-                        if '-f' in value:
-                            fade = value.split('-f')
+                    if '-f' in value:
+                        value, fade = value.split('-f')
 
                     # convert our color of hexes to a list of ints
                     value = Util.hex_string_to_list(value)
-                    value.append(fade)
+                    value.append(int(fade))
 
-                    for led_ in led_list:
-                        led_actions[led_] = value
+                for led_ in led_list:
+                    led_actions[led_.index] = value
 
-                        # make sure this led is in self.led_states
-                        if led_ not in self.led_states:
-                            self.led_states[led_] = {
-                                'current_color': [0, 0, 0],
-                                'destination_color': [0, 0, 0],
-                                'start_color': [0, 0, 0],
-                                'fade_start': 0,
-                                'fade_end': 0}
+            for index in sorted(led_actions):
+                step.led_indexes.append(index)
+                step.led_colors.extend(min(255, max(0, x))
+                                       for x in led_actions[index][0:3])
+                step.led_fades.append(led_actions[index][3])
 
-                step_actions['leds'] = led_actions
+        return step
 
-            self.show_actions.append(step_actions)
+    def _get_devices(self, collection, name, device_type):
+        # Returns a list of the devices for a device name or tag| in a show
+        if 'tag|' in name:
+            return collection.items_tagged(name.split('tag|')[1])
 
-        # count how many total locations are in the show. We need this later
-        # so we can know when we're at the end of a show
-        self.total_locations = len(self.show_actions)
-
-        self.loaded = True
-
-        if callback:
-            callback()
-
-        self._asset_loaded()
-        # why do we need this and the one above?
+        try:
+            return [collection[name]]
+        except KeyError:
+            self.asset_manager.log.warning("Found invalid %s name '%s' in "
+                                           "show. Skipping...", device_type,
+                                           name)
+            return []
 
     def _unload(self):
-        self.show_actions = None
+        self.steps = None
 
     def play(self, repeat=False, priority=0, blend=False, hold=None,
              tocks_per_sec=30, start_location=None, callback=None,
@@ -1338,7 +1507,43 @@ class Show(Asset):
         self.machine.light_controller._run_show(self)
 
     def load_show_from_disk(self):
-        return FileManager.load(self.file_name)
+        if (self.machine.options.get('no_cache') or
+                not self.machine.config['mpf']['cache_shows']):
+            return FileManager.load(self.file_name)
+
+        cache = self._get_cache()
+
+        if self.machine.options.get('rebuild_cache'):
+            show_actions = None
+        else:
+            show_actions = cache.load([self.file_name])
+
+        if show_actions is None:
+            show_actions = FileManager.load(self.file_name)
+
+            if type(show_actions) is list:
+                cache.save([self.file_name], show_actions)
+
+        else:
+            self.asset_manager.log.debug("Loaded show %s from the cache",
+                                         self.file_name)
+
+        return show_actions
+
+    def _get_cache(self):
+        # Returns the FileCache for this show's file. The cache files are
+        # named after the show file plus a hash of its full path since shows
+        # in different modes can have the same file name.
+        path_hash = hashlib.sha1(os.path.abspath(self.file_name)).hexdigest()
+
+        cache_file = os.path.join(
+            self.machine.machine_path,
+            self.machine.config['mpf']['paths']['show_cache'],
+            '{}-{}.cache'.format(os.path.basename(self.file_name),
+                                 path_hash[:12]))
+
+        return FileCache(cache_file, key=(version.__version__,
+                                          version.__config_version__))
 
     def add_loaded_callback(self, loaded_callback, **kwargs):
         self.asset_manager.log.debug("Adding a loaded callback: %s, %s",
@@ -1408,98 +1613,60 @@ class Show(Asset):
             self.machine.light_controller._end_show(self)
             return
 
-        action_loop_count = 0  # Tracks how many loops we've done in this call
-        # Used to detect if a show is running too slow
-
-        while (self.next_action_tick <=
-               self.machine.tick_num):
-            action_loop_count += 1
-
-            # Set the next action time & step to the next location
-            self.next_action_tick = ((self.show_actions[self.current_location]
-                                     ['tocks'] * self.ticks_per_tock) +
-                                     self.machine.tick_num)
-
-            if self.debug:
-                print "Current tick", self.machine.tick_num
-                print "Next Tick:", self.next_action_tick
-                print "current location tocks", self.show_actions[self.current_location]['tocks']
-                print "ticks per tock", self.ticks_per_tock
-
-        # create a dictionary of the current items of each type, combined with
-        # the show details, that we can throw up to our queue
-
-        for item_type, item_dict in (self.show_actions[self.current_location].
-                                     iteritems()):
-
-            if item_type == 'lights':
-
-                for light_obj, brightness in item_dict.iteritems():
-
-                    self.machine.light_controller._add_to_light_update_list(
-                        light=light_obj,
-                        brightness=brightness,
-                        priority=self.priority,
-                        blend=self.blend)
-
-                    # update the current state
-                    self.light_states[light_obj] = brightness
-
-            elif item_type == 'leds':
-
-                current_time = time.time()
+        step = self.steps[self.current_location]
+        light_controller = self.machine.light_controller
 
-                for led_obj, led_dict in item_dict.iteritems():
+        # Set the next action time to the end of this step
+        self.next_action_tick = (step.tocks * self.ticks_per_tock +
+                                 self.machine.tick_num)
 
-                    self.machine.light_controller._add_to_led_update_list(
-                        led=led_obj,
-                        color=[led_dict[0], led_dict[1], led_dict[2]],
-                        fade_ms=led_dict[3] * self.tocks_per_sec,
-                        priority=self.priority,
-                        blend=self.blend)
+        if self.debug:
+            print "Current tick", self.machine.tick_num
+            print "Next Tick:", self.next_action_tick
+            print "current location tocks", step.tocks
+            print "ticks per tock", self.ticks_per_tock
 
-                    # update the current state
+        # send this step's actions to the light controller
 
-                    # grab the old current color
-                    prev_color = [led_dict[0], led_dict[1], led_dict[2]]
+        for light_obj, brightness in step.lights:
+            light_controller._add_to_light_update_list(light_obj, brightness,
+                                                       self.priority,
+                                                       self.blend)
 
-                    self.led_states[led_obj] = {
-                            'current_color': prev_color,
-                            # todo need to calculate this for a restore
-                            'destination_color': [led_dict[0], led_dict[1],
-                                                  led_dict[2]],
-                            'start_color': prev_color,
-                            'fade_start': current_time,
-                            'fade_end': current_time + (led_dict[3] *
-                                                        self.tocks_per_sec)}
+        if step.led_indexes:
+            add_to_led_update_list = light_controller._add_to_led_update_list
+            leds = light_controller.led_buffer.leds
+            colors = step.led_colors
+            fades = step.led_fades
+            ms_per_tock = 1000.0 / self.tocks_per_sec
 
-            elif item_type == 'events':
+            for i, index in enumerate(step.led_indexes):
+                offset = i * 3
+                add_to_led_update_list(leds[index],
+                                       colors[offset:offset + 3].tolist(),
+                                       fades[i] * ms_per_tock, self.priority,
+                                       self.blend)
 
-                for event in item_dict:  # item_dict is actually a list here
-                    self.machine.light_controller._add_to_event_queue(event)
+        for event in step.events:
+            light_controller._add_to_event_queue(event)
 
-            elif item_type == 'coils':
+        for coil_obj, coil_action in step.coils:
+            light_controller._add_to_coil_queue(coil=coil_obj,
+                                                action=coil_action)
 
-                for coil_obj, coil_action in item_dict.iteritems():
-                    self.machine.light_controller._add_to_coil_queue(
-                        coil=coil_obj,
-                        action=coil_action)
+        for gi, value in step.gis:
+            light_controller._add_to_gi_queue(gi=gi, value=value)
 
-            elif item_type == 'gis':
-                for gi, value in item_dict.iteritems():
-                    self.machine.light_controller._add_to_gi_queue(
-                        gi=gi,
-                        value=value)
+        for flasher in step.flashers:
+            light_controller._add_to_flasher_queue(flasher=flasher)
 
-            elif item_type == 'flashers':
-                for flasher in item_dict:
-                    self.machine.light_controller._add_to_flasher_queue(
-                        flasher=flasher)
+        self.last_location = self.current_location
 
         # increment this show's current_location pointer and handle repeats
 
         # if we're at the end of the show
         if self.current_location == self.total_locations-1:
+            self.looped = True
 
             # if we're repeating with an unlimited number of repeats
             if self.repeat and self.num_repeats == 0:
@@ -1515,17 +1682,11 @@ class Show(Asset):
                     self.ending = True
             else:
                 self.ending = True
-                return  # no need to continue if the show's over
 
         # else, we're in the middle of a show
         else:
             self.current_location += 1
 
-        # If our Show is running so fast that it has done a complete
-        # loop, then let's just break out of the loop
-        if action_loop_count == self.total_locations:
-            return
-
     def resync(self):
         """Causes this show to do a one-time update to resync all the LEDs and
         lights in the show with where they should be now. This is used when a
@@ -1533,22 +1694,73 @@ class Show(Asset):
         lights back to how they want them.
         """
 
-        for light_obj, brightness in self.light_states.iteritems():
+        # Find the last value of each light & LED by walking back through the
+        # steps which have run. Ones which haven't been set yet are off.
+        light_values = dict()
+        led_colors = dict()
+
+        if self.last_location is not None:
+            locations = range(self.last_location, -1, -1)
+
+            if self.looped:
+                locations.extend(range(self.total_locations - 1,
+                                       self.last_location, -1))
+
+            for location in locations:
+                step = self.steps[location]
+
+                for light_obj, brightness in step.lights:
+                    light_values.setdefault(light_obj, brightness)
+
+                for i, index in enumerate(step.led_indexes):
+                    if index not in led_colors:
+                        led_colors[index] = (
+                            step.led_colors[i * 3:i * 3 + 3].tolist())
+
+        for light_obj in self.lights:
             self.machine.light_controller._add_to_light_update_list(
                 light=light_obj,
-                brightness=brightness,
+                brightness=light_values.get(light_obj, 0),
                 priority=self.priority,
                 blend=self.blend)
 
-        for led_obj, led_dict in self.led_states.iteritems():
+        for led_obj in self.leds:
             self.machine.light_controller._add_to_led_update_list(
                 led=led_obj,
-                color=led_dict['current_color'],
+                color=led_colors.get(led_obj.index, [0, 0, 0]),
                 fade_ms=0,
                 priority=self.priority,
                 blend=self.blend)
 
 
+class ShowStep(object):
+    """One step of a compiled Show.
+
+    Show.do_load() compiles each step of a show's config into one of these so
+    Show.advance() can just loop through the actions. The LED actions are kept
+    in arrays: the LED's index in the LightController's LEDFrameBuffer, its
+    color (three values per LED), and its fade time in tocks.
+
+    Args:
+        tocks: How many tocks this step lasts.
+
+    """
+
+    __slots__ = ('tocks', 'lights', 'led_indexes', 'led_colors', 'led_fades',
+                 'events', 'coils', 'gis', 'flashers')
+
+    def __init__(self, tocks):
+        self.tocks = tocks
+        self.lights = ()
+        self.led_indexes = array('H')
+        self.led_colors = array('B')
+        self.led_fades = array('I')
+        self.events = ()
+        self.coils = ()
+        self.gis = ()
+        self.flashers = ()
+
+
 class Playlist(object):
     """A list of :class:`Show` objects which are then played sequentially.
 
@@ -6,7 +6,10 @@
 
 # Documentation and more info at http://missionpinball.com/mpf
 
+import cPickle
+import hashlib
 import logging
+import marshal
 import os
 import time
 import sys
@@ -16,10 +19,11 @@ from mpf.system import *
 from mpf.system.config import Config, CaseInsensitiveDict
 from mpf.system.tasks import Task, DelayManager
 from mpf.system.data_manager import DataManager
-from mpf.system.timing import Timing
+from mpf.system.timing import Timing, Wakeup
 from mpf.system.assets import AssetManager
 from mpf.system.utility_functions import Util
 from mpf.system.file_manager import FileManager
+from mpf.system.file_cache import FileCache
 import version
 
 
@@ -46,6 +50,12 @@ class MachineController(object):
         platform:
         events:
     """
+
+    user_cache_path = os.path.join(os.path.expanduser('~'), '.mpf', 'cache')
+    """Per-user folder for caches which don't belong to a machine folder, like
+    the cache of the MPF config. (The MPF package folder is often read only or
+    shared.)"""
+
     def __init__(self, options):
         self.options = options
         self.log = logging.getLogger("Machine")
@@ -55,6 +65,9 @@ class MachineController(object):
 
         self.loop_start_time = 0
         self.tick_num = 0
+        self.tick_jitter_total = 0.0
+        self.tick_jitter_max = 0.0
+        self.loop_wakeup = None
         self.done = False
         self.machine_path = None  # Path to this machine's folder root
         self.monitors = dict()
@@ -78,6 +91,10 @@ class MachineController(object):
 
         FileManager.init()
         self.config = dict()
+        self.config_snapshot = None
+        self._config_cache = None
+        self._config_snapshot_dirty = False
+        self._mpf_config_sources = list()
         self._load_mpf_config()
         self._set_machine_path()
         self._load_machine_config()
@@ -114,6 +131,8 @@ class MachineController(object):
         for platform in self.hardware_platforms.values():
             platform.initialize()
 
+        self.switch_controller.request_initial_switch_states()
+
         self.validate_machine_config_section('machine')
         self.validate_machine_config_section('timing')
         self.validate_machine_config_section('hardware')
@@ -134,6 +153,8 @@ class MachineController(object):
         self.events.post("init_phase_5")
         self.events._process_event_queue()
 
+        self._save_config_snapshot()
+
         self.reset()
 
     def validate_machine_config_section(self, section):
@@ -143,9 +164,27 @@ class MachineController(object):
         if section not in self.config:
             self.config[section] = dict()
 
+        snapshot = self.config_snapshot
+
+        if snapshot and section in snapshot['validated']:
+            self.config[section] = marshal.loads(
+                snapshot['validated'][section])
+            return
+
         self.config[section] = self.config_processor.process_config2(
             section, self.config[section], section)
 
+        if snapshot is not None:
+            # Only sections of plain data can be cached. Anything which
+            # validated to device objects can't be marshalled and is just
+            # validated again next time.
+            try:
+                snapshot['validated'][section] = marshal.dumps(
+                    self.config[section])
+                self._config_snapshot_dirty = True
+            except ValueError:
+                pass
+
     def _register_system_events(self):
         self.events.add_handler('shutdown', self.power_off)
         self.events.add_handler(self.config['mpf']['switch_tag_event'].
@@ -180,8 +219,54 @@ class MachineController(object):
             self.log.critical("Crash details: %s", crash)
             self.done = True
 
+    def _get_config_cache(self, filename):
+        # Returns the FileCache for a config snapshot, or None if caching is
+        # disabled
+        if self.options.get('no_cache'):
+            return None
+
+        return FileCache(filename,
+                         key=(version.__version__, version.__config_version__),
+                         serializer=cPickle)
+
+    def _load_config_snapshot(self, cache, files):
+        # Returns the snapshot from the cache if it's valid and was created
+        # from this list of config files, or None
+        if not cache or self.options.get('rebuild_cache'):
+            return None
+
+        snapshot = cache.load()
+
+        if snapshot and snapshot['files'] == files:
+            return snapshot
+
+        return None
+
     def _load_mpf_config(self):
-        self.config = Config.load_config_file(self.options['mpfconfigfile'])
+        mpfconfigfile = os.path.abspath(self.options['mpfconfigfile'])
+
+        # The cache file name includes a hash of the MPF config's path so
+        # different MPF installs don't replace each other's cache
+        cache = self._get_config_cache(os.path.join(
+            self.user_cache_path, 'mpfconfig-{}.cache'.format(
+                hashlib.sha1(mpfconfigfile).hexdigest()[:12])))
+        snapshot = self._load_config_snapshot(cache, [mpfconfigfile])
+
+        if snapshot:
+            self.log.debug("Loaded the MPF config from the cache")
+            self.config = cPickle.loads(snapshot['config'])
+            self._mpf_config_sources = snapshot['sources']
+            return
+
+        self._mpf_config_sources = list()
+        self.config = Config.load_config_file(
+            mpfconfigfile, loaded_files=self._mpf_config_sources)
+
+        if cache:
+            cache.save(self._mpf_config_sources,
+                       dict(files=[mpfconfigfile],
+                            sources=self._mpf_config_sources,
+                            config=cPickle.dumps(self.config, 2)))
 
     def _set_machine_path(self):
         # If the machine folder value passed starts with a forward or
@@ -202,6 +287,8 @@ class MachineController(object):
         sys.path.append(self.machine_path)
 
     def _load_machine_config(self):
+        config_files = list()
+
         for num, config_file in enumerate(self.options['configfile']):
 
             if not (config_file.startswith('/') or
@@ -211,9 +298,78 @@ class MachineController(object):
                     self.config['mpf']['paths']['config'], config_file)
 
             self.log.info("Machine config file #%s: %s", num+1, config_file)
+            config_files.append(os.path.abspath(config_file))
+
+        # The snapshot also holds validated sections, so it's only valid for
+        # the same MPF config and machine config files
+        snapshot_files = [os.path.abspath(self.options['mpfconfigfile'])]
+        snapshot_files.extend(config_files)
 
-            self.config = Util.dict_merge(self.config,
-                Config.load_config_file(config_file))
+        self._config_cache = self._get_config_cache(os.path.join(
+            self.machine_path, self.config['mpf']['paths']['config_cache']))
+        self.config_snapshot = self._load_config_snapshot(self._config_cache,
+                                                          snapshot_files)
+
+        if self.config_snapshot:
+            self.log.debug("Loaded the machine config from the cache")
+
+        elif self._config_cache:
+            self.config_snapshot = dict(files=snapshot_files,
+                                        sources=list(self._mpf_config_sources),
+                                        configs=dict(),
+                                        validated=dict())
+
+        self.config = Util.dict_merge(self.config,
+            self.load_config_files(config_files, 'machine'))
+
+    def load_config_files(self, config_files, name=None):
+        """Loads a list of config files and merges them together.
+
+        Args:
+            config_files: List of config files with paths. Each file is merged
+                into the ones before it.
+            name: Optional name which the merged config is stored under in
+                the machine's config snapshot. If this is passed, the config is
+                loaded from the snapshot as long as none of the files changed,
+                so the files don't have to be parsed again.
+
+        Returns: The merged config dictionary.
+
+        """
+        config_files = [os.path.abspath(x) for x in config_files]
+        snapshot = self.config_snapshot
+
+        if name and snapshot and name in snapshot['configs']:
+            files, config = snapshot['configs'][name]
+
+            if files == config_files:
+                return cPickle.loads(config)
+
+        loaded_files = list()
+        config = dict()
+
+        for config_file in config_files:
+            config = Util.dict_merge(config, Config.load_config_file(
+                config_file, loaded_files=loaded_files))
+
+        if name and snapshot is not None:
+            snapshot['configs'][name] = (config_files,
+                                         cPickle.dumps(config, 2))
+            snapshot['sources'].extend(x for x in loaded_files
+                                       if x not in snapshot['sources'])
+            self._config_snapshot_dirty = True
+
+        return config
+
+    def _save_config_snapshot(self):
+        # Saves the config snapshot if anything was added to it while MPF was
+        # loading
+        if self._config_cache and self._config_snapshot_dirty:
+            self.log.debug("Saving the config snapshot to %s",
+                           self._config_cache.filename)
+            self._config_cache.save(self.config_snapshot['sources'],
+                                    self.config_snapshot)
+            self._config_snapshot_dirty = False
 
     def verify_system_info(self):
         """Dumps information about the Python installation to the log.
@@ -391,6 +547,13 @@ class MachineController(object):
 
         if self.default_platform.features['hw_timer']:
             self.default_platform.run_loop()
+        elif self.config['timing']['event_driven_loop']:
+            if Wakeup.available:
+                self._mpf_event_run_loop()
+            else:
+                self.log.warning("The event driven run loop is not available "
+                                 "on this platform. Using the polling loop.")
+                self._mpf_timer_run_loop()
         else:
             self._mpf_timer_run_loop()
 
@@ -411,21 +574,94 @@ class MachineController(object):
                 self.default_platform.tick()
                 loops += 1
                 if self.default_platform.next_tick_time <= time.time():  # todo change this
+                    self._record_tick_jitter()
+                    self.timer_tick()
+                    self.default_platform.next_tick_time += secs_per_tick
+
+        except KeyboardInterrupt:
+            pass
+
+        self.log_loop_rate()
+        self._platform_stop()
+
+        try:
+            self.log.info("Hardware loop rate: %s Hz",
+                          round(loops / (time.time() - start_time), 2))
+        except ZeroDivisionError:
+            self.log.info("Hardware loop rate: 0 Hz")
+
+    def _mpf_event_run_loop(self):
+        # Main machine run loop which sleeps until the next tick, or until a
+        # platform thread calls wakeup(), rather than polling the platform
+        # every hw_thread_sleep_ms. Timers, tasks and delays only run in
+        # timer_tick(), so there's no point in waking up for them earlier.
+
+        start_time = time.time()
+        loops = 0
+        secs_per_tick = timing.Timing.secs_per_tick
+
+        # Platforms which need to be polled limit how long we can sleep
+        if all(platform.features['tick_on_wakeup'] for platform in
+               self.hardware_platforms.values()):
+            max_sleep = secs_per_tick
+        else:
+            max_sleep = self.config['timing']['hw_thread_sleep_ms'] / 1000.0
+
+        self.loop_wakeup = Wakeup()
+        self.default_platform.next_tick_time = time.time()
+
+        try:
+            while self.done is False:
+                self.default_platform.tick()
+                loops += 1
+
+                if self.default_platform.next_tick_time <= time.time():
+                    self._record_tick_jitter()
                     self.timer_tick()
                     self.default_platform.next_tick_time += secs_per_tick
 
+                timeout = min(self.default_platform.next_tick_time -
+                              time.time(), max_sleep)
+
+                if timeout > 0:
+                    self.loop_wakeup.wait(timeout)
+
         except KeyboardInterrupt:
             pass
 
         self.log_loop_rate()
         self._platform_stop()
 
+        self.loop_wakeup.close()
+        self.loop_wakeup = None
+
         try:
             self.log.info("Hardware loop rate: %s Hz",
                           round(loops / (time.time() - start_time), 2))
         except ZeroDivisionError:
             self.log.info("Hardware loop rate: 0 Hz")
 
+    def wakeup(self):
+        """Wakes up the event driven run loop so it calls the default
+        platform's tick() right away instead of at the next tick.
+
+        Platform threads call this when they have received something which
+        should be processed as soon as possible. It's safe to call from any
+        thread, and it does nothing if the machine doesn't use the event driven
+        run loop.
+
+        """
+        if self.loop_wakeup:
+            self.loop_wakeup.set()
+
+    def _record_tick_jitter(self):
+        # Tracks how late each tick is compared to when it was scheduled
+        jitter = time.time() - self.default_platform.next_tick_time
+        self.tick_jitter_total += jitter
+
+        if jitter > self.tick_jitter_max:
+            self.tick_jitter_max = jitter
+
     def timer_tick(self):
         """Called to "tick" MPF at a rate specified by the machine Hz setting.
 
@@ -434,6 +670,10 @@ class MachineController(object):
         let MPF drive.)
 
         """
+        if self.profiler.enabled:
+            self._profiled_timer_tick()
+            return
+
         self.tick_num += 1  # used to calculate the loop rate when MPF exits
         self.timing.timer_tick()  # notifies the timing module
         self.events.post('timer_tick')  # sends the timer_tick system event
@@ -441,6 +681,31 @@ class MachineController(object):
         tasks.DelayManager.timer_tick(self)
         self.events._process_event_queue()
 
+    def _profiled_timer_tick(self):
+        # Same as timer_tick(), but times each phase for the profiler. The
+        # timer_tick event is only queued by post(), so the event queue is
+        # processed before the delays here, like DelayManager.timer_tick()
+        # would, to keep the handlers out of the delay time.
+        self.tick_num += 1
+        start = time.time()
+        self.timing.timer_tick()
+        timing_done = time.time()
+        self.events.post('timer_tick')
+        tasks.Task.timer_tick()
+        tasks_done = time.time()
+        self.events._process_event_queue()
+        events_done = time.time()
+        tasks.DelayManager.timer_tick(self)
+        delays_done = time.time()
+        self.events._process_event_queue()
+
+        self.profiler.add_tick(
+            timing=timing_done - start,
+            tasks=tasks_done - timing_done,
+            delays=delays_done - events_done,
+            event_queue=(events_done - tasks_done) +
+                        (time.time() - delays_done))
+
     def _platform_stop(self):
         for platform in self.hardware_platforms.values():
             platform.stop()
@@ -469,6 +734,12 @@ class MachineController(object):
         except ZeroDivisionError:
             self.log.info("Actual MPF loop rate: 0 Hz")
 
+        if self.tick_num:
+            self.log.info("MPF tick jitter: average %sms, max %sms",
+                          round(self.tick_jitter_total / self.tick_num * 1000,
+                                2),
+                          round(self.tick_jitter_max * 1000, 2))
+
     def _loading_tick(self):
         if not self.asset_loader_complete:
 
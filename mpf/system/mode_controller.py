@@ -11,9 +11,6 @@ import logging
 import os
 from collections import namedtuple
 
-from mpf.system.config import Config
-from mpf.system.utility_functions import Util
-
 
 RemoteMethod = namedtuple('RemoteMethod',
                           'method config_section kwargs priority',
@@ -97,8 +94,6 @@ class ModeController(object):
         if self.debug:
             self.log.debug('Processing mode: %s', mode_string)
 
-        config = dict()
-
         # Find the folder for this mode. First check the machine folder/modes,
         # if that's not a valid folder, check the mpf/modes folder.
         mode_path = os.path.join(self.machine.machine_path,
@@ -116,8 +111,10 @@ class ModeController(object):
             'config',
             mode_string + '.yaml')
 
+        config_files = list()
+
         if os.path.isfile(mpf_mode_config):
-            config = Config.load_config_file(mpf_mode_config)
+            config_files.append(mpf_mode_config)
 
         # Now figure out if there's a machine-specific config for this mode,
         # and if so, merge it into the config
@@ -132,14 +129,16 @@ class ModeController(object):
                 file_root, file_ext = os.path.splitext(file)
 
                 if file_root == mode_string:
-                    config = Util.dict_merge(config,
-                        Config.load_config_file(os.path.join(path, file)))
+                    config_files.append(os.path.join(path, file))
                     found_file = True
                     break
 
             if found_file:
                 break
 
+        config = self.machine.load_config_files(config_files,
+                                                'mode:' + mode_string)
+
         # Figure out where the code is for this mode.
 
         # If a custom 'code' setting exists, first look in the machine folder
@@ -35,6 +35,10 @@ class Platform(object):
         self.features['hw_timer'] = False
         self.features['hw_rule_coil_delay'] = False
         self.features['variable_recycle_time'] = False
+        self.features['tick_on_wakeup'] = False
+        # Set tick_on_wakeup to True if the only time tick() has anything to
+        # do is after one of your threads called self.machine.wakeup(). Then
+        # MPF's event driven run loop does not have to poll your tick().
 
         # todo change this to be dynamic for any overlay
         if self.machine.config['hardware']['driverboards'] == 'snux':
@@ -132,7 +136,10 @@ class Platform(object):
         interface either needs to implement this method or the `run_loop`
         method.
 
-        This method will be called every 1ms.
+        This method will be called every 1ms, or, if the machine uses the
+        event driven run loop and this platform has the `tick_on_wakeup`
+        feature, each time `self.machine.wakeup()` is called plus once per
+        machine tick.
 
         """
         pass
@@ -187,6 +194,37 @@ class Platform(object):
         """
         pass
 
+    def request_hw_switch_states(self, callback):
+        """Asks for the hardware states of all the switches on this platform
+        without waiting for them.
+
+        Args:
+            callback: Method which is called with the dict of switch states
+                (like get_hw_switch_states() returns) once they're known.
+
+        The default implementation calls get_hw_switch_states() and the
+        callback right away. Subclass it if the hardware sends the states
+        back asynchronously, and call the callback from tick() when they
+        arrive.
+
+        """
+        callback(self.get_hw_switch_states())
+
+    def cancel_hw_switch_states(self, callback):
+        """Tells this platform that a request_hw_switch_states() timed out, so
+        it should stop waiting for that answer.
+
+        Args:
+            callback: The callback which was passed to
+                request_hw_switch_states().
+
+        The default implementation does nothing. Subclass it if the platform
+        keeps track of the requests it's waiting for, so a lost answer
+        doesn't keep it from asking the hardware again.
+
+        """
+        pass
+
     def configure_driver(self, config, device_type='coil'):
         """Subclass this method in a platform module to configure a driver.
 
@@ -214,6 +252,28 @@ class Platform(object):
         """
         pass
 
+    def update_leds(self, frame_buffer, indexes):
+        """Writes new colors to this platform's LEDs. Called once per tick by
+        the LightController with all the LEDs which changed in that tick.
+
+        Args:
+            frame_buffer: The LightController's LEDFrameBuffer. Its 'colors'
+                array holds the red, green and blue values of every LED in the
+                machine, starting at the LED's index * 3.
+            indexes: Sorted list of the indexes of the LEDs to update.
+
+        The default implementation calls color() on each LED's platform
+        interface object. Subclass it if your hardware can update several LEDs
+        at once.
+
+        """
+        leds = frame_buffer.leds
+        colors = frame_buffer.colors
+
+        for index in indexes:
+            offset = index * 3
+            leds[index].hw_driver.color(colors[offset:offset + 3].tolist())
+
     def configure_gi(self, config):
         """Subclass this method in a platform module to configure a GI string.
 
@@ -0,0 +1,365 @@
+""" MPF system module which profiles the machine loop and measures switch to
+coil latencies."""
+# profiler.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import logging
+import time
+from collections import defaultdict, deque
+
+from mpf.system.file_manager import FileManager
+from mpf.system.send_queue import get_queue_stats
+
+
+class Profiler(object):
+    """Times each phase of the machine tick, every event handler, and the
+    latency between switch edges and the coils they fire.
+
+    Profiling is off by default, and it costs nothing but a few attribute
+    checks per tick when it's off. It can be enabled via the machine config:
+
+        profiler:
+            enabled: yes
+            dump_file: profile.yaml
+
+    or at runtime via the BCP 'profiler' command or the 'profiler_enable' and
+    'profiler_disable' events.
+
+    Tick phase times are kept for the last 'window' ticks so the percentiles
+    reported are rolling. Event handler times are cumulative since the
+    profiler was enabled or last reset.
+
+    """
+
+    phases = ('timing', 'timer_tick', 'light_controller', 'tasks', 'delays',
+              'event_queue', 'platform')
+    """Names of the phases of a machine tick, in the order they run."""
+
+    latency_buckets = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+    """Upper bounds (in ms) of the switch to coil latency histogram buckets.
+    Anything longer goes into an overflow bucket.
+    """
+
+    def __init__(self, machine):
+        self.machine = machine
+        self.log = logging.getLogger("Profiler")
+
+        self.machine.validate_machine_config_section('profiler')
+        self.config = self.machine.config['profiler']
+
+        self.enabled = False
+        self.window = self.config['window']
+        self.latency_window = self.config['latency_window_ms'] / 1000.0
+
+        self.phase_samples = dict()
+        self.tick_samples = None
+        self.handler_times = None
+        self.handler_calls = None
+        self.latency_histograms = None
+        self.last_switch_edge = None
+        self.timer_tick_time = 0.0
+        self.light_tick_time = 0.0
+        self.platform_tick_time = 0.0
+
+        self._light_tick_handler = None
+        self._platform_ticks = dict()
+
+        self.reset()
+
+        self.machine.events.add_handler('init_phase_3', self._initialize)
+        self.machine.events.add_handler('profiler_enable', self.enable)
+        self.machine.events.add_handler('profiler_disable', self.disable)
+        self.machine.events.add_handler('profiler_dump', self.dump)
+        self.machine.events.add_handler('shutdown', self._shutdown)
+
+    def _initialize(self):
+        if self.config['enabled']:
+            self.enable()
+
+    def _shutdown(self):
+        if self.enabled and self.config['dump_file']:
+            self.dump(self.config['dump_file'])
+
+    def reset(self, **kwargs):
+        """Clears all the stats collected so far."""
+        for phase in self.phases:
+            self.phase_samples[phase] = deque(maxlen=self.window)
+
+        self.tick_samples = deque(maxlen=self.window)
+        self.handler_times = defaultdict(float)
+        self.handler_calls = defaultdict(int)
+        self.latency_histograms = dict()
+        self.last_switch_edge = None
+
+    def enable(self, **kwargs):
+        """Starts profiling."""
+        if self.enabled:
+            return
+
+        self.log.info("Enabling the profiler")
+        self.enabled = True
+
+        try:
+            self._light_tick_handler = self.machine.light_controller._tick
+        except AttributeError:
+            self._light_tick_handler = None
+
+        # Platforms are ticked from the run loop rather than from timer_tick,
+        # so wrap their tick methods to time them.
+        for platform in self.machine.hardware_platforms.values():
+            self._platform_ticks[platform] = platform.tick
+            platform.tick = self._make_timed_tick(platform.tick)
+
+        self.machine.events.profiler = self
+        self.machine.switch_controller.profiler = self
+
+    def disable(self, **kwargs):
+        """Stops profiling. The stats collected so far are kept."""
+        if not self.enabled:
+            return
+
+        self.log.info("Disabling the profiler")
+        self.enabled = False
+
+        for platform, tick in self._platform_ticks.iteritems():
+            platform.tick = tick
+
+        self._platform_ticks = dict()
+        self.machine.events.profiler = None
+        self.machine.switch_controller.profiler = None
+
+    def _make_timed_tick(self, tick):
+
+        def timed_tick():
+            start = time.time()
+            tick()
+            self.platform_tick_time += time.time() - start
+
+        return timed_tick
+
+    def add_handler_time(self, event, handler, duration):
+        """Called by the event manager after each handler it calls while the
+        profiler is enabled.
+
+        Args:
+            event: String name of the event the handler was called for.
+            handler: The handler method.
+            duration: Float of the seconds the handler took.
+
+        """
+        key = (event, handler)
+        self.handler_times[key] += duration
+        self.handler_calls[key] += 1
+
+        if event == 'timer_tick':
+            self.timer_tick_time += duration
+
+            if handler == self._light_tick_handler:
+                self.light_tick_time += duration
+
+    def add_tick(self, timing, tasks, delays, event_queue):
+        """Records the phase times of one machine tick.
+
+        Args:
+            timing: Seconds spent in the timing module.
+            tasks: Seconds spent running tasks.
+            delays: Seconds spent running delays.
+            event_queue: Seconds spent processing the event queue, including
+                the timer_tick event.
+
+        The timer_tick handlers' and the platforms' times are collected on
+        their own since the last tick. The timer_tick handlers are taken out
+        of the event queue phase, and the light controller is taken out of
+        the timer_tick phase.
+
+        """
+        samples = self.phase_samples
+        timer_tick = self.timer_tick_time
+        light = self.light_tick_time
+        platform = self.platform_tick_time
+
+        samples['timing'].append(timing)
+        samples['timer_tick'].append(timer_tick - light)
+        samples['light_controller'].append(light)
+        samples['tasks'].append(tasks)
+        samples['delays'].append(delays)
+        samples['event_queue'].append(max(event_queue - timer_tick, 0.0))
+        samples['platform'].append(platform)
+
+        self.tick_samples.append(timing + tasks + delays + event_queue +
+                                 platform)
+
+        self.timer_tick_time = 0.0
+        self.light_tick_time = 0.0
+        self.platform_tick_time = 0.0
+
+    def switch_edge(self, name, edge_time):
+        """Called by the switch controller when a switch changes state."""
+        self.last_switch_edge = (name, edge_time)
+
+    def coil_fired(self, name):
+        """Called by a driver when it's pulsed or enabled. Records the time
+        since the last switch edge if it's within the latency window.
+
+        """
+        if not self.last_switch_edge:
+            return
+
+        latency = time.time() - self.last_switch_edge[1]
+
+        if latency > self.latency_window:
+            return
+
+        if name not in self.latency_histograms:
+            self.latency_histograms[name] = [0] * (
+                len(self.latency_buckets) + 1)
+
+        latency *= 1000
+        histogram = self.latency_histograms[name]
+
+        for i, bucket in enumerate(self.latency_buckets):
+            if latency <= bucket:
+                histogram[i] += 1
+                break
+        else:
+            histogram[-1] += 1
+
+    @staticmethod
+    def _percentiles(samples):
+        # Returns a dict of stats in ms for a list of samples in seconds
+        if not samples:
+            return dict(count=0, avg=0, p50=0, p90=0, p99=0, max=0)
+
+        samples = sorted(samples)
+        count = len(samples)
+
+        def percentile(p):
+            return round(samples[min(count - 1, int(count * p))] * 1000, 3)
+
+        return dict(count=count,
+                    avg=round(sum(samples) / count * 1000, 3),
+                    p50=percentile(.5),
+                    p90=percentile(.9),
+                    p99=percentile(.99),
+                    max=round(samples[-1] * 1000, 3))
+
+    @staticmethod
+    def _handler_name(handler):
+        try:
+            return '{}.{}'.format(handler.__self__, handler.__name__)
+        except AttributeError:
+            return getattr(handler, '__name__', str(handler))
+
+    def get_stats(self, top_handlers=None):
+        """Returns a dictionary of all the profiler stats. Times are in ms.
+
+        Args:
+            top_handlers: Number of event handlers to include, sorted by their
+                total time. Default is the 'top_handlers' config setting.
+
+        """
+        if top_handlers is None:
+            top_handlers = self.config['top_handlers']
+
+        stats = dict()
+        stats['tick'] = self._percentiles(self.tick_samples)
+        stats['phases'] = dict((phase, self._percentiles(samples))
+                               for phase, samples in
+                               self.phase_samples.iteritems())
+
+        handlers = sorted(self.handler_times.iteritems(), key=lambda x: x[1],
+                          reverse=True)[:top_handlers]
+
+        stats['handlers'] = [
+            dict(event=event, handler=self._handler_name(handler),
+                 calls=self.handler_calls[(event, handler)],
+                 total=round(total * 1000, 3))
+            for (event, handler), total in handlers]
+
+        labels = ['<={}'.format(x) for x in self.latency_buckets]
+        labels.append('>{}'.format(self.latency_buckets[-1]))
+
+        stats['latency'] = dict(
+            (coil, dict(zip(labels, histogram)))
+            for coil, histogram in self.latency_histograms.iteritems())
+
+        stats['queues'] = get_queue_stats()
+
+        return stats
+
+    def get_bcp_stats(self):
+        """Returns the stats as a dictionary of BCP friendly strings.
+
+        The format is:
+            phases=timing:avg,p50,p90,p99,max;timer_tick:...
+            handlers=event:handler:calls,total;...
+            latency=coil:count,count,...;...
+            queues=name:depth,max_depth,dropped,coalesced;...
+
+        """
+        stats = self.get_stats()
+        keys = ('avg', 'p50', 'p90', 'p99', 'max')
+
+        phases = [('tick', stats['tick'])]
+        phases.extend((phase, stats['phases'][phase]) for phase in self.phases)
+
+        return dict(
+            phases=';'.join('{}:{}'.format(
+                name, ','.join(str(values[k]) for k in keys))
+                for name, values in phases),
+            handlers=';'.join('{}:{}:{},{}'.format(
+                x['event'], x['handler'], x['calls'], x['total'])
+                for x in stats['handlers']),
+            latency=';'.join('{}:{}'.format(
+                coil, ','.join(str(x) for x in histogram))
+                for coil, histogram in self.latency_histograms.iteritems()),
+            queues=';'.join('{}:{},{},{},{}'.format(
+                name, x['depth'], x['max_depth'], x['dropped'],
+                x['coalesced'])
+                for name, x in stats['queues'].iteritems()))
+
+    def dump(self, filename=None, **kwargs):
+        """Writes the profiler stats to a file.
+
+        Args:
+            filename: The file to write. The extension picks the format.
+                Default is the 'dump_file' config setting.
+
+        """
+        if not filename:
+            filename = self.config['dump_file']
+
+        if not filename:
+            self.log.warning("Can't dump the profiler stats since no file name "
+                             "was specified")
+            return
+
+        self.log.info("Writing profiler stats to %s", filename)
+        FileManager.save(filename, self.get_stats())
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
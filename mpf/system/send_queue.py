@@ -0,0 +1,235 @@
+"""Contains the SendQueue class, a bounded queue for the threads which send
+data to hardware and BCP clients"""
+# send_queue.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import logging
+import threading
+import weakref
+from collections import deque
+from Queue import Empty, Full
+
+BLOCK = 'block'
+"""Wait for room in the queue. Used for commands which can't be lost, so these
+messages are never dropped. If there's still no room after the block_timeout,
+Queue.Full is raised."""
+
+DROP_OLDEST = 'drop_oldest'
+"""Drop the oldest frame to make room. Used for messages which are complete
+frames (LED, DMD and OPC data) where only the newest one matters."""
+
+COALESCE = 'coalesce'
+"""Replace the queued message with the same key. Used for state messages where
+only the latest state matters. Like BLOCK, these messages are never dropped."""
+
+_queues = weakref.WeakSet()
+
+
+class SendQueue(object):
+    """A bounded queue which is used between the MPF machine loop and the
+    threads which write to serial ports and sockets.
+
+    Args:
+        maxsize: Int of the maximum number of queued messages.
+        name: String name of this queue which is used in the log and stats.
+        block_timeout: Float of the maximum seconds a put() with the 'block'
+            policy waits for room before it raises Queue.Full, so a stuck
+            connection stops the machine instead of hanging its loop.
+
+    It has the get(), get_nowait(), empty() and qsize() methods of a
+    Queue.Queue, so the sending threads can use it the same way. put() takes
+    an overflow policy (BLOCK, DROP_OLDEST or COALESCE) and an optional key.
+    If a message with the same key is already queued, the new message takes
+    its place in the queue (and the old message is counted as dropped or
+    coalesced) no matter how full the queue is.
+
+    """
+
+    def __init__(self, maxsize, name, block_timeout=1.0):
+        self.maxsize = maxsize
+        self.name = name
+        self.block_timeout = block_timeout
+
+        self.log = logging.getLogger('SendQueue.' + name)
+
+        self.queue = deque()
+        self.keyed = dict()
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+
+        self.puts = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked = 0
+        self.max_depth = 0
+
+        _queues.add(self)
+
+    def put(self, item, policy=BLOCK, key=None):
+        """Adds a message to the queue.
+
+        Args:
+            item: The message.
+            policy: What to do if the queue is full. BLOCK, DROP_OLDEST or
+                COALESCE.
+            key: Optional key of the message. A queued message with the same
+                key is replaced by this one.
+
+        Returns True if the message was queued, or False if it was dropped.
+        Messages with the BLOCK or COALESCE policy are never dropped. If the
+        queue is full, the oldest DROP_OLDEST frame is dropped to make room
+        for them. If there isn't one, this waits for room and raises
+        Queue.Full if there is still no room after the block_timeout.
+
+        """
+        with self.mutex:
+            self.puts += 1
+
+            if key is not None and key in self.keyed:
+                self.keyed[key][0] = item
+
+                if policy == DROP_OLDEST:
+                    self.dropped += 1
+                else:
+                    self.coalesced += 1
+
+                return True
+
+            if len(self.queue) >= self.maxsize:
+
+                if policy == DROP_OLDEST:
+                    if not self._drop_oldest_frame():
+                        self.dropped += 1
+                        return False
+
+                # Commands and states are never dropped. Frames make room
+                # for them, otherwise we wait for the sending thread.
+                elif not self._drop_oldest_frame():
+                    self.blocked += 1
+                    self.not_full.wait(self.block_timeout)
+
+                    if len(self.queue) >= self.maxsize:
+                        self.log.error("Queue is still full after %ss. "
+                                       "Can't send message %s",
+                                       self.block_timeout, repr(item)[:50])
+                        raise Full
+
+                    # a message with the same key may have been queued while
+                    # we waited
+                    if key is not None and key in self.keyed:
+                        self.keyed[key][0] = item
+                        self.coalesced += 1
+                        return True
+
+            entry = [item, key, policy]
+            self.queue.append(entry)
+
+            if key is not None:
+                self.keyed[key] = entry
+
+            if len(self.queue) > self.max_depth:
+                self.max_depth = len(self.queue)
+
+            self.not_empty.notify()
+            return True
+
+    def _drop_oldest_frame(self):
+        # Removes the oldest message which was queued with the DROP_OLDEST
+        # policy. Returns False if there isn't one.
+        for entry in self.queue:
+            if entry[2] == DROP_OLDEST:
+                self.queue.remove(entry)
+                self._forget(entry)
+                self.dropped += 1
+                return True
+
+        return False
+
+    def _forget(self, entry):
+        if entry[1] is not None and self.keyed.get(entry[1]) is entry:
+            del self.keyed[entry[1]]
+
+    def get(self, block=True, timeout=None):
+        """Removes and returns the oldest message. Works like Queue.get()."""
+        with self.mutex:
+            if not block:
+                if not self.queue:
+                    raise Empty
+
+            elif timeout is None:
+                while not self.queue:
+                    self.not_empty.wait()
+
+            else:
+                if not self.queue:
+                    self.not_empty.wait(timeout)
+
+                if not self.queue:
+                    raise Empty
+
+            entry = self.queue.popleft()
+            self._forget(entry)
+            self.not_full.notify()
+            return entry[0]
+
+    def get_nowait(self):
+        """Removes and returns the oldest message, or raises Queue.Empty if
+        there isn't one."""
+        return self.get(False)
+
+    def clear(self):
+        """Discards all the queued messages. They're counted as dropped."""
+        with self.mutex:
+            self.dropped += len(self.queue)
+            self.queue.clear()
+            self.keyed.clear()
+            self.not_full.notify_all()
+
+    def qsize(self):
+        """Returns the number of queued messages."""
+        return len(self.queue)
+
+    def empty(self):
+        """Returns True if there are no queued messages."""
+        return not self.queue
+
+    def get_stats(self):
+        """Returns a dictionary of this queue's depth and counters."""
+        return dict(depth=len(self.queue), max_depth=self.max_depth,
+                    maxsize=self.maxsize, puts=self.puts,
+                    dropped=self.dropped, coalesced=self.coalesced,
+                    blocked=self.blocked)
+
+
+def get_queue_stats():
+    """Returns a dictionary of the stats of all the send queues, keyed by the
+    queue names."""
+    return dict((queue.name, queue.get_stats()) for queue in list(_queues))
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
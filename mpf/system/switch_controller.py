@@ -10,14 +10,99 @@ states and posting events to the framework.
 # Documentation and more info at http://missionpinball.com/mpf
 
 import logging
+from array import array
 from collections import defaultdict
+from functools import partial
 import time
 
-from mpf.system.config import CaseInsensitiveDict
-from mpf.system.timing import Timing
+from mpf.system.timing import Timing, TimerQueue
 from mpf.system.utility_functions import Util
 
 
+class HwSwitchStateRequest(object):
+    """Asks all the hardware platforms for their switch states at once and
+    collects the answers as they come in.
+
+    Args:
+        platforms: Iterable of the platforms to ask.
+        timeout: Seconds to wait for all the answers.
+        callback: Optional method which is called with this request once all
+            the platforms answered or the timeout passed.
+
+    Platforms which can answer right away do so while the request is created.
+    Others answer from their tick(), so the machine can go on with whatever
+    else it has to do in the meantime. Call wait() when the states are
+    needed. Platforms which haven't answered when the timeout passes are told
+    to stop waiting with cancel_hw_switch_states().
+
+    """
+
+    log = logging.getLogger('SwitchController')
+
+    def __init__(self, platforms, timeout, callback=None):
+        self.states = dict()
+        self.pending = set(platforms)
+        self.callback = callback
+        self.deadline = time.time() + timeout
+        self.done = False
+
+        self.platform_callbacks = dict((platform, partial(self._received,
+                                                          platform))
+                                       for platform in self.pending)
+
+        for platform in list(self.pending):
+            platform.request_hw_switch_states(
+                self.platform_callbacks[platform])
+
+        if not self.pending:
+            self._finish()
+
+    def _received(self, platform, states):
+        if self.done or platform not in self.pending:
+            return
+
+        self.pending.discard(platform)
+        self.states[platform] = states
+
+        if not self.pending:
+            self._finish()
+
+    def _finish(self):
+        self.done = True
+
+        if self.pending:
+            self.log.warning("Timed out waiting for the switch states of %s",
+                             ', '.join(str(x) for x in self.pending))
+
+            for platform in self.pending:
+                platform.cancel_hw_switch_states(
+                    self.platform_callbacks[platform])
+
+        if self.callback:
+            self.callback(self)
+
+    def check_timeout(self):
+        """Finishes the request if the timeout passed. Returns True if the
+        request is done."""
+        if not self.done and time.time() >= self.deadline:
+            self._finish()
+
+        return self.done
+
+    def wait(self):
+        """Ticks the platforms which haven't answered yet until they do or
+        until the timeout passes, and returns the dict of platforms to their
+        switch states."""
+        while not self.check_timeout():
+            for platform in list(self.pending):
+                platform.tick()
+
+            if self.pending:
+                time.sleep(.001)
+
+        return self.states
+
+
 class SwitchController(object):
     """Base class for the switch controller, which is responsible for receiving
     all switch activity in the machine and converting them into events.
@@ -29,22 +114,48 @@ class SwitchController(object):
 
     log = logging.getLogger('SwitchController')
 
+    hw_switch_state_timeout = 5.0
+    """Seconds to wait for the platforms to send their switch states."""
+
     def __init__(self, machine):
         self.machine = machine
-        self.registered_switches = CaseInsensitiveDict()
+        self.registered_switches = dict()
         # Dictionary of switches and states that have been registered for
-        # callbacks.
+        # callbacks. Keys are (switch index, state) tuples.
+
+        self.active_timed_switches = TimerQueue()
+        # Queue of switch handlers whose switches are currently in a state
+        # counting ms waiting to notify their handlers. In other words, this
+        # is the queue that tracks current switches for things like "do foo()
+        # if switch bar is active for 100ms."
+
+        self.timed_switch_entries = defaultdict(list)
+        # Dictionary of (switch index, state) tuples to the entries in
+        # active_timed_switches for that switch and state, so they can be
+        # cancelled when the switch changes state without searching the queue.
+
+        self.switch_states = array('B')
+        # Current logical state of each switch, indexed by the switch's index.
+        # State here does factor in whether a switch is NO or NC, so
+        # 1 = active and 0 = inactive.
+
+        self.switch_times = array('d')
+        # Time of the last state change of each switch, indexed by the
+        # switch's index.
+
+        self.switches_by_number = dict()
+        # Dictionary of hardware switch numbers to switch objects, so the
+        # platforms can process switches by number without a search.
+
+        self.profiler = None
+        # The Profiler while it's enabled, which is told about switch edges.
 
-        self.active_timed_switches = defaultdict(list)
-        # Dictionary of switches that are currently in a state counting ms
-        # waiting to notify their handlers. In other words, this is the dict that
-        # tracks current switches for things like "do foo() if switch bar is
-        # active for 100ms."
+        self.hw_state_requests = list()
+        # HwSwitchStateRequests which are waiting for the platforms to answer.
 
-        self.switches = CaseInsensitiveDict()
-        # Dictionary which holds the master list of switches as well as their
-        # current states. State here does factor in whether a switch is NO or NC,
-        # so 1 = active and 0 = inactive.
+        self.initial_hw_state_request = None
+        # The request for the switch states at startup. See
+        # request_initial_switch_states().
 
         self.switch_event_active = (
             self.machine.config['mpf']['switch_event_active'])
@@ -65,16 +176,41 @@ class SwitchController(object):
 
         self.monitors = list()
 
+    def request_initial_switch_states(self):
+        """Asks the platforms for their switch states at startup. The
+        MachineController calls this as soon as the platforms are initialized,
+        so the answers come in while the rest of MPF is set up, and they're
+        usually there by the time the switches are initialized in
+        init_phase_2."""
+        self.initial_hw_state_request = self.request_hw_switch_states()
+
     def _initialize_switches(self):
-        self.update_switches_from_hw()
+        request = self.initial_hw_state_request
+        self.initial_hw_state_request = None
 
-        for switch in self.machine.switches:
-            # Populate self.switches
+        if not request:
+            request = self.request_hw_switch_states()
+
+        self._apply_hw_switch_states(request.wait())
+
+        self.switch_states = array('B')
+        self.switch_times = array('d')
+        self.switches_by_number = dict()
+
+        for index, switch in enumerate(self.machine.switches):
+            # Populate the state tables
+            switch.index = index
+            self.switch_states.append(0)
+            self.switch_times.append(0)
             self.set_state(switch.name, switch.state, reset_time=True)
 
+            # If two switches share a number (on different platforms), the
+            # first one wins, which is what the old search did.
+            self.switches_by_number.setdefault(switch.number, switch)
+
             # Populate self.registered_switches
-            self.registered_switches[switch.name + '-0'] = list()
-            self.registered_switches[switch.name + '-1'] = list()
+            self.registered_switches[(index, 0)] = list()
+            self.registered_switches[(index, 1)] = list()
 
             if self.machine.config['mpf']['auto_create_switch_events']:
                 switch.activation_events.add(
@@ -118,51 +254,73 @@ class SwitchController(object):
                     else:
                         switch.deactivation_events.add(event)
 
-    def update_switches_from_hw(self):
-        """Updates the states of all the switches be re-reading the states from
-        the hardware platform.
+    def request_hw_switch_states(self, callback=None):
+        """Asks all the platforms with switches for their hardware switch
+        states at once, without waiting for the answers.
 
-        This method works silently and does not post any events if any switches
-        changed state.
+        Args:
+            callback: Optional method which is called with the
+                HwSwitchStateRequest once all the platforms answered (or the
+                timeout passed).
+
+        Returns the HwSwitchStateRequest. Its wait() method returns the states
+        when you need them.
 
         """
-        # create a list of hw switch numbers, platforms, and switch objects
-        platforms = set()
-        switches = set()  # (switch_object, number)
+        platforms = set(switch.platform for switch in self.machine.switches)
+
+        request = HwSwitchStateRequest(platforms,
+                                       self.hw_switch_state_timeout, callback)
 
+        if not request.done:
+            self.hw_state_requests.append(request)
+
+        return request
+
+    def _apply_hw_switch_states(self, states):
+        # Sets the state of each switch from a dict of platforms to their
+        # switch states
         for switch in self.machine.switches:
-            platforms.add(switch.platform)
-            switches.add((switch, switch.number))
+            try:
+                switch.state = (states[switch.platform][switch.number] ^
+                                switch.invert)
+            except KeyError:
+                pass  # the platform didn't answer in time
 
-        for platform in platforms:
-            switch_states = platform.get_hw_switch_states()
+    def update_switches_from_hw(self):
+        """Updates the states of all the switches be re-reading the states from
+        the hardware platform.
 
-            for switch, number in switches:
-                switch.state = switch_states[number] ^ switch.invert
+        This method works silently and does not post any events if any switches
+        changed state. It waits for the hardware, so use
+        request_hw_switch_states() if you don't need the states right away.
+
+        """
+        self._apply_hw_switch_states(self.request_hw_switch_states().wait())
 
     def verify_switches(self):
-        """Loops through all the switches and queries their hardware states via
-        their platform interfaces and them compares that to the state that MPF
-        thinks the switches are in.
+        """Queries the hardware states of all the switches via their platform
+        interfaces and compares them to the states that MPF thinks the
+        switches are in once they arrive, so this doesn't block.
 
         Throws logging warnings if anything doesn't match.
 
         This method is notification only. It doesn't fix anything.
 
         """
-        current_states = dict()
+        self.request_hw_switch_states(self._verify_switch_states)
 
+    def _verify_switch_states(self, request):
         for switch in self.machine.switches:
-            current_states[switch] = switch.state
-
-        self.update_switches_from_hw()
+            try:
+                hw_state = request.states[switch.platform][switch.number]
+            except KeyError:
+                continue
 
-        for switch in self.machine.switches:
-            if switch.state ^ switch.invert != current_states[switch]:
+            if hw_state ^ switch.invert != switch.state:
                 self.log.warning("Switch State Error! Switch: %s, HW State: "
                                  "%s, MPF State: %s", switch.name,
-                                 current_states[switch],
-                                 switch.state ^ switch.invert)
+                                 hw_state ^ switch.invert, switch.state)
 
     def is_state(self, switch_name, state, ms=0):
         """Queries whether a switch is in a given state and (optionally)
@@ -174,8 +332,10 @@ class SwitchController(object):
 
         """
 
-        if self.switches[switch_name]['state'] == state:
-            if ms <= self.ms_since_change(switch_name):
+        index = self.machine.switches[switch_name].index
+
+        if self.switch_states[index] == state:
+            if ms <= (time.time() - self.switch_times[index]) * 1000.0:
                 return True
             else:
                 return False
@@ -217,14 +377,16 @@ class SwitchController(object):
         last changed state.
         """
 
-        return (time.time() - self.switches[switch_name]['time']) * 1000.0
+        return (time.time() - self.switch_times[
+            self.machine.switches[switch_name].index]) * 1000.0
 
     def secs_since_change(self, switch_name):
         """Returns the number of ms that have elapsed since this switch
         last changed state.
         """
 
-        return time.time() - self.switches[switch_name]['time']
+        return time.time() - self.switch_times[
+            self.machine.switches[switch_name].index]
 
     def set_state(self, switch_name, state=1, reset_time=False):
         """Sets the state of a switch."""
@@ -234,10 +396,9 @@ class SwitchController(object):
         else:
             timestamp = time.time()
 
-        self.switches.update({switch_name: {'state': state,
-                                            'time': timestamp
-                                            }
-                              })
+        index = self.machine.switches[switch_name].index
+        self.switch_states[index] = state
+        self.switch_times[index] = timestamp
 
         # todo this method does not set the switch device's state. Either get
         # rid of it, or move the switch device settings from process_switch()
@@ -287,11 +448,9 @@ class SwitchController(object):
         # Find the switch name
 
         if num is not None:  # can't be 'if num:` in case the num is 0.
-            for switch in self.machine.switches:
-                if switch.number == num:
-                    name = switch.name
-                    obj = switch
-                    break
+            obj = self.switches_by_number.get(num)
+            if obj:
+                name = obj.name
 
         elif obj:
             name = obj.name
@@ -349,8 +508,10 @@ class SwitchController(object):
             # update the switch's next recycle clear time
             obj.recycle_clear_tick = Timing.tick + obj.recycle_ticks
 
+        index = obj.index
+
         # if the switch is already in this state, then abort
-        if self.switches[name]['state'] == state:
+        if self.switch_states[index] == state:
 
             if not obj.recycle_ticks:
                 self.log.info("Received duplicate switch state, which means "
@@ -364,10 +525,14 @@ class SwitchController(object):
         self.log.info("<<<<< switch: %s, State:%s >>>>>", name, state)
 
         # Update the switch controller's logical state for this switch
-        self.set_state(name, state)
+        self.switch_states[index] = state
+        self.switch_times[index] = time.time()
 
-        # Combine name & state so we can look it up
-        switch_key = str(name) + '-' + str(state)
+        if self.profiler:
+            self.profiler.switch_edge(name, self.switch_times[index])
+
+        # Combine index & state so we can look it up
+        switch_key = (index, state)
 
         # Do we have any registered handlers for this switch/state combo?
         if switch_key in self.registered_switches:
@@ -377,19 +542,9 @@ class SwitchController(object):
                 if entry['ms']:
                     # This entry is for a timed switch, so add it to our
                     # active timed switch list
-                    key = time.time() + (entry['ms'] / 1000.0)
-                    value = {'switch_action': str(name) + '-' + str(state),
-                             'callback': entry['callback'],
-                             'switch_name': name,
-                             'state': state,
-                             'ms': entry['ms'],
-                             'removed': False,
-                             'return_info': entry['return_info'],
-                             'callback_kwargs': entry['callback_kwargs']}
-                    self.active_timed_switches[key].append(value)
-                    self.log.debug(
-                        "Found timed switch handler for k/v %s / %s",
-                        key, value)
+                    self._add_timed_switch_handler(
+                        switch_key, name, time.time() + entry['ms'] / 1000.0,
+                        entry)
                 else:
                     # This entry doesn't have a timed delay, so do the action
                     # now
@@ -403,21 +558,38 @@ class SwitchController(object):
                         # todo need to add args and kwargs support to callback
 
         # now check if the opposite state is in the active timed switches list
-        # if so, remove it
-        for k, v, in self.active_timed_switches.items():
-            # using items() instead of iteritems() since we might want to
-            # delete while iterating
-
-            for item in v:
-                if item['switch_action'] == str(name) + '-' + str(state ^ 1):
-                    # ^1 in above line invertes the state
-                    if self.active_timed_switches[k]:
-                        del self.active_timed_switches[k]
+        # if so, remove it. (^1 inverts the state)
+        if (index, state ^ 1) in self.timed_switch_entries:
+            for timed_entry in self.timed_switch_entries.pop((index,
+                                                              state ^ 1)):
+                self.active_timed_switches.cancel(timed_entry)
 
         for monitor in self.monitors:
             monitor(name, state)
 
-        self._post_switch_events(name, state)
+        self._post_switch_events(obj, state)
+
+    def process_switches(self, batch, logical=False):
+        """Processes a batch of switch state changes, for example all the
+        changes a platform found in one poll of its hardware.
+
+        Args:
+            batch: Iterable of (switch object, state) tuples, in the order the
+                changes happened.
+            logical: Whether the states are logical or physical states. See
+                process_switch().
+
+        The events the switches post are processed once after the whole batch
+        rather than waiting for the next machine tick, so this should only be
+        called from a platform's tick() and not from an event handler.
+
+        """
+        process_switch = self.process_switch
+
+        for obj, state in batch:
+            process_switch(state=state, logical=logical, obj=obj)
+
+        self.machine.events._process_event_queue()
 
     def add_monitor(self, monitor):
         if monitor not in self.monitors:
@@ -460,7 +632,7 @@ class SwitchController(object):
         entry_val = {'ms': ms, 'callback': callback,
                      'return_info': return_info,
                      'callback_kwargs': callback_kwargs}
-        entry_key = str(switch_name) + '-' + str(state)
+        entry_key = (self.machine.switches[switch_name].index, state)
 
         self.registered_switches[entry_key].append(entry_val)
 
@@ -473,39 +645,15 @@ class SwitchController(object):
         # catching delayed switches that were in progress when this handler was
         # registered.
 
-        if ms:  # only do this for handlers that have delays
-            if state == 1:
-                if self.is_active(switch_name, 0) and (
-                            self.ms_since_change(switch_name) < ms):
-                    # figure out when this handler should fire based on the
-                    # switch's original activation time.
-                    key = (
-                    time.time() + ((ms - self.ms_since_change(switch_name))
-                                   / 1000.0))
-                    value = {'switch_action': entry_key,
-                             'callback': callback,
-                             'switch_name': switch_name,
-                             'state': state,
-                             'ms': ms,
-                             'removed': False,
-                             'return_info': return_info,
-                             'callback_kwargs': callback_kwargs}
-                    self.active_timed_switches[key].append(value)
-            elif state == 0:
-                if self.is_inactive(switch_name, 0) and (
-                            self.ms_since_change(switch_name) < ms):
-                    key = (
-                    time.time() + ((ms - self.ms_since_change(switch_name))
-                                   / 1000.0))
-                    value = {'switch_action': entry_key,
-                             'callback': callback,
-                             'switch_name': switch_name,
-                             'state': state,
-                             'ms': ms,
-                             'removed': False,
-                             'return_info': return_info,
-                             'callback_kwargs': callback_kwargs}
-                    self.active_timed_switches[key].append(value)
+        if ms and self.is_state(switch_name, state):
+            ms_since_change = self.ms_since_change(switch_name)
+
+            if ms_since_change < ms:
+                # figure out when this handler should fire based on the
+                # switch's original activation time.
+                self._add_timed_switch_handler(
+                    entry_key, switch_name,
+                    time.time() + (ms - ms_since_change) / 1000.0, entry_val)
 
         # Return the args we used to setup this handler for easy removal later
         return {'switch_name': switch_name,
@@ -526,7 +674,7 @@ class SwitchController(object):
             "Removing switch handler. Switch: %s, State: %s, ms: %s",
             switch_name, state, ms)
 
-        entry_key = str(switch_name) + '-' + str(state)
+        entry_key = (self.machine.switches[switch_name].index, state)
 
         if entry_key in self.registered_switches:
             for index, settings in enumerate(
@@ -535,10 +683,33 @@ class SwitchController(object):
                             settings['callback'] == callback):
                     self.registered_switches[entry_key].remove(settings)
 
-        for timed_key, timed_entry in self.active_timed_switches.items():
-            for key, entry in enumerate(timed_entry):
-                if entry['switch_action'] == entry_key and entry['ms'] == ms and entry['callback'] == callback:
-                    entry['removed'] = True
+        for timed_entry in self.timed_switch_entries.get(entry_key, ()):
+            settings = timed_entry[2]
+            if (settings and settings['ms'] == ms and
+                    settings['callback'] == callback):
+                self.active_timed_switches.cancel(timed_entry)
+
+    def _add_timed_switch_handler(self, switch_key, switch_name, fire_time,
+                                  settings):
+        # Adds a switch handler with an ms value to the active timed switches
+        # which will be called at fire_time unless the switch changes state
+        # first.
+        value = {'switch_name': switch_name,
+                 'state': switch_key[1],
+                 'ms': settings['ms'],
+                 'callback': settings['callback'],
+                 'return_info': settings['return_info'],
+                 'callback_kwargs': settings['callback_kwargs']}
+
+        self.log.debug("Found timed switch handler for k/v %s / %s",
+                       fire_time, value)
+
+        timed_entries = self.timed_switch_entries[switch_key]
+
+        # throw away the entries of handlers which already fired
+        timed_entries[:] = [x for x in timed_entries if x[2]]
+
+        timed_entries.append(self.active_timed_switches.add(fire_time, value))
 
     def log_active_switches(self):
         """Writes out entries to the log file of all switches that are
@@ -554,9 +725,9 @@ class SwitchController(object):
 
         self.log.info("Dumping current active switches")
 
-        for k, v in self.switches.iteritems():
-            if v['state']:
-                self.log.info("Active Switch|%s", k)
+        for switch in self.machine.switches:
+            if self.switch_states[switch.index]:
+                self.log.info("Active Switch|%s", switch.name)
 
     def _check_recycle_time(self, switch, state):
         # checks to see when a switch is ok to be activated again after it's
@@ -570,23 +741,22 @@ class SwitchController(object):
                 switch.recycle_jitter_count += 1
             return False
 
-    def _post_switch_events(self, switch_name, state):
+    def _post_switch_events(self, switch, state):
         """Posts the game events based on this switch changing state. """
 
         # the following events all fire the moment a switch goes active
         if state == 1:
 
-            for event in self.machine.switches[switch_name].activation_events:
+            for event in switch.activation_events:
                 self.machine.events.post(event)
 
-            for tag in self.machine.switches[switch_name].tags:
+            for tag in switch.tags:
                 self.machine.events.post(
                     self.switch_tag_event.replace('%', tag))
 
         # the following events all fire the moment a switch becomes inactive
         elif state == 0:
-            for event in (
-                    self.machine.switches[switch_name].deactivation_events):
+            for event in switch.deactivation_events:
                 self.machine.events.post(event)
 
     def _tick(self):
@@ -598,23 +768,22 @@ class SwitchController(object):
 
         """
 
-        for k in self.active_timed_switches.keys():
-            if k <= time.time():  # change to generator?
-                for entry in self.active_timed_switches[k]:
-                    if entry['removed']:
-                        continue
-                    self.log.debug(
-                        "Processing timed switch handler. Switch: %s "
-                        " State: %s, ms: %s", entry['switch_name'],
-                        entry['state'], entry['ms'])
-                    if entry['return_info']:
-                        entry['callback'](switch_name=entry['switch_name'],
-                                          state=entry['state'],
-                                          ms=entry['ms'],
-                                          **entry['callback_kwargs'])
-                    else:
-                        entry['callback'](**entry['callback_kwargs'])
-                del self.active_timed_switches[k]
+        if self.hw_state_requests:
+            self.hw_state_requests = [x for x in self.hw_state_requests
+                                      if not x.check_timeout()]
+
+        for entry in self.active_timed_switches.pop_due(time.time()):
+            self.log.debug(
+                "Processing timed switch handler. Switch: %s "
+                " State: %s, ms: %s", entry['switch_name'],
+                entry['state'], entry['ms'])
+            if entry['return_info']:
+                entry['callback'](switch_name=entry['switch_name'],
+                                  state=entry['state'],
+                                  ms=entry['ms'],
+                                  **entry['callback_kwargs'])
+            else:
+                entry['callback'](**entry['callback_kwargs'])
 
 # The MIT License (MIT)
 
@@ -6,10 +6,11 @@
 # Documentation and more info at http://missionpinball.com/mpf
 
 import logging
-from copy import copy
 import time
 import uuid
 
+from mpf.system.timing import TimerQueue
+
 
 class Task(object):
     """A task/coroutine implementation.
@@ -26,11 +27,13 @@ class Task(object):
 
     Tasks = set()
     NewTasks = set()
+    queue = TimerQueue()
 
     def __init__(self, callback, args=None, name=None, sleep=0):
         self.callback = callback
         self.args = args
         self.wakeup = None
+        self.entry = None
         self.name = name
         self.gen = None
 
@@ -42,6 +45,10 @@ class Task(object):
         self.wakeup = None
         self.gen = None
 
+        if self.entry:
+            Task.queue.cancel(self.entry)
+            self.entry = Task.queue.add(0, self)
+
     def stop(self):
         """Stops the task.
 
@@ -49,6 +56,10 @@ class Task(object):
         and then deleting it."""
         Task.Tasks.remove(self)
 
+        if self.entry:
+            Task.queue.cancel(self.entry)
+            self.entry = None
+
     def __repr__(self):
         return "callback=" + str(self.callback) + " wakeup=" + str(self.wakeup)
 
@@ -61,50 +72,52 @@ class Task(object):
 
     @staticmethod
     def timer_tick():
-        """Scans all tasks now and run those that are ready."""
-        dead_tasks = []
-        for task in Task.Tasks:
-            if not task.wakeup or task.wakeup <= time.time():
-                if task.gen:
-                    try:
-                        rc = next(task.gen)
-                        if rc:
-                            task.wakeup = time.time() + rc
-                    except StopIteration:
-                        dead_tasks.append(task)
-                else:
-                    task.wakeup = time.time()
-                    task.gen = task.callback(*task.args)
-        for task in dead_tasks:
-            Task.Tasks.remove(task)
-        # We need to queue the addition to new tasks to the set because if we
-        # get a new task while we're iterating above then our set size will
-        # change while iterating and produce an error.
+        """Runs the tasks which are ready now.
+
+        Tasks which haven't started yet or which yielded without a wait time
+        are due again on the next tick. Tasks which are waiting stay in the
+        queue untouched until their wakeup time.
+        """
+        for task in Task.queue.pop_due(time.time()):
+            task.entry = None
+
+            if task.gen:
+                try:
+                    rc = next(task.gen)
+                    if rc:
+                        task.wakeup = time.time() + rc
+                except StopIteration:
+                    Task.Tasks.discard(task)
+                    continue
+            else:
+                task.wakeup = time.time()
+                task.gen = task.callback(*task.args)
+
+            # the task might have stopped itself while it was running
+            if task in Task.Tasks and not task.entry:
+                task.entry = Task.queue.add(task.wakeup, task)
+
+        # We need to queue the addition of new tasks because a new task which
+        # is created while we're running the tasks above should not start
+        # until the next tick.
         for task in Task.NewTasks:
             Task.Tasks.add(task)
+            task.entry = Task.queue.add(task.wakeup or 0, task)
         Task.NewTasks = set()
 
 
 class DelayManager(object):
-    """Parent class for a delay manager which can manage multiple delays."""
+    """Parent class for a delay manager which can manage multiple delays.
 
-    delay_managers = set()
-    dead_delay_managers = set()
+    The delays of all the delay managers are kept in a single TimerQueue, so
+    each tick only the delays which are actually due are processed.
+    """
 
-    # todo it might not make sense to keep each DelayManager as a separate
-    # class instance. It makes iterating complex and doesn't really add any
-    # value? (Well, apart from it's easy to wipe all the delays that a single
-    # module created.) But it might be faster to just have a single delay
-    # manager for the whole system. Then again, we're only iterating at a
-    # relatively slow loop rate.
+    queue = TimerQueue()
 
     def __init__(self):
         self.log = logging.getLogger("DelayManager")
         self.delays = {}
-        DelayManager.delay_managers.add(self)
-
-    def __del__(self):
-        DelayManager.dead_delay_managers.add(self)  # todo I don't like this
 
     def add(self, ms, callback, name=None, **kwargs):
         """Adds a delay.
@@ -133,9 +146,17 @@ class DelayManager(object):
 
         self.log.debug("Adding delay. Name: '%s' ms: %s, callback: %s, "
                        "kwargs: %s", name, ms, callback, kwargs)
-        self.delays[name] = ({'action_ms': time.time() + (ms / 1000.0),
+
+        if name in self.delays:
+            DelayManager.queue.cancel(self.delays[name]['entry'])
+
+        action_ms = time.time() + (ms / 1000.0)
+
+        self.delays[name] = ({'action_ms': action_ms,
                               'callback': callback,
-                              'kwargs': kwargs})
+                              'kwargs': kwargs,
+                              'entry': DelayManager.queue.add(action_ms,
+                                                              (self, name))})
 
         return name
 
@@ -150,8 +171,8 @@ class DelayManager(object):
 
         self.log.debug("Removing delay: '%s'", name)
         try:
-            del self.delays[name]
-        except:
+            DelayManager.queue.cancel(self.delays.pop(name)['entry'])
+        except KeyError:
             pass
 
     def check(self, delay):
@@ -177,57 +198,61 @@ class DelayManager(object):
 
     def clear(self):
         """Removes (clears) all the delays associated with this DelayManager."""
+        for delay in self.delays.values():
+            DelayManager.queue.cancel(delay['entry'])
+
         self.delays = {}
 
     def get_next_event(self):
-        next_event_time = False
-        for delay_manager in DelayManager.delay_managers:
-            next_event_time_single = delay_manager._get_next_event()
-            if not next_event_time or (next_event_time > next_event_time_single and next_event_time_single):
-                next_event_time = next_event_time_single
-
-        return next_event_time
+        """Returns the time of the next delay of any delay manager, or False if
+        there are no delays."""
+        return DelayManager.queue.get_next()
 
     def _get_next_event(self):
         next_event_time = False
-        for delay in self.delays.keys():
-            if not next_event_time or next_event_time > self.delays[delay]['action_ms']:
-                next_event_time = self.delays[delay]['action_ms']
+        for delay in self.delays.values():
+            if not next_event_time or next_event_time > delay['action_ms']:
+                next_event_time = delay['action_ms']
 
         return next_event_time
 
+    def _process_delay(self, name, machine):
+        # Delete the delay first in case the processing of it adds a new delay
+        # with the same name. If we delete as the final step then we'll
+        # inadvertently delete the newly-set delay
+        this_delay = self.delays.pop(name)
+        self.log.debug("---Processing delay: %s, callback: %s, kwargs: %s",
+                       name, this_delay['callback'], this_delay['kwargs'])
+        if this_delay['kwargs']:
+            this_delay['callback'](**this_delay['kwargs'])
+        else:
+            this_delay['callback']()
+
+        # Process event queue after delay
+        machine.events._process_event_queue()
+
     def _process_delays(self, machine):
-        # Processes any delays that should fire now
-        for delay in self.delays.keys():
-            # previous delay may have deleted it
-            if not delay in self.delays:
-                continue
-            if self.delays[delay]['action_ms'] <= time.time():
-                # Delete the delay first in case the processing of it adds a
-                # new delay with the same name. If we delete as the final step
-                # then we'll inadvertantly delete the newly-set delay
-                this_delay = copy(self.delays[delay])
-                del self.delays[delay]
-                self.log.debug("---Processing delay: %s", this_delay)
-                if this_delay['kwargs']:
-                    this_delay['callback'](**this_delay['kwargs'])
-                else:
-                    this_delay['callback']()
-
-            # Process event queue after delay
-            machine.events._process_event_queue()
+        # Processes the delays of only this delay manager which should fire
+        # now. Used by platforms which want their delays processed more often
+        # than once per machine tick.
+        current_time = time.time()
+        for name, delay in self.delays.items():
+            # previous delay may have deleted or replaced it
+            if (self.delays.get(name) is delay and
+                    delay['action_ms'] <= current_time):
+                DelayManager.queue.cancel(delay['entry'])
+                self._process_delay(name, machine)
 
     @staticmethod
     def timer_tick(machine):
-        # This is kind of complex because we have to account for a delay
-        # manager being deleted while we're iterating.
-        live_delay_managers = set()
-        while DelayManager.delay_managers:
-            i = DelayManager.delay_managers.pop()
-            if i not in DelayManager.dead_delay_managers:
-                i._process_delays(machine)
-                live_delay_managers.add(i)
-        DelayManager.delay_managers = live_delay_managers
+        # Handle anything which was posted earlier in this tick before any
+        # delays fire, since those events might remove some of the delays.
+        machine.events._process_event_queue()
+
+        # Delays which are removed by the callback of another delay are
+        # cancelled in the queue, so pop_due() won't return them.
+        for delay_manager, name in DelayManager.queue.pop_due(time.time()):
+            delay_manager._process_delay(name, machine)
 
 # The MIT License (MIT)
 
@@ -6,9 +6,20 @@
 
 # Documentation and more info at http://missionpinball.com/mpf
 
+import errno
+import heapq
+import itertools
 import logging
+import os
+import select
 import time
 
+try:
+    import fcntl
+    fcntl_imported = True
+except ImportError:
+    fcntl_imported = False
+
 
 class Timing(object):
     """System timing object.
@@ -34,9 +45,7 @@ class Timing(object):
 
     def __init__(self, machine):
 
-        self.timers = set()
-        self.timers_to_remove = set()
-        self.timers_to_add = set()
+        self.timers = TimerQueue()
         self.log = logging.getLogger("Timing")
         self.machine = machine
 
@@ -50,38 +59,36 @@ class Timing(object):
         Timing.ms_per_tick = 1000 * Timing.secs_per_tick
 
     def add(self, timer):
+        if timer.entry:
+            self.timers.cancel(timer.entry)
+
         timer.wakeup = time.time() + timer.frequency
-        self.timers_to_add.add(timer)
+        timer.entry = self.timers.add(timer.wakeup, timer)
 
     def remove(self, timer):
-        self.timers_to_remove.add(timer)
+        if timer.entry:
+            self.timers.cancel(timer.entry)
+            timer.entry = None
 
     def get_next_timer(self):
-        next_timer = False
-        for timer in self.timers:
-            if not next_timer or next_timer > timer.wakeup:
-                next_timer = timer.wakeup
-        return next_timer
+        return self.timers.get_next()
 
     def timer_tick(self):
-        global tick
         Timing.tick += 1
-        for timer in self.timers:
-            if timer.wakeup and timer.wakeup <= time.time():
-                timer.call()
-                if timer.frequency:
-                    timer.wakeup += timer.frequency
-                else:
-                    timer.wakeup = None
 
-        while self.timers_to_remove:
-            timer = self.timers_to_remove.pop()
-            if timer in self.timers:
-                self.timers.remove(timer)
+        for timer in self.timers.pop_due(time.time()):
+            entry = timer.entry
+            timer.call()
+
+            # the callback might have removed or re-added this timer
+            if timer.entry is not entry:
+                continue
 
-        for timer in self.timers_to_add:
-            self.timers.add(timer)
-        self.timers_to_add = set()
+            if timer.frequency:
+                timer.wakeup += timer.frequency
+                timer.entry = self.timers.add(timer.wakeup, timer)
+            else:
+                timer.wakeup = None
 
     @staticmethod
     def secs(s):
@@ -226,6 +233,7 @@ class Timer(object):
         self.callback = callback
         self.args = args
         self.wakeup = None
+        self.entry = None
         self.frequency = frequency
 
         self.log = logging.getLogger("Timer")
@@ -236,6 +244,186 @@ class Timer(object):
         self.callback(*self.args)
 
 
+class Wakeup(object):
+    """Lets other threads wake up a run loop which is sleeping until its next
+    tick.
+
+    The run loop calls wait() instead of sleeping, and threads which receive
+    something the run loop should handle right away (like a switch change from
+    a serial port) call set(). Internally this is a non-blocking pipe which
+    wait() watches with select(), so it only works where select() works on
+    pipes, i.e. not on Windows. Check Wakeup.available before creating one.
+    """
+
+    available = fcntl_imported
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+
+        for fd in (self.read_fd, self.write_fd):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def set(self):
+        """Wakes up the run loop. Safe to call from any thread."""
+        try:
+            os.write(self.write_fd, '\0')
+        except OSError as e:
+            # If the pipe is full, the run loop has plenty of wakeups pending
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def wait(self, timeout):
+        """Blocks until set() is called or until timeout secs have passed.
+
+        Returns:
+            True if this returned because set() was called, False if it timed
+            out.
+        """
+        try:
+            readable = select.select([self.read_fd], [], [], timeout)[0]
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return False
+            raise
+
+        if not readable:
+            return False
+
+        # Clear all the pending wakeups
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+        return True
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class TimerQueue(object):
+    """Priority queue of scheduled items, ordered by their wakeup time.
+
+    This is the scheduler shared by Timing (for Timers), Task and
+    DelayManager. Items live in a binary heap so each tick only has to look
+    at the items which are actually due, and finding the next wakeup time is
+    a look at the top of the heap.
+
+    Adding an item returns an entry which is the handle used to cancel it.
+    Cancelling is O(1). The entry is just marked as dead and is discarded
+    whenever it makes its way to the top of the heap.
+    """
+
+    def __init__(self):
+        self.queue = []
+        self.counter = itertools.count()
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self.queue) - self.cancelled
+
+    def add(self, wakeup, item):
+        """Schedules an item.
+
+        Args:
+            wakeup: The time (as returned by time.time()) when this item is
+                due.
+            item: Whatever object you want back from pop_due() when this item
+                is due. Must not be None.
+
+        Returns:
+            The entry for this item, which can be passed to cancel().
+        """
+        entry = [wakeup, next(self.counter), item]
+        heapq.heappush(self.queue, entry)
+        return entry
+
+    def cancel(self, entry):
+        """Cancels a scheduled entry. Cancelling an entry which has already
+        fired or has already been cancelled is ok. Nothing happens.
+        """
+        if entry[2] is None:
+            return
+
+        entry[2] = None
+        self.cancelled += 1
+
+        # If most of the heap is dead weight, rebuild it from the live
+        # entries. Only the dead entries which were in the heap are taken off
+        # the count, since pop_due() might have set aside some more which it
+        # pushes back later.
+        if self.cancelled > 64 and self.cancelled * 2 > len(self.queue):
+            queue = [x for x in self.queue if x[2] is not None]
+            self.cancelled -= len(self.queue) - len(queue)
+            self.queue = queue
+            heapq.heapify(self.queue)
+
+    def clear(self):
+        """Cancels all the entries in this queue."""
+        for entry in self.queue:
+            entry[2] = None
+
+        self.queue = []
+        self.cancelled = 0
+
+    def get_next(self):
+        """Returns the wakeup time of the next live entry, or False if there
+        are no entries.
+        """
+        queue = self.queue
+
+        while queue and queue[0][2] is None:
+            heapq.heappop(queue)
+            self.cancelled -= 1
+
+        if queue:
+            return queue[0][0]
+        else:
+            return False
+
+    def pop_due(self, current_time):
+        """Generator which removes and yields every item whose wakeup time is
+        at or before current_time.
+
+        Only entries which were in the queue when this method was called are
+        returned, so an item which is (re)added while the caller processes
+        the due items will not be returned until the next call. Entries which
+        are cancelled while the caller processes the due items are skipped.
+        """
+        limit = next(self.counter)
+
+        # Entries which are added while the caller processes the due items
+        # can be due already (like a timer which is behind), so they're set
+        # aside and pushed back when we're done instead of stopping the loop,
+        # since they would block the other due entries otherwise.
+        added = []
+
+        try:
+            # don't hold on to self.queue since cancel() might replace it
+            while self.queue and self.queue[0][0] <= current_time:
+                entry = heapq.heappop(self.queue)
+
+                if entry[1] >= limit:
+                    added.append(entry)
+                    continue
+
+                item = entry[2]
+
+                if item is None:
+                    self.cancelled -= 1
+                else:
+                    entry[2] = None
+                    yield item
+
+        finally:
+            for entry in added:
+                heapq.heappush(self.queue, entry)
+
+
 # The MIT License (MIT)
 
 # Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
@@ -0,0 +1,308 @@
+from Queue import Queue
+
+from MpfTestCase import MpfTestCase
+from mock import MagicMock
+from mpf.system import bcp
+from mpf.system.bcp import (BCPClientSocket, DMDFrameBuffer,
+                            decode_command_string, encode_command_string,
+                            pack_messages, unpack_messages)
+
+
+class FakeSocket(object):
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, view):
+        if not self.chunks:
+            return 0
+
+        chunk = self.chunks.pop(0)
+
+        if len(chunk) > len(view):
+            self.chunks.insert(0, chunk[len(view):])
+            chunk = chunk[:len(view)]
+
+        view[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class TestBCP(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_event_manager.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/event_manager/'
+
+    def setUp(self):
+        super(TestBCP, self).setUp()
+        self.client = MagicMock()
+        self.machine.bcp.bcp_clients.append(self.client)
+
+    def _get_sent(self):
+        sent = list()
+        for args, _ in self.client.send_batch.call_args_list:
+            sent.extend(decode_command_string(x) for x in args[0])
+        self.client.send_batch.reset_mock()
+        return sent
+
+    def test_decode_command_string(self):
+        self.assertEqual(('trigger', {'name': 'hello', 'foo': 'Foo Bar'}),
+                         decode_command_string('Trigger?NAME=hello&'
+                                               'foo=Foo%20Bar'))
+        self.assertEqual(('ball_end', {}), decode_command_string('ball_end'))
+
+        # blank values are skipped, and the first value of a name is used
+        self.assertEqual(('set', {'a': 'a b', 'c': '1'}),
+                         decode_command_string('set?a=a+b&b=&c&c=1&a=2'))
+
+        cmd, kwargs = decode_command_string(str(encode_command_string(
+            'trigger', name='%41&=?', text=u'caf\xe9'.encode('utf-8'))))
+        self.assertEqual({'name': '%41&=?', 'text': 'caf\xc3\xa9'}, kwargs)
+
+        # names are interned
+        cmd, kwargs = decode_command_string(''.join(['trig', 'ger?name=x']))
+        self.assertIs(intern('trigger'), cmd)
+
+    def test_command_schema(self):
+        bcp.register_command_schema('test_command', value=int, ratio=float)
+
+        try:
+            self.assertEqual(
+                ('test_command', {'value': 5, 'ratio': 0.5, 'text': '5'}),
+                decode_command_string('test_command?value=5&ratio=.5&'
+                                      'text=5'))
+
+            # values which can't be converted stay strings
+            self.assertEqual(('test_command', {'value': 'x'}),
+                             decode_command_string('test_command?value=x'))
+        finally:
+            del bcp.command_schemas['test_command']
+
+    def test_pack_and_unpack_lines(self):
+        data = pack_messages([u'trigger?name=a', 'goodbye'])
+        self.assertEqual('trigger?name=a\ngoodbye\n', data)
+
+        self.assertEqual((['trigger?name=a', 'goodbye'], ''),
+                         unpack_messages(data))
+        self.assertEqual((['trigger?name=a'], 'good'),
+                         unpack_messages(data[:-4]))
+
+    def test_pack_and_unpack_frames(self):
+        frame = pack_messages(['trigger?name=a', 'goodbye'], 'length')
+        data = 'hello\n' + frame + frame
+
+        self.assertEqual((['hello', 'trigger?name=a', 'goodbye',
+                           'trigger?name=a', 'goodbye'], ''),
+                         unpack_messages(data))
+
+        # incomplete frames are kept until the rest arrives
+        messages, remaining = unpack_messages(data[:-3])
+        self.assertEqual(['hello', 'trigger?name=a', 'goodbye'], messages)
+        self.assertEqual(frame[:-3], remaining)
+
+        messages, remaining = unpack_messages(remaining + frame[-3:])
+        self.assertEqual(['trigger?name=a', 'goodbye'], messages)
+        self.assertEqual('', remaining)
+
+    def test_messages_are_sent_once_per_tick(self):
+        self.machine.bcp.send('trigger', name='a')
+        self.machine.bcp.send('trigger', name='b')
+        self.assertFalse(self.client.send_batch.called)
+
+        self.machine_run()
+        self.assertEqual(1, self.client.send_batch.call_count)
+        self.assertEqual([('trigger', {'name': 'a'}),
+                          ('trigger', {'name': 'b'})], self._get_sent())
+
+        self.machine_run()
+        self.assertFalse(self.client.send_batch.called)
+
+    def test_variable_changes_are_collapsed(self):
+        bcp = self.machine.bcp
+        bcp.send('player_score', value=100, prev_value=0, change=100,
+                 player_num=1)
+        bcp.send('player_variable', name='x', value='a', prev_value='-',
+                 change=True, player_num=1)
+        bcp.send('player_score', value=300, prev_value=100, change=200,
+                 player_num=1)
+        bcp.send('machine_variable', name='y', value=1)
+        bcp.send('player_variable', name='x', value='b', prev_value='a',
+                 change=True, player_num=1)
+        bcp.send('trigger', name='t')
+        bcp.send('player_score', value=400, prev_value=300, change=100,
+                 player_num=1)
+
+        self.machine_run()
+        self.assertEqual([
+            ('player_score', dict(value='300', prev_value='0', change='300',
+                                  player_num='1')),
+            ('player_variable', dict(name='x', value='b', prev_value='-',
+                                     change='True', player_num='1')),
+            ('machine_variable', dict(name='y', value='1')),
+            ('trigger', dict(name='t')),
+            ('player_score', dict(value='400', prev_value='300',
+                                  change='100', player_num='1'))],
+            self._get_sent())
+
+    def _get_client(self):
+        # connection_attempts 0 means it won't try to connect
+        return BCPClientSocket(self.machine, 'test',
+                               dict(host='localhost', connection_attempts=0),
+                               Queue())
+
+    def test_receive_loop(self):
+        client = self._get_client()
+        client.receive_buffer_size = 16
+        long_message = 'trigger?name=' + 'x' * 40
+        client.socket = FakeSocket(['trigger?na', 'me=a\ntrigger?name=b\n',
+                                    'trig', 'ger?name=c\n' + long_message,
+                                    '\n\n'])
+
+        client.receive_loop()
+
+        self.assertIsNone(client.socket)
+        received = list()
+        while not client.receive_queue.empty():
+            received.append(client.receive_queue.get())
+
+        self.assertEqual([('trigger', {'name': 'a'}),
+                          ('trigger', {'name': 'b'}),
+                          ('trigger', {'name': 'c'}),
+                          ('trigger', {'name': 'x' * 40})], received)
+
+    def test_receive_dmd_frames(self):
+        client = self._get_client()
+        client.dmd_frames = DMDFrameBuffer(4)
+        self.machine.bcp.dmd = MagicMock()
+
+        buffer = bytearray('dmd_frame?\x00\n\x01\x02\ndmd_frame?abcd\ndmd_fr')
+        view = memoryview(buffer)
+
+        start = client.process_received_data(buffer, view, 0, len(buffer), 4)
+        self.assertEqual(len(buffer) - 6, start)
+
+        frames = [x[0][0] for x in self.machine.bcp.dmd.update.call_args_list]
+        self.assertEqual(2, len(frames))
+
+        # the frames are double buffered
+        self.assertEqual(bytearray('\x00\n\x01\x02'), frames[0])
+        self.assertEqual(bytearray('abcd'), frames[1])
+        self.assertIsNot(frames[0], frames[1])
+
+        frame = client.dmd_frames.write('efgh')
+        self.assertIs(frames[0], frame)
+
+    def test_client_without_connection(self):
+        # like a local_display which isn't running, there's no socket and no
+        # sending thread
+        client = self._get_client()
+        self.machine.bcp.bcp_clients.append(client)
+
+        for i in range(client.sending_queue_size + 10):
+            self.machine.bcp.send('trigger', name='t{}'.format(i))
+            self.machine_run()
+
+        self.assertFalse(self.machine.done)
+        self.assertTrue(client.sending_queue.empty())
+
+    def test_client_which_stopped_reading(self):
+        client = self._get_client()
+        client.socket = MagicMock()
+        client.log.disabled = True  # the "not keeping up" warning
+        self.machine.bcp.bcp_clients.append(client)
+
+        for i in range(client.sending_queue_size + 10):
+            self.machine.bcp.send('trigger', name='t{}'.format(i))
+            self.machine_run()
+
+        # the oldest batches are dropped, the machine keeps running
+        self.assertFalse(self.machine.done)
+        self.assertEqual(client.sending_queue_size,
+                         client.sending_queue.qsize())
+        self.assertEqual(10, client.sending_queue.get_stats()['dropped'])
+        self.assertEqual(['trigger?name=t10'], client.sending_queue.get())
+
+        # a disconnect clears the queue
+        client.socket.recv_into.return_value = 0
+        client.receive_into(memoryview(bytearray(1)))
+        self.assertIsNone(client.socket)
+        self.assertTrue(client.sending_queue.empty())
+
+    def test_subscriptions(self):
+        scoreboard = self._get_client()
+        scoreboard.receive_subscribe(command='player_variable',
+                                     names='ramp_hits')
+        scoreboard.receive_subscribe(command='Player_Score')
+        scoreboard.socket = MagicMock()  # so messages are queued
+        self.machine.bcp.bcp_clients.append(scoreboard)
+
+        bcp = self.machine.bcp
+        bcp.send('player_score', value=100, prev_value=0, change=100,
+                 player_num=1)
+        bcp.send('player_variable', name='ramp_hits', value=1, prev_value=0,
+                 change=1, player_num=1)
+        bcp.send('player_variable', name='bonus', value=1, prev_value=0,
+                 change=1, player_num=1)
+        bcp.send('trigger', name='t')
+        bcp.send('reset')
+        self.machine_run()
+
+        # the other client gets everything
+        self.assertEqual(5, len(self._get_sent()))
+
+        sent = [decode_command_string(x)[0] for x in
+                scoreboard.sending_queue.get_nowait()]
+        self.assertEqual(['player_score', 'player_variable', 'reset'], sent)
+        self.assertTrue(scoreboard.sending_queue.empty())
+
+        # nothing is queued for a client if it's not subscribed to anything
+        # which was sent
+        scoreboard.receive_unsubscribe(command='player_score')
+        bcp.send('player_score', value=200, prev_value=100, change=100,
+                 player_num=1)
+        self.machine_run()
+        self.assertTrue(scoreboard.sending_queue.empty())
+
+        scoreboard.receive_unsubscribe()
+        self.assertTrue(scoreboard.is_subscribed('trigger', 'x'))
+
+    def test_subscriptions_from_config(self):
+        client = BCPClientSocket(
+            self.machine, 'test',
+            dict(host='localhost', connection_attempts=0,
+                 subscriptions=dict(player_variable='score, ramp_hits',
+                                    trigger='__all__')),
+            Queue())
+
+        self.assertTrue(client.is_subscribed('player_variable', 'ramp_hits'))
+        self.assertFalse(client.is_subscribed('player_variable', 'bonus'))
+        self.assertTrue(client.is_subscribed('trigger', 'anything'))
+        self.assertFalse(client.is_subscribed('shot', 'shot1'))
+        self.assertTrue(client.is_subscribed('goodbye'))
+
+    def test_subscriptions_from_config_with_numbers(self):
+        # names YAML reads as numbers still only subscribe to those names
+        client = BCPClientSocket(
+            self.machine, 'test',
+            dict(host='localhost', connection_attempts=0,
+                 subscriptions=dict(switch=7, trigger=[1, u'ramp'])),
+            Queue())
+
+        self.assertTrue(client.is_subscribed('switch', '7'))
+        self.assertFalse(client.is_subscribed('switch', '8'))
+        self.assertTrue(client.is_subscribed('trigger', '1'))
+        self.assertTrue(client.is_subscribed('trigger', 'ramp'))
+        self.assertFalse(client.is_subscribed('trigger', 'other'))
+
+        # a list of commands subscribes to all their names
+        client = BCPClientSocket(
+            self.machine, 'test',
+            dict(host='localhost', connection_attempts=0,
+                 subscriptions=['switch', 'trigger']),
+            Queue())
+
+        self.assertTrue(client.is_subscribed('switch', 'anything'))
+        self.assertTrue(client.is_subscribed('trigger', 'anything'))
+        self.assertFalse(client.is_subscribed('shot', 'shot1'))
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+
+from MpfTestCase import MpfTestCase
+from mock import patch
+from mpf.system.config import Config
+from mpf.system.machine import MachineController
+
+
+class TestConfigCache(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_config_cache.yaml'
+
+    def getMachinePath(self):
+        return os.path.join(self.path, 'machine')
+
+    def getOptions(self):
+        options = super(TestConfigCache, self).getOptions()
+        options['mpfconfigfile'] = os.path.join(self.path, 'mpfconfig.yaml')
+        options['no_cache'] = False
+        return options
+
+    def setUp(self):
+        # the machine folder and MPF config are copied so the caches are
+        # written to a temp folder
+        self.path = tempfile.mkdtemp()
+        shutil.copytree('tests/machine_files/config_cache',
+                        os.path.join(self.path, 'machine'))
+        shutil.copy('mpf/mpfconfig.yaml', self.path)
+
+        user_cache_path = patch.object(MachineController, 'user_cache_path',
+                                       os.path.join(self.path, 'user_cache'))
+        user_cache_path.start()
+        self.addCleanup(user_cache_path.stop)
+
+        super(TestConfigCache, self).setUp()
+
+    def tearDown(self):
+        super(TestConfigCache, self).tearDown()
+        shutil.rmtree(self.path)
+
+    def test_snapshot_is_saved(self):
+        # the MPF config cache isn't written next to mpfconfig.yaml
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'cache')))
+        self.assertEqual(1, len(os.listdir(
+            os.path.join(self.path, 'user_cache'))))
+
+        snapshot = self.machine._config_cache.load()
+
+        self.assertIn('machine', snapshot['configs'])
+        self.assertIn('mode:mode1', snapshot['configs'])
+        self.assertIn('game', snapshot['validated'])
+        self.assertIn(os.path.join(self.path, 'machine', 'config',
+                                   'switches.yaml'), snapshot['sources'])
+        self.assertIn(os.path.join(self.path, 'mpfconfig.yaml'),
+                      snapshot['sources'])
+
+    def test_boot_from_snapshot(self):
+        with patch.object(Config, 'load_config_file',
+                          side_effect=AssertionError):
+            machine = MachineController(self.getOptions())
+
+        self.assertEqual(5, machine.config['game']['balls_per_game'])
+        self.assertIn('s_test', machine.switches)
+        mode1 = [x for x in machine.modes if x.name == 'mode1'][0]
+        self.assertEqual(200, mode1.config['mode']['priority'])
+
+    def test_changed_file_invalidates_snapshot(self):
+        with open(os.path.join(self.path, 'machine', 'config',
+                               'switches.yaml'), 'a') as f:
+            f.write('    s_test2:\n        number: 2\n')
+
+        machine = MachineController(self.getOptions())
+        self.assertIn('s_test2', machine.switches)
+
+    def test_rebuild_cache(self):
+        options = self.getOptions()
+        options['rebuild_cache'] = True
+
+        with patch.object(Config, 'load_config_file',
+                          wraps=Config.load_config_file) as load:
+            MachineController(options)
+
+        self.assertTrue(load.called)
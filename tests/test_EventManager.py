@@ -182,6 +182,61 @@ class TestEventManager(MpfTestCase):
         self.assertEquals(self._handlers_called[0], self.event_handler2)
         self.assertEquals(self._handlers_called[1], self.event_handler1)
 
+    def test_event_handler_same_priority(self):
+        # tests that handlers with the same priority are called in the order
+        # they were registered, and that a handler registered later with a
+        # higher priority is still called first
+        self.machine.events.add_handler('test_event', self.event_handler1)
+        self.machine.events.add_handler('test_event', self.event_handler2)
+        self.machine.events.add_handler('test_event', self.callback,
+                                        priority=2)
+        self.advance_time_and_run(1)
+
+        self.machine.events.post('test_event')
+        self.advance_time_and_run(1)
+
+        self.assertEquals([self.callback, self.event_handler1,
+                           self.event_handler2], self._handlers_called)
+
+    def test_handler_added_while_processing_event(self):
+        # tests that a handler which is added while an event is processed is
+        # not called for that post, but is called for the next one
+        def add_second_handler():
+            self.machine.events.add_handler('test_event', self.event_handler2)
+
+        self.machine.events.add_handler('test_event', add_second_handler,
+                                        priority=2)
+        self.advance_time_and_run(1)
+
+        self.machine.events.post('test_event')
+        self.advance_time_and_run(1)
+
+        self.assertEquals(0, self._handler2_called)
+
+        self.machine.events.post('test_event')
+        self.advance_time_and_run(1)
+
+        self.assertEquals(1, self._handler2_called)
+
+    def test_handler_kwargs_are_merged(self):
+        # tests that post kwargs win over the kwargs the handler was
+        # registered with, and that the registered kwargs are not changed
+        self.machine.events.add_handler('test_event', self.event_handler1,
+                                        test1='handler', test2='handler')
+        self.advance_time_and_run(1)
+
+        self.machine.events.post('test_event', test1='post')
+        self.advance_time_and_run(1)
+
+        self.assertEquals({'test1': 'post', 'test2': 'handler'},
+                          self._handler1_kwargs)
+
+        self.machine.events.post('test_event')
+        self.advance_time_and_run(1)
+
+        self.assertEquals({'test1': 'handler', 'test2': 'handler'},
+                          self._handler1_kwargs)
+
     def test_remove_handler_by_handler(self):
         # tests that a handler can be removed by passing the handler to remove
         self.machine.events.add_handler('test_event', self.event_handler1)
@@ -0,0 +1,139 @@
+from MpfTestCase import MpfTestCase
+from mpf.platform import fast
+from mpf.system.send_queue import SendQueue
+
+
+class FakeCommunicator(object):
+    """Stands in for the SerialCommunicator of a FAST processor and records
+    the messages which are sent to it."""
+
+    processors = {'com4': 'NET', 'com5': 'RGB'}
+
+    def __init__(self, machine, platform, port, baud, send_queue,
+                 receive_queue):
+        self.receive_queue = receive_queue
+        self.sent = list()
+        platform.register_processor_connection(self.processors[port], self)
+
+    def send(self, msg):
+        if msg == 'SA:':
+            self.receive_queue.put('SA:01,00,01,00')
+        elif not msg.startswith('WD:'):
+            self.sent.append(msg)
+
+
+class TestFAST(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'config.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/fast/'
+
+    def get_platform(self):
+        return 'fast'
+
+    def setUp(self):
+        self.serial_imported = fast.serial_imported
+        self.serial_communicator = fast.SerialCommunicator
+        fast.serial_imported = True
+        fast.SerialCommunicator = FakeCommunicator
+        super(TestFAST, self).setUp()
+
+        self.rgb = self.machine.default_platform.rgb_connection
+        del self.rgb.sent[:]
+
+    def tearDown(self):
+        super(TestFAST, self).tearDown()
+        fast.serial_imported = self.serial_imported
+        fast.SerialCommunicator = self.serial_communicator
+
+    def _get_sent(self):
+        sent = list(self.rgb.sent)
+        del self.rgb.sent[:]
+        return sent
+
+    def _run(self, ticks=2):
+        for _ in range(ticks):
+            self.advance_time(.01)
+            self.machine_run()
+
+    def test_only_changed_leds_are_sent(self):
+        self.machine.leds.led1.color([255, 0, 0], fade_ms=0)
+        self.machine.leds.led3.color([0, 0, 255], fade_ms=0)
+        self._run()
+
+        # both changes go out in one RS:
+        self.assertEqual(1, len(self.rgb.sent))
+        self.assertEqual(['01ff0000', '030000ff'],
+                         sorted(self._get_sent()[0][3:].split(',')))
+
+        # nothing changed, so nothing is sent
+        self._run()
+        self.assertEqual([], self._get_sent())
+
+    def test_refresh(self):
+        self.machine.leds.led2.color([0, 255, 0], fade_ms=0)
+        self._run()
+        self._get_sent()
+
+        # every LED is sent once the refresh interval passed
+        self.advance_time(1)
+        self._run()
+        sent = self._get_sent()
+        self.assertEqual(1, len(sent))
+        self.assertEqual(['01000000', '0200ff00', '03000000'],
+                         sorted(sent[0][3:].split(',')))
+
+        # and all of them are turned off with RA: if they're all off
+        self.machine.leds.led2.color([0, 0, 0], fade_ms=0)
+        self._run()
+        self._get_sent()
+        self.advance_time(1)
+        self._run()
+        self.assertEqual(['RA:000000'], self._get_sent())
+
+    def test_refresh_disabled(self):
+        self.machine.default_platform.config['led_refresh_interval'] = 0
+        self._run()
+        self._get_sent()
+
+        self.advance_time(5)
+        self._run()
+        self.assertEqual([], self._get_sent())
+
+        self.machine.leds.led1.color([255, 255, 255], fade_ms=0)
+        self._run()
+        self.assertEqual(['RS:01ffffff'], self._get_sent())
+
+    def test_led_stats(self):
+        platform = self.machine.default_platform
+        platform.config['led_refresh_interval'] = 0
+        stats = platform.get_led_stats()
+
+        self.machine.leds.led1.color([255, 255, 255], fade_ms=0)
+        self._run(1)
+
+        # RS:01ffffff plus the \r, where all three LEDs would have taken
+        # RS: and 9 bytes per LED
+        new_stats = platform.get_led_stats()
+        self.assertEqual(12, new_stats['bytes_sent'] - stats['bytes_sent'])
+        self.assertEqual(30 - 12,
+                         new_stats['bytes_saved'] - stats['bytes_saved'])
+        self.assertGreater(new_stats['bytes_saved_per_sec'], 0)
+
+    def test_ra_stays_in_order_with_rs(self):
+        communicator = self.serial_communicator.__new__(
+            self.serial_communicator)
+        communicator.send_queue = SendQueue(3, 'test_fast')
+        communicator.dmd = False
+
+        # RS: only has the LEDs which changed, so a newer RA: can't take the
+        # place of a queued one, and it can't be dropped to make room
+        communicator.send('RA:000000')
+        communicator.send('RS:01ff0000')
+        communicator.send('RA:000000')
+
+        queue = communicator.send_queue
+        self.assertEqual(['RA:000000\r', 'RS:01ff0000\r', 'RA:000000\r'],
+                         [queue.get_nowait() for _ in range(queue.qsize())])
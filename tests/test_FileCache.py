@@ -0,0 +1,82 @@
+import cPickle
+import os
+import shutil
+import tempfile
+import unittest
+
+from mpf.system.file_cache import FileCache
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.source = os.path.join(self.path, 'source.yaml')
+        self.cache_file = os.path.join(self.path, 'cache', 'source.cache')
+
+        with open(self.source, 'w') as f:
+            f.write('- tocks: 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_save_and_load(self):
+        cache = FileCache(self.cache_file, key=('1', '3'))
+        self.assertIsNone(cache.load())
+
+        data = [{'tocks': 1, 'leds': {'led1': 'ff0000'}}]
+        self.assertTrue(cache.save([self.source], data))
+        self.assertEqual(data, cache.load())
+        self.assertEqual(data, cache.load([self.source]))
+
+        # the sources have to match if they're passed
+        self.assertIsNone(cache.load([self.source, self.source]))
+
+        # and so does the key
+        self.assertIsNone(FileCache(self.cache_file, key=('2', '3')).load())
+
+    def test_touched_source_is_still_valid(self):
+        cache = FileCache(self.cache_file)
+        cache.save([self.source], 'data')
+
+        stat = os.stat(self.source)
+        os.utime(self.source, (stat.st_atime + 10, stat.st_mtime + 10))
+
+        self.assertEqual('data', cache.load())
+
+    def test_changed_source_is_stale(self):
+        cache = FileCache(self.cache_file)
+        cache.save([self.source], 'data')
+
+        with open(self.source, 'w') as f:
+            f.write('- tocks: 2\n')
+
+        self.assertIsNone(cache.load())
+
+        os.remove(self.source)
+        self.assertIsNone(cache.load())
+
+    def test_broken_cache_file(self):
+        cache = FileCache(self.cache_file)
+        cache.save([self.source], 'data')
+
+        with open(self.cache_file, 'r+b') as f:
+            f.seek(12)
+            f.write('garbage')
+
+        self.assertIsNone(cache.load())
+
+        cache.remove()
+        self.assertFalse(os.path.exists(self.cache_file))
+
+    def test_pickle_serializer(self):
+        cache = FileCache(self.cache_file, serializer=cPickle)
+        cache.save([self.source], set([1, 2]))
+        self.assertEqual(set([1, 2]), cache.load())
+
+        # marshal can't store anything but built in types
+        class Foo(object):
+            pass
+
+        self.assertFalse(FileCache(self.cache_file).save([self.source],
+                                                         Foo()))
@@ -0,0 +1,108 @@
+from mock import MagicMock
+
+from MpfTestCase import MpfTestCase
+
+
+class TestLED(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_led.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/led/'
+
+    def test_color_is_written_once_per_tick(self):
+        led = self.machine.leds.led1
+        led.hw_driver.color = MagicMock()
+
+        led.color([255, 0, 0], fade_ms=0)
+        led.color([0, 255, 0], fade_ms=0)
+        self.assertEqual([0, 255, 0],
+                         self.machine.light_controller.led_buffer.get_color(
+                             led.index))
+        led.hw_driver.color.assert_not_called()
+
+        self.machine_run()
+        led.hw_driver.color.assert_called_once_with([0, 255, 0])
+
+        # nothing changed, so nothing is written
+        self.machine_run()
+        self.assertEqual(1, led.hw_driver.color.call_count)
+
+    def test_fade(self):
+        led = self.machine.leds.led1
+        led.hw_driver.color = MagicMock()
+
+        led.color([200, 100, 0], fade_ms=1000)
+        self.assertTrue(led.fade_in_progress)
+
+        self.advance_time(0.5)
+        self.machine_run()
+        led.hw_driver.color.assert_called_with([100, 50, 0])
+        self.assertEqual([100, 50, 0], led.get_state()['color'])
+
+        self.advance_time(0.6)
+        self.machine_run()
+        led.hw_driver.color.assert_called_with([200, 100, 0])
+        self.assertFalse(led.fade_in_progress)
+        self.assertEqual([200, 100, 0], led.get_state()['color'])
+
+        # a color without a fade stops the fade
+        led.color([0, 0, 255], fade_ms=1000)
+        led.color([0, 0, 0], fade_ms=0)
+        self.assertFalse(led.fade_in_progress)
+        self.advance_time_and_run(2)
+        led.hw_driver.color.assert_called_with([0, 0, 0])
+
+    def test_brightness_compensation(self):
+        led = self.machine.leds.led2
+        led.hw_driver.color = MagicMock()
+
+        led.color([255, 100, 10], fade_ms=0)
+        self.machine_run()
+        led.hw_driver.color.assert_called_once_with([127, 50, 5])
+
+        led.set_brightness_compensation([1.0])
+        led.color([255, 100, 10], fade_ms=0)
+        self.machine_run()
+        led.hw_driver.color.assert_called_with([255, 100, 10])
+
+    def test_brightness_compensation_is_clamped(self):
+        led = self.machine.leds.led2
+        led.hw_driver.color = MagicMock()
+
+        led.set_brightness_compensation([2.0])
+        led.color([200, 100, 10], fade_ms=0)
+        self.machine_run()
+        led.hw_driver.color.assert_called_once_with([255, 200, 20])
+
+        led.color([0, 0, 0], fade_ms=0)
+        led.color([200, 0, 0], fade_ms=1000)
+        self.advance_time_and_run(2)
+        led.hw_driver.color.assert_called_with([255, 0, 0])
+
+    def test_priority(self):
+        led = self.machine.leds.led1
+
+        led.color([255, 255, 255], fade_ms=0, priority=10)
+        led.color([0, 0, 0], fade_ms=0, priority=5)
+        self.assertEqual([255, 255, 255], led.get_state()['color'])
+
+    def test_led_update_list_keeps_highest_priority(self):
+        led = self.machine.leds.led1
+        light_controller = self.machine.light_controller
+
+        light_controller._add_to_led_update_list(led, [255, 0, 0], 0, 2,
+                                                 False)
+        light_controller._add_to_led_update_list(led, [0, 255, 0], 0, 1,
+                                                 False)
+        self.assertEqual([255, 0, 0],
+                         light_controller.led_update_list[led]['color'])
+
+        light_controller._add_to_led_update_list(led, [0, 0, 255], 0, 2,
+                                                 False)
+        self.assertEqual([0, 0, 255],
+                         light_controller.led_update_list[led]['color'])
+
+        self.machine_run()
+        self.assertEqual([0, 0, 255], led.get_state()['color'])
@@ -114,6 +114,34 @@ class TestOPP(MpfTestCase):
         self._test_switches()
         self._test_flippers()
 
+    def test_neopixel_color_table(self):
+        card = opp.OPPNeopixelCard('\x22', dict(), MagicMock())
+
+        # 32 pixels fill the color table
+        for i in range(32):
+            card.set_pixel(i, (i, 0, 0))
+        msg = bytearray()
+        card.add_update_msg(msg)
+        self.assertEqual(32 * 7 + 32 * 5, len(msg))
+        self.assertEqual(32, card.numColorEntries)
+
+        # no free entry, so the new color waits
+        card.set_pixel(32, (255, 255, 255))
+        msg = bytearray()
+        card.add_update_msg(msg)
+        self.assertFalse(msg)
+        self.assertEqual({32: (255, 255, 255)}, card.pending)
+
+        # pixel 0 takes the color of pixel 1, which frees entry 0 for it
+        card.set_pixel(0, (1, 0, 0))
+        msg = bytearray()
+        card.add_update_msg(msg)
+        self.assertFalse(card.pending)
+        self.assertEqual(
+            self._crc_message('\x22\x16\x00\x81', False) +
+            self._crc_message('\x22\x11\x00\xff\xff\xff', False) +
+            self._crc_message('\x22\x16\x20\x80', False), str(msg))
+
     def _test_switches(self):
         # initial switches
         self.assertTrue(self.machine.switch_controller.is_active("s_test"))
@@ -169,22 +197,20 @@ class TestOPP(MpfTestCase):
         self.assertFalse(self.serialMock.expected_commands)
 
     def _test_leds(self):
-        # add ff/ff/ff as color 0
-        self.serialMock.expected_commands[self._crc_message('\x21\x11\x00\xff\xff\xff', False)] = False
-        # set led 0 to color 0
-        self.serialMock.expected_commands[self._crc_message('\x21\x16\x00\x80', False)] = False
+        # add ff/ff/ff as color 0 and set led 0 to color 0
+        self.serialMock.expected_commands[self._crc_message('\x21\x11\x00\xff\xff\xff', False) +
+                                          self._crc_message('\x21\x16\x00\x80')] = False
 
         self.machine.leds.test_led1.on()
         for i in range(10):
             self._write_message("\xff", False)
         self.assertFalse(self.serialMock.expected_commands)
 
-        # add 00/00/00 as color 1
-        self.serialMock.expected_commands[self._crc_message('\x21\x11\x01\x00\x00\x00', False)] = False
-        # set led 0 to color 1
-        self.serialMock.expected_commands[self._crc_message('\x21\x16\x00\x81', False)] = False
-        # set led 1 to color 10
-        self.serialMock.expected_commands[self._crc_message('\x21\x16\x01\x80', False)] = False
+        # add 00/00/00 as color 1, set led 0 to color 1 and led 1 to color 0,
+        # all in one message
+        self.serialMock.expected_commands[self._crc_message('\x21\x11\x01\x00\x00\x00', False) +
+                                          self._crc_message('\x21\x16\x00\x81', False) +
+                                          self._crc_message('\x21\x16\x01\x80')] = False
 
         self.machine.leds.test_led1.off()
         self.machine.leds.test_led2.on()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+
+from MpfTestCase import MpfTestCase
+from mpf.system.file_manager import FileManager
+
+
+class TestProfiler(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_profiler.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/profiler/'
+
+    def _slow_handler(self):
+        self.advance_time(0.002)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(self.machine.profiler.enabled)
+        self.assertIsNone(self.machine.events.profiler)
+
+        self.advance_time_and_run(1)
+        self.assertEqual(0, self.machine.profiler.get_stats()['tick']['count'])
+
+    def test_tick_phases(self):
+        platform = self.machine.default_platform
+        tick = platform.tick
+        self.machine.profiler.enable()
+        self.assertNotEqual(tick, platform.tick)
+        self.machine.events.add_handler('timer_tick', self._slow_handler)
+
+        for _ in range(10):
+            self.machine_run()
+
+        stats = self.machine.profiler.get_stats()
+        self.assertEqual(10, stats['tick']['count'])
+        self.assertEqual(2.0, stats['phases']['timer_tick']['p50'])
+        self.assertEqual(0.0, stats['phases']['tasks']['max'])
+
+        handler = [x for x in stats['handlers']
+                   if x['handler'].endswith('_slow_handler')][0]
+        self.assertEqual('timer_tick', handler['event'])
+        self.assertEqual(10, handler['calls'])
+        self.assertAlmostEqual(20.0, handler['total'], 2)
+
+        self.machine.profiler.disable()
+        self.assertIsNone(self.machine.events.profiler)
+        self.assertEqual(tick, platform.tick)
+        self.machine_run()
+        self.assertEqual(
+            10, self.machine.profiler.get_stats()['tick']['count'])
+
+        self.machine.profiler.reset()
+        self.assertEqual([], self.machine.profiler.get_stats()['handlers'])
+
+    def test_rolling_window(self):
+        self.machine.profiler.enable()
+
+        for _ in range(self.machine.profiler.window + 10):
+            self.machine_run()
+
+        self.assertEqual(self.machine.profiler.window,
+                         self.machine.profiler.get_stats()['tick']['count'])
+
+    def test_switch_to_coil_latency(self):
+        self.machine.profiler.enable()
+
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.advance_time(0.003)
+        self.machine.coils.c_test.pulse()
+
+        # coils fired outside the latency window are not counted
+        self.advance_time(1)
+        self.machine.coils.c_test.pulse()
+
+        latency = self.machine.profiler.get_stats()['latency']['c_test']
+        self.assertEqual(1, latency['<=5'])
+        self.assertEqual(1, sum(latency.values()))
+
+        self.assertEqual('c_test:0,0,1,0,0,0,0,0,0,0',
+                         self.machine.profiler.get_bcp_stats()['latency'])
+
+    def test_dump(self):
+        self.machine.profiler.enable()
+        self.machine_run()
+
+        handle, filename = tempfile.mkstemp(suffix='.yaml')
+        os.close(handle)
+
+        try:
+            self.machine.profiler.dump(filename)
+            stats = FileManager.load(filename)
+        finally:
+            os.remove(filename)
+
+        self.assertEqual(1, stats['tick']['count'])
+        self.assertIn('light_controller', stats['phases'])
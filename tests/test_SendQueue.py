@@ -0,0 +1,119 @@
+import threading
+import unittest
+from Queue import Empty, Full
+
+from mpf.system.send_queue import (SendQueue, BLOCK, DROP_OLDEST, COALESCE,
+                                   get_queue_stats)
+
+
+class TestSendQueue(unittest.TestCase):
+
+    def test_fifo(self):
+        queue = SendQueue(10, 'test_fifo')
+        self.assertTrue(queue.empty())
+
+        for i in range(3):
+            queue.put(i)
+
+        self.assertEqual(3, queue.qsize())
+        self.assertEqual([0, 1, 2], [queue.get() for _ in range(3)])
+        self.assertRaises(Empty, queue.get_nowait)
+        self.assertRaises(Empty, queue.get, True, 0.01)
+
+    def test_drop_oldest(self):
+        queue = SendQueue(3, 'test_drop_oldest')
+        queue.put('DL:1')
+        queue.put('frame1', DROP_OLDEST)
+        queue.put('frame2', DROP_OLDEST)
+
+        # the oldest frame makes room, commands are kept
+        self.assertTrue(queue.put('frame3', DROP_OLDEST))
+        self.assertEqual(['DL:1', 'frame2', 'frame3'],
+                         [queue.get() for _ in range(3)])
+
+        # if there are no frames to drop, the new one is dropped
+        for i in range(3):
+            queue.put(i)
+        self.assertFalse(queue.put('frame4', DROP_OLDEST))
+
+        self.assertEqual(2, queue.get_stats()['dropped'])
+
+    def test_keyed_frames_are_replaced(self):
+        queue = SendQueue(10, 'test_keyed_frames')
+        queue.put('RS:1', DROP_OLDEST, 'RS:')
+        queue.put('SA:')
+        queue.put('RS:2', DROP_OLDEST, 'RS:')
+
+        self.assertEqual(['RS:2', 'SA:'], [queue.get() for _ in range(2)])
+
+        # once a frame is sent, the next one is queued again
+        queue.put('RS:3', DROP_OLDEST, 'RS:')
+        self.assertEqual('RS:3', queue.get())
+        self.assertEqual(1, queue.get_stats()['dropped'])
+
+    def test_coalesce(self):
+        queue = SendQueue(2, 'test_coalesce')
+        queue.put('GI:01,00', COALESCE, 'GI:01')
+        queue.put('GI:02,00', COALESCE, 'GI:02')
+
+        # replacing a queued message works even when the queue is full
+        self.assertTrue(queue.put('GI:01,FF', COALESCE, 'GI:01'))
+        self.assertEqual(['GI:01,FF', 'GI:02,00'],
+                         [queue.get() for _ in range(2)])
+
+        stats = queue.get_stats()
+        self.assertEqual(3, stats['puts'])
+        self.assertEqual(1, stats['coalesced'])
+        self.assertEqual(2, stats['max_depth'])
+        self.assertEqual(0, stats['depth'])
+
+    def test_block(self):
+        queue = SendQueue(1, 'test_block', block_timeout=0.01)
+        queue.log.disabled = True
+        queue.put('DL:1')
+
+        # nothing is taking messages out, so it times out, but commands are
+        # never dropped
+        self.assertRaises(Full, queue.put, 'DL:2', BLOCK)
+        self.assertRaises(Full, queue.put, 'GI:01,00', COALESCE, 'GI:01')
+        self.assertEqual(2, queue.get_stats()['blocked'])
+        self.assertEqual(0, queue.get_stats()['dropped'])
+
+        # now a sending thread makes room
+        queue.block_timeout = 5
+        sent = list()
+        thread = threading.Thread(target=lambda: sent.append(queue.get()))
+        thread.start()
+
+        self.assertTrue(queue.put('DL:3', BLOCK))
+        thread.join()
+        self.assertEqual(['DL:1'], sent)
+        self.assertEqual('DL:3', queue.get())
+
+    def test_frames_make_room_for_commands(self):
+        queue = SendQueue(2, 'test_frames_make_room')
+        queue.put('frame1', DROP_OLDEST)
+        queue.put('DL:1')
+
+        self.assertTrue(queue.put('DL:2', BLOCK))
+        self.assertEqual(['DL:1', 'DL:2'], [queue.get() for _ in range(2)])
+
+        stats = queue.get_stats()
+        self.assertEqual(1, stats['dropped'])
+        self.assertEqual(0, stats['blocked'])
+
+    def test_clear_and_stats(self):
+        queue = SendQueue(10, 'test_clear_and_stats')
+        queue.put('frame', DROP_OLDEST, 'frame')
+        queue.put('cmd')
+        queue.clear()
+
+        self.assertTrue(queue.empty())
+        self.assertEqual(2, queue.get_stats()['dropped'])
+
+        # the key is free again
+        queue.put('frame', DROP_OLDEST, 'frame')
+        self.assertEqual(1, queue.qsize())
+
+        self.assertEqual(queue.get_stats(),
+                         get_queue_stats()['test_clear_and_stats'])
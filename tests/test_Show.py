@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+
+from mock import MagicMock
+
+from MpfTestCase import MpfTestCase
+from mpf.system.light_controller import Show
+
+
+class TestShow(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_shows.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/shows/'
+
+    def _create_show(self, actions):
+        return Show(machine=self.machine, config=None, file_name=None,
+                    asset_manager=self.machine.light_controller.asset_manager,
+                    actions=actions)
+
+    def _run_secs(self, secs):
+        # shows advance by ticks, so run every tick
+        for _ in range(int(round(secs * self.machine.timing.HZ))):
+            self.advance_time(self.machine.timing.secs_per_tick)
+            self.machine_run()
+
+    def _led_color(self, name):
+        return self.machine.leds[name].get_state()['color']
+
+    def test_compile(self):
+        show = self._create_show([
+            {'tocks': 1, 'leds': {'tag|show_leds': 'ff0000-f2',
+                                  'led3': [0, 0, 255]},
+             'lights': {'light1': 'ff'}, 'coils': {'c_test': 'pulse-p50'},
+             'events': 'event1, event2'},
+            {'tocks': 2},
+            {'tocks': 1, 'leds': {'led1': '00ff00', 'invalid': 'ffffff'}},
+        ])
+
+        # the empty step is merged into the previous one
+        self.assertEqual(2, show.total_locations)
+        self.assertEqual(3, show.steps[0].tocks)
+
+        # LED actions are sorted by the LEDs' frame buffer index
+        step = show.steps[0]
+        leds = sorted([self.machine.leds.led1, self.machine.leds.led2,
+                       self.machine.leds.led3], key=lambda x: x.index)
+        self.assertEqual([x.index for x in leds], list(step.led_indexes))
+
+        for i, led in enumerate(leds):
+            if led.name == 'led3':
+                self.assertEqual([0, 0, 255],
+                                 list(step.led_colors[i * 3:i * 3 + 3]))
+                self.assertEqual(0, step.led_fades[i])
+            else:
+                self.assertEqual([255, 0, 0],
+                                 list(step.led_colors[i * 3:i * 3 + 3]))
+                self.assertEqual(2, step.led_fades[i])
+        self.assertEqual(((self.machine.lights.light1, 255),), step.lights)
+        self.assertEqual(((self.machine.coils.c_test, ('pulse', 0.5)),),
+                         step.coils)
+        self.assertEqual(('event1', 'event2'), step.events)
+
+        self.assertEqual([self.machine.leds.led1.index],
+                         list(show.steps[1].led_indexes))
+        self.assertEqual(set([self.machine.leds.led1, self.machine.leds.led2,
+                              self.machine.leds.led3]), show.leds)
+
+    def test_compile_clamps_led_colors(self):
+        show = self._create_show([
+            {'tocks': 1, 'leds': {'led1': [300, -10, 128]}},
+        ])
+
+        self.assertEqual([255, 0, 128], list(show.steps[0].led_colors))
+
+    def test_play(self):
+        self.machine.coils.c_test.pulse = MagicMock()
+        show = self._create_show([
+            {'tocks': 1, 'leds': {'led1': 'ff0000', 'led2': '0000ff'},
+             'coils': {'c_test': 'pulse'}},
+            {'tocks': 1, 'leds': {'led1': '00ff00'}},
+        ])
+
+        show.play(repeat=True, tocks_per_sec=1)
+        self.machine_run()
+        self.machine_run()
+        self.assertEqual([255, 0, 0], self._led_color('led1'))
+        self.assertEqual([0, 0, 255], self._led_color('led2'))
+        self.machine.coils.c_test.pulse.assert_called_once_with(power=1.0)
+
+        self._run_secs(1)
+        self.assertEqual([0, 255, 0], self._led_color('led1'))
+
+        # it repeats
+        self._run_secs(1)
+        self.assertEqual([255, 0, 0], self._led_color('led1'))
+
+        show.stop()
+        self._run_secs(1)
+        self.assertEqual([0, 0, 0], self._led_color('led1'))
+
+    def test_fade(self):
+        show = self._create_show([
+            {'tocks': 4, 'leds': {'led1': 'c80000-f2'}},
+        ])
+
+        show.play(tocks_per_sec=2)
+        self.machine_run()
+        self.machine_run()
+
+        self._run_secs(.5)
+        # about halfway through the fade
+        self.assertAlmostEqual(100, self._led_color('led1')[0], delta=5)
+
+        self._run_secs(.6)
+        self.assertEqual([200, 0, 0], self._led_color('led1'))
+
+    def test_resync(self):
+        low = self._create_show([
+            {'tocks': 1, 'leds': {'led1': 'ff0000'}},
+            {'tocks': 1, 'leds': {'led2': '00ff00'}},
+            {'tocks': 10},
+        ])
+        high = self._create_show([
+            {'tocks': 1, 'leds': {'led1': 'ffffff', 'led2': 'ffffff'}},
+        ])
+
+        low.play(tocks_per_sec=1, priority=1)
+        self._run_secs(1.5)
+        high.play(tocks_per_sec=1, priority=2, hold=False)
+        self._run_secs(.1)
+        self.assertEqual([255, 255, 255], self._led_color('led1'))
+
+        high.stop()
+        self._run_secs(.1)
+        self.assertEqual([255, 0, 0], self._led_color('led1'))
+        self.assertEqual([0, 255, 0], self._led_color('led2'))
+
+    def test_show_cache(self):
+        path = tempfile.mkdtemp()
+        self.machine.options['no_cache'] = False
+        self.machine.config['mpf']['paths']['show_cache'] = path
+
+        show_file = os.path.join(path, 'show.yaml')
+        with open(show_file, 'w') as f:
+            f.write('- tocks: 1\n  leds:\n    led1: ff0000\n')
+
+        try:
+            show = self._create_show([{'tocks': 1}])
+            show.file_name = show_file
+
+            actions = show.load_show_from_disk()
+            self.assertEqual([{'tocks': 1, 'leds': {'led1': 'ff0000'}}],
+                             actions)
+            self.assertEqual(2, len(os.listdir(path)))
+
+            # loads from the cache, which is still valid
+            show._get_cache().save([show_file], [{'tocks': 5}])
+            self.assertEqual([{'tocks': 5}], show.load_show_from_disk())
+
+            # the cache is stale when the show changes
+            with open(show_file, 'w') as f:
+                f.write('- tocks: 2\n')
+            self.assertEqual([{'tocks': 2}], show.load_show_from_disk())
+
+        finally:
+            shutil.rmtree(path)
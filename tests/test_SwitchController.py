@@ -0,0 +1,190 @@
+from MpfTestCase import MpfTestCase
+
+
+class TestSwitchController(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_switch_controller.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/switch_controller/'
+
+    def setUp(self):
+        super(TestSwitchController, self).setUp()
+        self._handler_calls = list()
+
+    def _handler(self, **kwargs):
+        self._handler_calls.append(kwargs)
+
+    def test_process_switch_by_number(self):
+        self.machine.switch_controller.process_switch(num='1', state=1)
+        self.assertTrue(self.machine.switch_controller.is_active('s_test'))
+        self.assertTrue(self.machine.switches.s_test.state)
+
+        self.machine.switch_controller.process_switch(num='1', state=0)
+        self.assertTrue(self.machine.switch_controller.is_inactive('s_test'))
+
+        # unknown numbers are ignored
+        self.machine.switch_controller.process_switch(num='99', state=1)
+
+    def test_process_nc_switch(self):
+        # the virtual platform starts with NC switches closed
+        self.assertTrue(
+            self.machine.switch_controller.is_inactive('s_test_nc'))
+
+        self.machine.switch_controller.process_switch(num='2', state=0)
+        self.assertTrue(self.machine.switch_controller.is_active('s_test_nc'))
+
+        self.machine.switch_controller.process_switch('s_test_nc', state=0,
+                                                      logical=True)
+        self.assertTrue(
+            self.machine.switch_controller.is_inactive('s_test_nc'))
+        self.assertEqual(1, self.machine.switches.s_test_nc.hw_state)
+
+    def test_switch_handler(self):
+        self.machine.switch_controller.add_switch_handler(
+            's_test', self._handler, return_info=True)
+        self.machine.switch_controller.add_switch_handler(
+            's_test', self._handler, state=0, callback_kwargs={'test': 1})
+
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.assertEqual([{'switch_name': 's_test', 'state': 1, 'ms': 0}],
+                         self._handler_calls)
+
+        self.machine.switch_controller.process_switch('s_test', 0)
+        self.assertEqual({'test': 1}, self._handler_calls[1])
+
+        self.machine.switch_controller.remove_switch_handler('s_test',
+                                                             self._handler)
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.assertEqual(2, len(self._handler_calls))
+
+    def test_ms_since_change(self):
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.advance_time_and_run(.5)
+
+        self.assertAlmostEqual(
+            500, self.machine.switch_controller.ms_since_change('s_test'), 0)
+        self.assertTrue(
+            self.machine.switch_controller.is_active('s_test', ms=400))
+        self.assertFalse(
+            self.machine.switch_controller.is_active('s_test', ms=600))
+
+    def test_switch_events(self):
+        self.machine.events.add_handler('s_test_active', self._handler)
+        self.machine.events.add_handler('sw_test_tag', self._handler)
+
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.machine.switch_controller.process_switch('s_test_tagged', 1)
+        self.advance_time_and_run(.1)
+
+        self.assertEqual(2, len(self._handler_calls))
+
+    def test_process_switches(self):
+        self.machine.events.add_handler('s_test_active', self._handler)
+        self.machine.events.add_handler('s_test_nc_active', self._handler)
+
+        switches = self.machine.switches
+        self.machine.switch_controller.process_switches(
+            [(switches.s_test, 1), (switches.s_test_nc, 0),
+             (switches.s_test_tagged, 1), (switches.s_test_tagged, 0)])
+
+        # the events are processed right away, not on the next tick
+        self.assertEqual(2, len(self._handler_calls))
+        self.assertTrue(self.machine.switch_controller.is_active('s_test'))
+        self.assertTrue(self.machine.switch_controller.is_active('s_test_nc'))
+        self.assertTrue(
+            self.machine.switch_controller.is_inactive('s_test_tagged'))
+
+    def test_timed_switch_handler(self):
+        self.machine.switch_controller.add_switch_handler(
+            's_test', self._handler, ms=500, return_info=True)
+
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.advance_time_and_run(.4)
+        self.assertEqual([], self._handler_calls)
+
+        self.advance_time_and_run(.2)
+        self.assertEqual([{'switch_name': 's_test', 'state': 1, 'ms': 500}],
+                         self._handler_calls)
+
+        # the handler only fires once per activation
+        self.advance_time_and_run(1)
+        self.assertEqual(1, len(self._handler_calls))
+
+    def test_timed_switch_handler_cancelled_by_state_change(self):
+        self.machine.switch_controller.add_switch_handler(
+            's_test', self._handler, ms=500)
+        self.machine.switch_controller.add_switch_handler(
+            's_test_tagged', self._handler, ms=500)
+
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.machine.switch_controller.process_switch('s_test_tagged', 1)
+        self.advance_time_and_run(.2)
+        self.machine.switch_controller.process_switch('s_test', 0)
+
+        # only the handler of the switch which is still active fires
+        self.advance_time_and_run(1)
+        self.assertEqual(1, len(self._handler_calls))
+
+    def test_timed_switch_handler_removed(self):
+        self.machine.switch_controller.add_switch_handler(
+            's_test', self._handler, ms=500)
+
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.advance_time_and_run(.2)
+        self.machine.switch_controller.remove_switch_handler(
+            's_test', self._handler, ms=500)
+
+        self.advance_time_and_run(1)
+        self.assertEqual([], self._handler_calls)
+
+    def test_timed_switch_handler_added_while_active(self):
+        self.machine.switch_controller.process_switch('s_test', 1)
+        self.advance_time_and_run(.2)
+
+        # the handler fires based on when the switch became active
+        self.machine.switch_controller.add_switch_handler(
+            's_test', self._handler, ms=500)
+        self.advance_time_and_run(.2)
+        self.assertEqual([], self._handler_calls)
+
+        self.advance_time_and_run(.2)
+        self.assertEqual(1, len(self._handler_calls))
+
+    def test_request_hw_switch_states(self):
+        platform = self.machine.default_platform
+        callbacks = list()
+        platform.request_hw_switch_states = callbacks.append
+        results = list()
+
+        # the platform answers later, so nothing is waiting meanwhile
+        request = self.machine.switch_controller.request_hw_switch_states(
+            results.append)
+        self.assertFalse(request.done)
+        self.assertEqual(1, len(callbacks))
+
+        states = dict(platform.get_hw_switch_states())
+        states[self.machine.switches.s_test.number] = 1
+        callbacks[0](states)
+
+        self.assertEqual([request], results)
+        self.assertEqual(1, request.states[platform][
+            self.machine.switches.s_test.number])
+        self.advance_time_and_run(.1)
+        self.assertEqual([], self.machine.switch_controller.hw_state_requests)
+
+        # a platform which never answers times out, and it's told to stop
+        # waiting for the answer
+        cancelled = list()
+        platform.cancel_hw_switch_states = cancelled.append
+        request = self.machine.switch_controller.request_hw_switch_states(
+            results.append)
+        self.advance_time_and_run(1)
+        self.assertFalse(request.done)
+        self.advance_time_and_run(5)
+        self.assertTrue(request.done)
+        self.assertEqual([callbacks[1]], cancelled)
+        self.assertEqual(request, results[1])
+        self.assertEqual(dict(), request.states)
+        self.assertEqual([], self.machine.switch_controller.hw_state_requests)
@@ -0,0 +1,238 @@
+import unittest
+
+from MpfTestCase import MpfTestCase
+from mpf.system.tasks import DelayManager, Task
+from mpf.system.timing import Timer, TimerQueue, Wakeup
+
+
+class TestTiming(MpfTestCase):
+
+    def getConfigFile(self):
+        return 'test_event_manager.yaml'
+
+    def getMachinePath(self):
+        return '../tests/machine_files/event_manager/'
+
+    def setUp(self):
+        super(TestTiming, self).setUp()
+        self._called = list()
+
+    def _callback(self):
+        self._called.append('callback')
+
+    def test_timer_queue(self):
+        queue = TimerQueue()
+        self.assertFalse(queue.get_next())
+
+        entry1 = queue.add(20, 'b')
+        queue.add(10, 'a')
+        queue.add(20, 'c')
+        self.assertEqual(10, queue.get_next())
+        self.assertEqual(3, len(queue))
+
+        queue.cancel(entry1)
+        queue.cancel(entry1)
+        self.assertEqual(2, len(queue))
+
+        self.assertEqual(['a'], list(queue.pop_due(15)))
+        self.assertEqual(20, queue.get_next())
+        self.assertEqual(['c'], list(queue.pop_due(20)))
+        self.assertFalse(queue.get_next())
+
+    def test_timer_queue_items_added_while_popping(self):
+        queue = TimerQueue()
+        queue.add(10, 'a')
+
+        popped = list()
+        for item in queue.pop_due(10):
+            popped.append(item)
+            queue.add(10, 'b')
+
+        self.assertEqual(['a'], popped)
+        self.assertEqual(['b'], list(queue.pop_due(10)))
+
+    def test_timer_queue_items_readded_in_the_past(self):
+        queue = TimerQueue()
+        queue.add(5, 'a')
+        queue.add(10, 'b')
+
+        # 'a' is re-added with a wakeup before 'b', which must still be popped
+        popped = list()
+        for item in queue.pop_due(10):
+            popped.append(item)
+            if item == 'a':
+                queue.add(5, 'a')
+
+        self.assertEqual(['a', 'b'], popped)
+        self.assertEqual(5, queue.get_next())
+        self.assertEqual(['a'], list(queue.pop_due(10)))
+
+    def test_timer_queue_cancel_set_aside_entry_during_rebuild(self):
+        queue = TimerQueue()
+        queue.add(5, 'a')
+        queue.add(6, 'b')
+        entries = [queue.add(20, i) for i in range(100)]
+
+        for item in queue.pop_due(10):
+            if item == 'a':
+                # this entry is set aside until pop_due() is done
+                entry = queue.add(5, 'c')
+
+            else:
+                # and it's cancelled, then the heap is rebuilt
+                queue.cancel(entry)
+
+                for x in entries:
+                    queue.cancel(x)
+
+        self.assertEqual(0, len(queue))
+        self.assertFalse(queue.get_next())
+        self.assertEqual(0, queue.cancelled)
+
+    def test_delays(self):
+        delay = DelayManager()
+        delay.add(ms=2000, callback=self._callback, name='d2')
+        delay.add(ms=1000, callback=self._callback, name='d1')
+        delay.add(ms=3000, callback=self._callback, name='d3')
+
+        delay.remove('d3')
+        self.assertIsNone(delay.check('d3'))
+        self.assertEqual('d2', delay.check('d2'))
+
+        self.advance_time_and_run(1.5)
+        self.assertEqual(['callback'], self._called)
+
+        self.advance_time_and_run(5)
+        self.assertEqual(2, len(self._called))
+
+    def test_delay_reset_and_remove_from_callback(self):
+        delay = DelayManager()
+        delay.add(ms=1000, callback=self._callback, name='d1')
+        delay.reset(ms=2000, callback=self._callback, name='d1')
+        delay.add(ms=2000, callback=lambda: delay.remove('d3'), name='d2')
+        delay.add(ms=2000, callback=self._callback, name='d3')
+
+        self.advance_time_and_run(1)
+        self.assertEqual([], self._called)
+
+        self.advance_time_and_run(1)
+        self.assertEqual(['callback'], self._called)
+
+        self.advance_time_and_run(10)
+        self.assertEqual(['callback'], self._called)
+
+    def test_delay_clear(self):
+        delay = DelayManager()
+        delay.add(ms=1000, callback=self._callback)
+        delay.add(ms=2000, callback=self._callback)
+        delay.clear()
+
+        self.advance_time_and_run(10)
+        self.assertEqual([], self._called)
+
+    def test_timer(self):
+        timer = Timer(self._callback, frequency=1)
+        self.machine.timing.add(timer)
+
+        for _ in range(3):
+            self.advance_time_and_run(1)
+        self.assertEqual(3, len(self._called))
+
+        self.machine.timing.remove(timer)
+        self.assertFalse(self.machine.timing.get_next_timer())
+        self.advance_time_and_run(1)
+        self.assertEqual(3, len(self._called))
+
+    def test_lagging_timer_does_not_block_other_timers(self):
+        fast_timer = Timer(self._callback, frequency=.001)
+        slow_timer = Timer(lambda: self._called.append('slow'),
+                           frequency=.02)
+        self.machine.timing.add(fast_timer)
+        self.machine.timing.add(slow_timer)
+
+        # ticking slower than the fast timer, so it's still behind after it's
+        # re-added
+        for _ in range(3):
+            self.advance_time(.03)
+            self.machine_run()
+
+        self.assertIn('slow', self._called)
+
+    def test_timer_removed_by_callback(self):
+        timer = Timer(lambda: self.machine.timing.remove(timer), frequency=1)
+        self.machine.timing.add(timer)
+
+        self.advance_time_and_run(1)
+        self.assertFalse(self.machine.timing.get_next_timer())
+
+    def test_task(self):
+        def task_callback():
+            self._called.append('start')
+            yield 1
+            self._called.append('end')
+
+        Task.create(task_callback)
+
+        # new tasks are added at the end of a tick, the generator is created
+        # on the next tick and then it runs on the tick after that
+        for _ in range(4):
+            self.machine_run()
+        self.assertEqual(['start'], self._called)
+
+        self.advance_time_and_run(2)
+        self.assertEqual(['start', 'end'], self._called)
+
+    def test_task_stop(self):
+        def task_callback():
+            while True:
+                self._called.append('run')
+                yield
+
+        task = Task.create(task_callback)
+        for _ in range(4):
+            self.machine_run()
+        self.assertEqual(2, len(self._called))
+
+        task.stop()
+        self.machine_run()
+        self.assertEqual(2, len(self._called))
+
+    def test_tasks_yielding_every_tick_do_not_block_others(self):
+        def busy_task():
+            while True:
+                yield
+
+        def task_callback():
+            while True:
+                self._called.append('run')
+                yield
+
+        # the busy task keeps the wakeup time of when it started, which is
+        # before the wakeup time of the other task
+        Task.create(busy_task)
+        for _ in range(2):
+            self.advance_time(.01)
+            self.machine_run()
+
+        Task.create(task_callback)
+        for _ in range(4):
+            self.advance_time(.01)
+            self.machine_run()
+        self.assertEqual(2, len(self._called))
+
+    @unittest.skipUnless(Wakeup.available, "fcntl is not available")
+    def test_wakeup(self):
+        wakeup = Wakeup()
+        self.assertFalse(wakeup.wait(0))
+
+        wakeup.set()
+        wakeup.set()
+        self.assertTrue(wakeup.wait(0))
+        self.assertFalse(wakeup.wait(0))
+
+        self.machine.loop_wakeup = wakeup
+        self.machine.wakeup()
+        self.assertTrue(wakeup.wait(0))
+
+        self.machine.loop_wakeup = None
+        wakeup.close()
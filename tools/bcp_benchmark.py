@@ -0,0 +1,145 @@
+"""Benchmarks the BCP command decoder against the urlparse based decoder it
+replaced.
+
+Run it from the MPF root folder:
+
+    python tools/bcp_benchmark.py [traffic_file]
+
+traffic_file is an optional text file with one BCP command string per line,
+for example commands copied out of an MPF log. If it's not passed, a built in
+sample of the traffic of a game is used.
+
+"""
+# bcp_benchmark.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import os
+import sys
+import timeit
+import urllib
+import urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+from mpf.system import bcp
+
+
+def urlparse_decode_command_string(bcp_string):
+    # The decoder MPF used before, for comparison
+    bcp_command = urlparse.urlsplit(bcp_string)
+    try:
+        kwargs = urlparse.parse_qs(bcp_command.query)
+
+    except AttributeError:
+        kwargs = dict()
+
+    return (bcp_command.path.lower(),
+            dict((k.lower(), urllib.unquote(v[0]))
+                for k, v in kwargs.iteritems()))
+
+
+def get_sample_traffic():
+    traffic = [bcp.encode_command_string('hello', version='1.0',
+                                         controller_name='Mission Pinball '
+                                                         'Framework',
+                                         controller_version='0.30.0'),
+               bcp.encode_command_string('mode_start', name='game',
+                                         priority=20),
+               bcp.encode_command_string('player_added', player_num=1),
+               bcp.encode_command_string('ball_start', player_num=1, ball=1)]
+
+    score = 0
+
+    for i in range(200):
+        score += 1000
+        traffic.append(bcp.encode_command_string(
+            'player_score', value=score, prev_value=score - 1000,
+            change=1000, player_num=1))
+        traffic.append(bcp.encode_command_string(
+            'player_variable', name='ramp_hits', value=i + 1, prev_value=i,
+            change=1, player_num=1))
+        traffic.append(bcp.encode_command_string(
+            'switch', name='s_right_ramp', state=i % 2))
+        traffic.append(bcp.encode_command_string(
+            'trigger', name='ramp_hit', text='Ramp Hits: {}'.format(i + 1)))
+        traffic.append(bcp.encode_command_string(
+            'shot', name='right_ramp', profile='default', state='lit'))
+
+    traffic.append(bcp.encode_command_string('ball_end'))
+    traffic.append(bcp.encode_command_string('mode_stop', name='game'))
+
+    return [str(x) for x in traffic]
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            traffic = [x.strip() for x in f if x.strip()]
+    else:
+        traffic = get_sample_traffic()
+
+    for message in traffic:
+        if (bcp.decode_command_string(message) !=
+                urlparse_decode_command_string(message)):
+            print "Decoders differ for:", message
+
+    def run(decoder):
+        for message in traffic:
+            decoder(message)
+
+    repeat = 20
+
+    results = list()
+
+    for name, decoder in (('urlparse', urlparse_decode_command_string),
+                          ('bcp', bcp.decode_command_string)):
+        secs = min(timeit.repeat(lambda: run(decoder), number=1,
+                                 repeat=repeat))
+        results.append(secs)
+        print '{:10} {:8.2f} us per message'.format(
+            name, secs / len(traffic) * 1000000)
+
+    print 'Speedup: {:.1f}x for {} messages'.format(results[0] / results[1],
+                                                    len(traffic))
+
+    bcp.register_command_schema('player_score', value=int, prev_value=int,
+                                change=int, player_num=int)
+    bcp.register_command_schema('player_variable', player_num=int)
+    bcp.register_command_schema('switch', state=int)
+
+    secs = min(timeit.repeat(lambda: run(bcp.decode_command_string),
+                             number=1, repeat=repeat))
+    print '{:10} {:8.2f} us per message with schemas'.format(
+        'bcp', secs / len(traffic) * 1000000)
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
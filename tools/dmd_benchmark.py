@@ -0,0 +1,228 @@
+"""Benchmarks the DMD image conversion (surface_to_dmd()) and the DMD alpha
+blit (Slide.blit_8bit_alpha()) against the pixel by pixel versions they
+replaced.
+
+Run it from the MPF root folder:
+
+    python tools/dmd_benchmark.py image_folder
+
+image_folder is a folder with the images (.png, .bmp, .jpg or .gif) you want
+to convert for your DMD, like the images folder of your machine. Each image is
+converted with the old code, the new code with NumPy (if it's installed) and
+the new code without NumPy, and the results are checked to be the same.
+
+"""
+# dmd_benchmark.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+import pygame
+
+from mpf.media_controller.display_modules import dmd
+from mpf.media_controller.core import slide
+from mpf.media_controller.core.slide import Slide
+
+IMAGE_EXTENSIONS = ('.png', '.bmp', '.jpg', '.jpeg', '.gif')
+BLITS = 200
+
+
+def legacy_surface_to_dmd(surface, shades=16, weights=(.299, .587, .114)):
+    # How surface_to_dmd() worked before, for comparison
+    width, height = surface.get_size()
+    pa = pygame.PixelArray(surface)
+    new_surface = pygame.Surface((width, height), depth=8)
+    new_pa = pygame.PixelArray(new_surface)
+
+    for x in range(width):
+        for y in range(height):
+            pixel_color = surface.unmap_rgb(pa[x, y])
+            pixel_weight = ((pixel_color[0] * weights[0]) +
+                            (pixel_color[1] * weights[1]) +
+                            (pixel_color[2] * weights[2])) / 255.0
+
+            new_pa[x, y] = int(round(pixel_weight * (shades - 1)))
+
+    del new_pa
+    return new_surface
+
+
+def legacy_blit_8bit_alpha(source_surface, dest_surface, x, y):
+    # How blit_8bit_alpha() worked before (with its range() calls fixed so it
+    # runs), for comparison
+    working_surface = dest_surface.subsurface((x, y,
+                                               source_surface.get_width(),
+                                               source_surface.get_height()))
+
+    dest_pa = pygame.PixelArray(working_surface)
+    source_pa = pygame.PixelArray(source_surface)
+
+    for y in range(working_surface.get_height()):
+        for x in range(working_surface.get_width()):
+            dest_pa[x, y] = int(dest_pa[x, y] +
+                                ((source_pa[x, y] - dest_pa[x, y]) *
+                                 (source_pa[x, y] >> 4) / 15.0))
+
+    del dest_pa
+    del source_pa
+
+
+def get_pixels(surface):
+    return pygame.image.tostring(surface, 'P')
+
+
+def load_images(folder):
+    images = list()
+
+    for path, _, files in os.walk(folder):
+        for file_name in sorted(files):
+            if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS:
+                images.append(pygame.image.load(os.path.join(path,
+                                                             file_name)))
+
+    return images
+
+
+def get_converters():
+    converters = [('legacy', legacy_surface_to_dmd, None)]
+
+    if dmd.numpy_imported:
+        converters.append(('numpy', dmd.surface_to_dmd, True))
+
+    converters.append(('python', dmd.surface_to_dmd, False))
+
+    return converters
+
+
+def run_with_numpy(module, use_numpy, method, *args):
+    # Runs the method with the module's NumPy support turned on or off
+    if use_numpy is None:
+        return method(*args)
+
+    numpy_imported = module.numpy_imported
+    module.numpy_imported = use_numpy
+
+    try:
+        return method(*args)
+    finally:
+        module.numpy_imported = numpy_imported
+
+
+def benchmark_conversion(images):
+    pixels = sum(x.get_width() * x.get_height() for x in images)
+
+    print '{} images, {} pixels'.format(len(images), pixels)
+    print '{:8} {:>10} {:>12}'.format('convert', 'secs', 'images/sec')
+
+    expected = [get_pixels(legacy_surface_to_dmd(x)) for x in images]
+
+    for name, method, use_numpy in get_converters():
+        start = time.time()
+        results = [run_with_numpy(dmd, use_numpy, method, x) for x in images]
+        secs = time.time() - start
+
+        if [get_pixels(x) for x in results] != expected:
+            print "{} results differ from the legacy results".format(name)
+
+        print '{:8} {:10.3f} {:12.1f}'.format(name, secs,
+                                              len(images) / secs if secs
+                                              else 0)
+
+
+def get_random_surface(size):
+    pixels = ''.join(chr(random.randint(0, 255))
+                     for _ in range(size[0] * size[1]))
+    surface = pygame.image.fromstring(pixels, size, 'P')
+    surface.set_palette([(i, 0, 0) for i in range(256)])
+    return surface
+
+
+def benchmark_alpha_blit(size=(128, 32)):
+    random.seed(0)
+    source = get_random_surface(size)
+    dest = get_random_surface(size)
+    blit = Slide.__new__(Slide).blit_8bit_alpha
+
+    blitters = [('legacy', legacy_blit_8bit_alpha, None)]
+
+    if slide.numpy_imported:
+        blitters.append(('numpy', blit, True))
+
+    blitters.append(('python', blit, False))
+
+    expected = dest.copy()
+    legacy_blit_8bit_alpha(source, expected, 0, 0)
+    expected = get_pixels(expected)
+
+    print
+    print '{} alpha blits of {}x{}'.format(BLITS, size[0], size[1])
+    print '{:8} {:>10} {:>12}'.format('blit', 'secs', 'blits/sec')
+
+    for name, method, use_numpy in blitters:
+        result = dest.copy()
+        run_with_numpy(slide, use_numpy, method, source, result, 0, 0)
+
+        if get_pixels(result) != expected:
+            print "{} results differ from the legacy results".format(name)
+
+        start = time.time()
+
+        for _ in range(BLITS):
+            run_with_numpy(slide, use_numpy, method, source, dest.copy(), 0,
+                           0)
+
+        secs = time.time() - start
+        print '{:8} {:10.3f} {:12.1f}'.format(name, secs,
+                                              BLITS / secs if secs else 0)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print __doc__
+        return
+
+    images = load_images(sys.argv[1])
+
+    if images:
+        benchmark_conversion(images)
+    else:
+        print "No images found in", sys.argv[1]
+
+    benchmark_alpha_blit()
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
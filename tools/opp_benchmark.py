@@ -0,0 +1,187 @@
+"""Benchmarks the serial traffic of OPP neopixel updates, comparing the batched
+updates against the one message per LED change updates they replaced.
+
+Run it from the MPF root folder:
+
+    python tools/opp_benchmark.py [num_pixels] [num_colors]
+
+It plays a chase show (every pixel changes every frame, 30 frames per
+second) on one neopixel card. Nothing is sent to real hardware, the bytes and
+serial writes are counted instead.
+
+"""
+# opp_benchmark.py
+# Mission Pinball Framework
+# Written by Brian Madden & Gabe Knuth
+# Released under the MIT License. (See license info at the end of this file.)
+
+# Documentation and more info at http://missionpinball.com/mpf
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir)))
+
+from mpf.platform.opp import OppRs232Intf, OPPNeopixelCard
+
+FPS = 30
+SECONDS = 10
+BAUD = 115200
+
+
+class CountingConnection(object):
+
+    def __init__(self):
+        self.writes = 0
+        self.bytes = 0
+
+    def send(self, msg, *args, **kwargs):
+        self.writes += 1
+        self.bytes += len(msg)
+
+
+class FakePlatform(object):
+
+    def __init__(self):
+        self.opp_connection = CountingConnection()
+        self.neo_dirty = False
+
+
+class LegacyNeopixel(object):
+    # How OPPNeopixel.color() worked before, for comparison
+
+    def __init__(self, index, card):
+        self.card = card
+        self.index_char = chr(index)
+        self.failed = 0
+
+    def color(self, color):
+        new_color = '%02x%02x%02x' % (color[0], color[1], color[2])
+        card = self.card
+
+        if new_color not in card.colorTableDict:
+            if card.numColorEntries < 32:
+                card.colorTableDict[new_color] = chr(
+                    card.numColorEntries + OppRs232Intf.NEO_CMD_ON)
+                msg = [card.addr, OppRs232Intf.CHNG_NEO_COLOR_TBL,
+                       chr(card.numColorEntries),
+                       chr(int(new_color[2:4], 16)),
+                       chr(int(new_color[:2], 16)),
+                       chr(int(new_color[-2:], 16))]
+                msg.append(OppRs232Intf.calc_crc8_whole_msg(msg))
+                card.platform.opp_connection.send(''.join(msg))
+                card.numColorEntries += 1
+            else:
+                self.failed += 1
+                return
+
+        msg = [card.addr, OppRs232Intf.SET_IND_NEO_CMD, self.index_char,
+               card.colorTableDict[new_color]]
+        msg.append(OppRs232Intf.calc_crc8_whole_msg(msg))
+        card.platform.opp_connection.send(''.join(msg))
+
+
+class LegacyCard(object):
+
+    def __init__(self, platform):
+        self.addr = '\x21'
+        self.platform = platform
+        self.numColorEntries = 0
+        self.colorTableDict = dict()
+
+
+def get_frames(num_pixels, num_colors):
+    palette = [((i * 37) % 256, (i * 91) % 256, (i * 151) % 256)
+               for i in range(num_colors)]
+
+    return [[palette[(pixel + frame) % num_colors]
+             for pixel in range(num_pixels)]
+            for frame in range(FPS * SECONDS)]
+
+
+def run_legacy(frames, num_pixels):
+    platform = FakePlatform()
+    card = LegacyCard(platform)
+    pixels = [LegacyNeopixel(i, card) for i in range(num_pixels)]
+
+    start = time.time()
+
+    for frame in frames:
+        for pixel, color in zip(pixels, frame):
+            pixel.color(color)
+
+    return (time.time() - start, platform.opp_connection,
+            sum(x.failed for x in pixels))
+
+
+def run_batched(frames, num_pixels):
+    platform = FakePlatform()
+    card = OPPNeopixelCard('\x21', dict(), platform)
+    card.log.disabled = True  # the "table is full" warning
+    pixels = [card.add_neopixel(i, dict()) for i in range(num_pixels)]
+
+    start = time.time()
+
+    for frame in frames:
+        for pixel, color in zip(pixels, frame):
+            pixel.color(color)
+
+        # what HardwarePlatform.update_neopixels() does once per tick
+        msg = bytearray()
+        card.add_update_msg(msg)
+        if msg:
+            msg.append(0xff)
+            platform.opp_connection.send(str(msg))
+
+    return (time.time() - start, platform.opp_connection,
+            len(card.pending))
+
+
+def main():
+    num_pixels = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    num_colors = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    frames = get_frames(num_pixels, num_colors)
+
+    print '{} pixels, {} colors, {} frames per second for {} seconds'.format(
+        num_pixels, num_colors, FPS, SECONDS)
+    print '{:8} {:>10} {:>10} {:>8} {:>10} {:>8}'.format(
+        'updates', 'bytes/sec', 'writes/sec', 'link %', 'us/frame', 'missed')
+
+    for name, runner in (('legacy', run_legacy), ('batched', run_batched)):
+        secs, connection, missed = runner(frames, num_pixels)
+        bytes_per_sec = connection.bytes / float(SECONDS)
+
+        print '{:8} {:10.0f} {:10.0f} {:8.1f} {:10.1f} {:8}'.format(
+            name, bytes_per_sec, connection.writes / float(SECONDS),
+            bytes_per_sec * 10 / BAUD * 100,  # 10 bits per byte on the wire
+            secs / len(frames) * 1000000, missed)
+
+
+if __name__ == '__main__':
+    main()
+
+
+# The MIT License (MIT)
+
+# Copyright (c) 2013-2015 Brian Madden and Gabe Knuth
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.